@@ -1,5 +1,9 @@
+import math
+
+import numpy as np
 import skimage
 from packaging import version
+from scipy.spatial import cKDTree
 
 if version.parse(skimage.__version__) > version.parse("0.14.2"):
     from skimage.transform import match_histograms
@@ -38,8 +42,6 @@ else:
     IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
     """
 
-    import numpy as np
-
     def _match_cumulative_cdf(source, template):
         """
         Return modified source array so that the cumulative density function of
@@ -98,3 +100,94 @@ else:
             matched = _match_cumulative_cdf(image, reference)
 
         return matched
+
+
+# prune_blobs and its helpers are copied from the private skimage.feature.blob._prune_blobs of
+# scikit-image 0.15 (Copyright (C) 2011, the scikit-image team, under the license reproduced
+# above), so that starfish does not depend on a private skimage function.
+
+
+def _compute_disk_overlap(d, r1, r2):
+    """fraction of the area of the smaller of two disks of radii r1 and r2, whose centers are
+    separated by a distance d, that is covered by the other disk"""
+    ratio1 = (d ** 2 + r1 ** 2 - r2 ** 2) / (2 * d * r1)
+    ratio1 = np.clip(ratio1, -1, 1)
+    acos1 = math.acos(ratio1)
+
+    ratio2 = (d ** 2 + r2 ** 2 - r1 ** 2) / (2 * d * r2)
+    ratio2 = np.clip(ratio2, -1, 1)
+    acos2 = math.acos(ratio2)
+
+    a = -d + r2 + r1
+    b = d - r2 + r1
+    c = d + r2 - r1
+    d = d + r2 + r1
+    area = (r1 ** 2 * acos1 + r2 ** 2 * acos2 - 0.5 * math.sqrt(abs(a * b * c * d)))
+    return area / (math.pi * (min(r1, r2) ** 2))
+
+
+def _compute_sphere_overlap(d, r1, r2):
+    """fraction of the volume of the smaller of two spheres of radii r1 and r2, whose centers are
+    separated by a distance d, that is covered by the other sphere"""
+    vol = (math.pi / (12 * d) * (r1 + r2 - d) ** 2
+           * (d ** 2 + 2 * d * (r1 + r2) - 3 * (r1 ** 2 + r2 ** 2) + 6 * r1 * r2))
+    return vol / (4. / 3 * math.pi * min(r1, r2) ** 3)
+
+
+def _blob_overlap(blob1, blob2):
+    """fraction of the area (or volume in 3D) of the smaller of two (..., sigma) blobs that
+    overlaps the other"""
+    n_dim = len(blob1) - 1
+    root_ndim = math.sqrt(n_dim)
+
+    # extent of the blob is given by sqrt(2)*scale
+    r1 = blob1[-1] * root_ndim
+    r2 = blob2[-1] * root_ndim
+
+    d = math.sqrt(np.sum((blob1[:-1] - blob2[:-1]) ** 2))
+    if d > r1 + r2:
+        return 0
+
+    # one blob is inside the other, the smaller blob must die
+    if d <= abs(r1 - r2):
+        return 1
+
+    if n_dim == 2:
+        return _compute_disk_overlap(d, r1, r2)
+    return _compute_sphere_overlap(d, r1, r2)
+
+
+def prune_blobs(blobs_array, overlap):
+    """
+    Eliminate blobs with area overlap, as skimage.feature.blob_log and blob_dog do.
+
+    Parameters
+    ----------
+    blobs_array : np.ndarray
+        (n_blobs, 3) or (n_blobs, 4) array of (row, col, sigma) or (pln, row, col, sigma) blobs,
+        where sigma is the standard deviation of the gaussian kernel which detected the blob.
+        n_blobs must be positive.
+    overlap : float
+        A value between 0 and 1. If the fraction of area overlapping for 2 blobs is greater than
+        overlap, the smaller blob is eliminated.
+
+    Returns
+    -------
+    np.ndarray :
+        blobs_array with overlapping blobs removed.
+    """
+    sigma = blobs_array[:, -1].max()
+    distance = 2 * sigma * math.sqrt(blobs_array.shape[1] - 1)
+    tree = cKDTree(blobs_array[:, :-1])
+    pairs = np.array(list(tree.query_pairs(distance)))
+    if len(pairs) == 0:
+        return blobs_array
+    for (i, j) in pairs:
+        blob1, blob2 = blobs_array[i], blobs_array[j]
+        if _blob_overlap(blob1, blob2) > overlap:
+            if blob1[-1] > blob2[-1]:
+                blob2[-1] = 0
+            else:
+                blob1[-1] = 0
+
+    return np.array([b for b in blobs_array if b[-1] > 0])
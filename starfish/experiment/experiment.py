@@ -119,6 +119,11 @@ class FieldOfView:
             all_groups[name] = f'{info}'
         pprint.pprint(all_groups)
 
+    def get_tileset(self, item: str) -> TileSet:
+        """Return the TileSet of an image type, e.g. to read the tiles' coordinates without loading
+        their pixels"""
+        return self._images[item]
+
     def iterate_image_type(self, image_type: str) -> Iterator[ImageStack]:
         for aligned_group, _ in enumerate(self.aligned_coordinate_groups[image_type]):
             yield self.get_image(item=image_type, aligned_group=aligned_group)
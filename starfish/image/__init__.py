@@ -1,3 +1,5 @@
 from ._filter import Filter
+from ._filter.filter_pipeline import FilterPipeline
 from ._registration import Registration
 from ._segmentation import Segmentation
+from ._stitching import Stitching
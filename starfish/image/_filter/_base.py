@@ -1,5 +1,7 @@
 from abc import abstractmethod
-from typing import Type
+from typing import Callable, Type
+
+import numpy as np
 
 from starfish.imagestack.imagestack import ImageStack
 from starfish.pipeline.algorithmbase import AlgorithmBase
@@ -47,3 +49,11 @@ class FilterAlgorithmBase(AlgorithmBase):
     def run(self, stack: ImageStack, *args) -> ImageStack:
         """Performs filtering on an ImageStack."""
         raise NotImplementedError()
+
+    def _tile_function(self, stack: ImageStack) -> Callable[[np.ndarray], np.ndarray]:
+        """Returns the function that run() applies to each 2-d tile of stack, or to each (z, y, x)
+        volume if self.is_volume. Filters that implement this can be fused into a
+        FilterPipeline."""
+        raise NotImplementedError(
+            f"{self.__class__.__name__} does not filter tiles independently, and cannot be fused "
+            f"into a FilterPipeline")
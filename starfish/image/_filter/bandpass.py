@@ -1,14 +1,22 @@
 from functools import partial
-from typing import Optional, Union
+from typing import Callable, Optional, Union
 
 import numpy as np
 import xarray as xr
+from scipy.ndimage import uniform_filter1d
 from trackpy import bandpass
 
 from starfish.imagestack.imagestack import ImageStack
 from starfish.types import Clip, Number
 from starfish.util import click
 from ._base import FilterAlgorithmBase
+from .fft_engine import (
+    apply_batched,
+    fft_gaussian_filter,
+    select_engine,
+    tile_shape,
+    validate_engine,
+)
 from .util import determine_axes_to_group_by
 
 
@@ -16,7 +24,7 @@ class Bandpass(FilterAlgorithmBase):
 
     def __init__(
         self, lshort: Number, llong: int, threshold: Number=0, truncate: Number=4,
-        is_volume: bool=False, clip_method: Union[str, Clip]=Clip.CLIP
+        is_volume: bool=False, clip_method: Union[str, Clip]=Clip.CLIP, engine: str='auto',
     ) -> None:
         """
 
@@ -42,7 +50,14 @@ class Bandpass(FilterAlgorithmBase):
             Clip.SCALE_BY_CHUNK: data above 1 are scaled by the maximum value, with the maximum
                 value calculated over each slice, where slice shapes are determined by the group_by
                 parameters
+        engine : str ['auto', 'spatial', 'fft']
+            'spatial' calls trackpy.bandpass on each tile. 'fft' computes the gaussian smoothing
+            of batches of tiles with one real FFT, using frequency responses cached per lshort and
+            tile shape, and the running average with a separable uniform filter; results match
+            'spatial' up to float32 rounding. 'auto' picks the faster of the two from lshort and
+            the tile size. (default 'auto')
         """
+        validate_engine(engine)
         self.lshort = lshort
         self.llong = llong
 
@@ -53,6 +68,7 @@ class Bandpass(FilterAlgorithmBase):
         self.truncate = truncate
         self.is_volume = is_volume
         self.clip_method = clip_method
+        self.engine = engine
 
     _DEFAULT_TESTING_PARAMETERS = {"lshort": 1, "llong": 3, "threshold": 0.01}
 
@@ -88,6 +104,51 @@ class Bandpass(FilterAlgorithmBase):
         )
         return bandpassed
 
+    @staticmethod
+    def _bandpass_fft(
+            tiles: np.ndarray,
+            lshort: Number, llong: int, threshold: Number, truncate: Number, n_dim: int,
+    ) -> np.ndarray:
+        """Apply the bandpass filter of _bandpass to the trailing n_dim axes of a batch of tiles,
+        smoothing in the frequency domain
+
+        Returns
+        -------
+        np.ndarray :
+            bandpassed tiles
+
+        """
+        if lshort >= llong:
+            raise ValueError(
+                "The smoothing length scale must be larger than the noise length scale.")
+        if not llong & 1:
+            raise ValueError("llong must be an odd integer")
+        tiles = np.asarray(tiles, dtype=np.float32)
+
+        # running average over a square kernel, as trackpy.boxcar
+        background = tiles.copy()
+        for axis in range(tiles.ndim - n_dim, tiles.ndim):
+            uniform_filter1d(background, llong, axis, output=background, mode='nearest', cval=0)
+
+        # trackpy.lowpass pads with zeros
+        result = fft_gaussian_filter(
+            tiles, (lshort,) * n_dim, mode='constant', cval=0, truncate=truncate)
+        result -= background
+        return np.where(result >= threshold, result, 0)
+
+    def _tile_function(self, stack: ImageStack) -> Callable[[np.ndarray], np.ndarray]:
+        n_dim = 3 if self.is_volume else 2
+        engine = select_engine(
+            self.engine, tile_shape(stack, self.is_volume), (self.lshort,) * n_dim, self.truncate)
+        if engine == 'fft':
+            return partial(
+                self._bandpass_fft, lshort=self.lshort, llong=self.llong,
+                threshold=self.threshold, truncate=self.truncate, n_dim=n_dim)
+        return partial(
+            self._bandpass,
+            lshort=self.lshort, llong=self.llong, threshold=self.threshold, truncate=self.truncate
+        )
+
     def run(
             self,
             stack: ImageStack,
@@ -116,15 +177,22 @@ class Bandpass(FilterAlgorithmBase):
             original stack.
 
         """
-        bandpass_ = partial(
-            self._bandpass,
-            lshort=self.lshort, llong=self.llong, threshold=self.threshold, truncate=self.truncate
-        )
+        n_dim = 3 if self.is_volume else 2
+        engine = select_engine(
+            self.engine, tile_shape(stack, self.is_volume), (self.lshort,) * n_dim, self.truncate)
+        if engine == 'fft':
+            return apply_batched(
+                stack,
+                partial(self._bandpass_fft, lshort=self.lshort, llong=self.llong,
+                        threshold=self.threshold, truncate=self.truncate, n_dim=n_dim),
+                self.is_volume, self.clip_method,
+                in_place=in_place, verbose=verbose, n_processes=n_processes,
+            )
 
         group_by = determine_axes_to_group_by(self.is_volume)
 
         result = stack.apply(
-            bandpass_,
+            self._tile_function(stack),
             group_by=group_by,
             in_place=in_place,
             n_processes=n_processes,
@@ -147,9 +215,12 @@ class Bandpass(FilterAlgorithmBase):
         "--clip-method", default=Clip.CLIP, type=Clip,
         help="method to constrain data to [0,1]. options: 'clip', 'scale_by_image', "
              "'scale_by_chunk'")
+    @click.option(
+        "--engine", default='auto',
+        help="str ['auto', 'spatial', 'fft'] how to execute the filter. Default: auto")
     @click.pass_context
-    def _cli(ctx, lshort, llong, threshold, truncate, clip_method):
+    def _cli(ctx, lshort, llong, threshold, truncate, clip_method, engine):
         ctx.obj["component"]._cli_run(
             ctx,
-            Bandpass(lshort, llong, threshold, truncate, clip_method)
+            Bandpass(lshort, llong, threshold, truncate, clip_method=clip_method, engine=engine)
         )
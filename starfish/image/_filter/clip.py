@@ -1,5 +1,5 @@
 from functools import partial
-from typing import Optional, Union
+from typing import Callable, Optional, Union
 
 import numpy as np
 import xarray as xr
@@ -7,12 +7,20 @@ import xarray as xr
 from starfish.imagestack.imagestack import ImageStack
 from starfish.util import click
 from ._base import FilterAlgorithmBase
-from .util import determine_axes_to_group_by
+from .util import (
+    determine_axes_to_group_by,
+    histogram_percentile,
+    intensity_histogram,
+    PERCENTILE_ENGINES,
+)
 
 
 class Clip(FilterAlgorithmBase):
 
-    def __init__(self, p_min: int=0, p_max: int=100, is_volume: bool=False) -> None:
+    def __init__(
+        self, p_min: int=0, p_max: int=100, is_volume: bool=False, engine: str='exact',
+        n_bins: int=4096,
+    ) -> None:
         """Image clipping filter
 
         Parameters
@@ -23,10 +31,20 @@ class Clip(FilterAlgorithmBase):
             values above this percentile are set to p_max (default 100)
         is_volume : bool
             If True, 3d (z, y, x) volumes will be filtered. By default, filter 2-d (y, x) tiles
+        engine : str ['exact', 'histogram']
+            'exact' computes the percentiles with np.percentile. 'histogram' estimates them from
+            an n_bins histogram of the tile, to within 1 / n_bins, without copying or sorting the
+            tile. (default 'exact')
+        n_bins : int
+            number of histogram bins used by the 'histogram' engine (default 4096)
         """
+        if engine not in PERCENTILE_ENGINES:
+            raise ValueError(f"engine must be one of {PERCENTILE_ENGINES}, not {engine}")
         self.p_min = p_min
         self.p_max = p_max
         self.is_volume = is_volume
+        self.engine = engine
+        self.n_bins = n_bins
 
     _DEFAULT_TESTING_PARAMETERS = {"p_min": 0, "p_max": 100}
 
@@ -58,6 +76,21 @@ class Clip(FilterAlgorithmBase):
 
         return image.clip(min=v_min, max=v_max)
 
+    @staticmethod
+    def _clip_histogram(
+            image: Union[xr.DataArray, np.ndarray], p_min: int, p_max: int, n_bins: int
+    ) -> np.ndarray:
+        """_clip, estimating the percentiles from an n_bins histogram of image"""
+        v_min, v_max = histogram_percentile(intensity_histogram(image, n_bins), [p_min, p_max])
+
+        return image.clip(min=v_min, max=v_max)
+
+    def _tile_function(self, stack: ImageStack) -> Callable[[np.ndarray], np.ndarray]:
+        if self.engine == 'histogram':
+            return partial(
+                self._clip_histogram, p_min=self.p_min, p_max=self.p_max, n_bins=self.n_bins)
+        return partial(self._clip, p_min=self.p_min, p_max=self.p_max)
+
     def run(
             self,
             stack: ImageStack,
@@ -87,9 +120,8 @@ class Clip(FilterAlgorithmBase):
 
         """
         group_by = determine_axes_to_group_by(self.is_volume)
-        clip = partial(self._clip, p_min=self.p_min, p_max=self.p_max)
         result = stack.apply(
-            clip,
+            self._tile_function(stack),
             group_by=group_by, verbose=verbose, in_place=in_place, n_processes=n_processes
         )
         return result
@@ -100,6 +132,13 @@ class Clip(FilterAlgorithmBase):
         "--p-min", default=0, type=int, help="clip intensities below this percentile")
     @click.option(
         "--p-max", default=100, type=int, help="clip intensities above this percentile")
+    @click.option(
+        "--engine", default='exact',
+        help="str ['exact', 'histogram'] how to compute percentiles. Default: exact")
+    @click.option(
+        "--n-bins", default=4096, type=int,
+        help="number of histogram bins used by the histogram engine")
     @click.pass_context
-    def _cli(ctx, p_min, p_max):
-        ctx.obj["component"]._cli_run(ctx, Clip(p_min, p_max))
+    def _cli(ctx, p_min, p_max, engine, n_bins):
+        ctx.obj["component"]._cli_run(
+            ctx, Clip(p_min, p_max, engine=engine, n_bins=n_bins))
@@ -75,12 +75,13 @@ class ElementWiseMultiply(FilterAlgorithmBase):
         if not in_place:
             stack = deepcopy(stack)
 
-        # stack._data contains the xarray
-        stack._data *= mult_array_aligned
+        # multiply and clip the shared buffer in place, so the stack keeps its backing array
+        data = stack.xarray.values
+        data *= mult_array_aligned
         if self.clip_method == Clip.CLIP:
-            stack._data = preserve_float_range(stack._data, rescale=False)
+            preserve_float_range(data, rescale=False, out=data)
         else:
-            stack._data = preserve_float_range(stack._data, rescale=True)
+            preserve_float_range(data, rescale=True, out=data)
         return stack
 
     @staticmethod
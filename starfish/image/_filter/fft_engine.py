@@ -0,0 +1,253 @@
+"""FFT execution of the separable gaussian filters (GaussianLowPass, GaussianHighPass, Laplace,
+Bandpass).
+
+Tiles are padded according to the boundary mode of the equivalent scipy.ndimage filter, stacked
+along leading batch axes, and transformed with a single rfftn. The frequency response of the
+truncated, sampled kernels is cached per (sigma, tile shape), so results match the spatial filters
+up to floating point rounding.
+"""
+from functools import lru_cache
+from typing import Callable, Sequence, Set, Tuple, Union
+
+import numpy as np
+import xarray as xr
+
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Axes, Clip, Number
+from starfish.util import fft
+from starfish.util.dtype import preserve_float_range
+
+FILTER_ENGINES = {'auto', 'spatial', 'fft'}
+
+# scipy.ndimage boundary modes and the np.pad modes that extend an array the same way
+_PAD_MODES = {
+    'reflect': 'symmetric',
+    'mirror': 'reflect',
+    'nearest': 'edge',
+    'wrap': 'wrap',
+    'constant': 'constant',
+}
+
+# relative cost of one FFT butterfly compared to one multiply-add of a spatial kernel; calibrated
+# on 2-d float32 tiles so that 'auto' picks the faster engine
+_FFT_COST_FACTOR = 5
+
+
+def _fft_supports_mode(mode: Union[str, Sequence[str]]) -> bool:
+    return isinstance(mode, str) and mode in _PAD_MODES
+
+
+def validate_engine(engine: str, mode: Union[str, Sequence[str]]='reflect') -> None:
+    if engine not in FILTER_ENGINES:
+        raise ValueError(f"engine must be one of {FILTER_ENGINES}, not {engine}")
+    if engine == 'fft' and not _fft_supports_mode(mode):
+        raise ValueError(f"the fft engine supports modes {set(_PAD_MODES)}, not {mode}")
+
+
+def kernel_radius(sigma: Number, truncate: Number=4.0) -> int:
+    """radius of the kernel scipy.ndimage.gaussian_filter1d uses for sigma"""
+    return int(truncate * float(sigma) + 0.5)
+
+
+def select_engine(
+        engine: str, tile_shape: Sequence[int], sigma: Sequence[Number], truncate: Number=4.0,
+        mode: Union[str, Sequence[str]]='reflect',
+) -> str:
+    """resolve engine='auto' to 'spatial' or 'fft' by comparing the per-pixel cost of separable
+    spatial correlation with the cost of a forward and inverse FFT of the padded tile"""
+    if engine != 'auto':
+        return engine
+    if not _fft_supports_mode(mode):
+        return 'spatial'
+    radii = [kernel_radius(s, truncate) for s in sigma]
+    spatial_cost = sum(2 * r + 1 for r in radii)
+    padded_size = np.prod([n + 2 * r for n, r in zip(tile_shape, radii)])
+    fft_cost = _FFT_COST_FACTOR * 2 * np.log2(padded_size)
+    return 'fft' if spatial_cost > fft_cost else 'spatial'
+
+
+def _gaussian_kernel1d(sigma: float, order: int, truncate: float) -> np.ndarray:
+    """the correlation kernel of scipy.ndimage.gaussian_filter1d for order 0 or 2"""
+    if sigma <= 1e-15:
+        # scipy does not filter axes with zero sigma
+        return np.ones(1)
+    radius = kernel_radius(sigma, truncate)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 / (sigma * sigma) * x ** 2)
+    kernel /= kernel.sum()
+    if order == 2:
+        kernel *= (x ** 2 - sigma ** 2) / sigma ** 4
+    return kernel
+
+
+@lru_cache(maxsize=32)
+def frequency_response(
+        sigma: Tuple[float, ...],
+        orders: Tuple[Tuple[int, ...], ...],
+        truncate: float,
+        fft_shape: Tuple[int, ...],
+) -> np.ndarray:
+    """
+    Return the read-only rfftn-layout frequency response of a sum of separable gaussian kernels.
+
+    Parameters
+    ----------
+    sigma : Tuple[float, ...]
+        standard deviation of the gaussian along each filtered axis
+    orders : Tuple[Tuple[int, ...], ...]
+        one tuple of per-axis derivative orders (0 or 2) for each separable term; the response is
+        the sum of the terms, e.g. ((0, 0),) for a 2-d gaussian and ((2, 0), (0, 2)) for a 2-d
+        laplacian of gaussian
+    truncate : float
+        truncate the kernels at this many standard deviations
+    fft_shape : Tuple[int, ...]
+        shape of the padded tiles that will be transformed
+
+    """
+    n_dim = len(fft_shape)
+    response: Union[int, np.ndarray] = 0
+    for term_orders in orders:
+        term: Union[int, np.ndarray] = 1
+        for axis, (axis_sigma, order, length) in enumerate(zip(sigma, term_orders, fft_shape)):
+            kernel = _gaussian_kernel1d(axis_sigma, order, truncate)
+            radius = kernel.size // 2
+            # center the kernel on index 0 so the filtered tile is not shifted
+            padded = np.zeros(length)
+            padded[:kernel.size] = kernel
+            padded = np.roll(padded, -radius)
+            # the kernels are symmetric, so correlation and convolution agree
+            if axis == n_dim - 1:
+                axis_response = np.fft.rfft(padded)
+            else:
+                axis_response = np.fft.fft(padded)
+            shape = [1] * n_dim
+            shape[axis] = axis_response.size
+            term = term * axis_response.reshape(shape)
+        response = response + term
+    response = np.asarray(response).astype(fft.COMPLEX_DTYPE)
+    response.flags.writeable = False
+    return response
+
+
+def fft_gaussian_filter(
+        tiles: Union[np.ndarray, xr.DataArray],
+        sigma: Sequence[Number],
+        orders: Sequence[Sequence[int]]=None,
+        mode: str='reflect',
+        cval: float=0.0,
+        truncate: float=4.0,
+) -> np.ndarray:
+    """
+    Filter the trailing len(sigma) axes of tiles with a (sum of) separable gaussian kernel(s) in
+    the frequency domain. Leading axes are treated as a batch of tiles and transformed together.
+
+    Parameters
+    ----------
+    tiles : Union[np.ndarray, xr.DataArray]
+        array whose trailing len(sigma) axes are filtered
+    sigma : Sequence[Number]
+        standard deviation of the gaussian along each filtered axis
+    orders : Sequence[Sequence[int]]
+        derivative orders of each separable term (see frequency_response). Defaults to a single
+        gaussian term.
+    mode : str
+        scipy.ndimage boundary mode. (default 'reflect')
+    cval : float
+        value past the edges of the tiles if mode is 'constant'. (default 0.0)
+    truncate : float
+        truncate the kernels at this many standard deviations. (default 4.0)
+
+    Returns
+    -------
+    np.ndarray :
+        float32 filtered tiles, equal to the corresponding scipy.ndimage filter up to rounding
+
+    """
+    tiles = np.asarray(tiles, dtype=np.float32)
+    n_dim = len(sigma)
+    batch_dim = tiles.ndim - n_dim
+    if orders is None:
+        orders = [(0,) * n_dim]
+
+    radii = [_gaussian_kernel1d(s, 0, truncate).size // 2 for s in sigma]
+    pad_width = [(0, 0)] * batch_dim + [(r, r) for r in radii]
+    if mode == 'constant':
+        padded = np.pad(tiles, pad_width, mode='constant', constant_values=cval)
+    else:
+        padded = np.pad(tiles, pad_width, mode=_PAD_MODES[mode])
+
+    # linear convolution of the padded tile only needs the fft to be as large as the padded tile:
+    # every output pixel inside the crop depends on inputs within the padding
+    fft_shape = fft.fast_shape(padded.shape[batch_dim:])
+    response = frequency_response(
+        tuple(float(s) for s in sigma),
+        tuple(tuple(term) for term in orders),
+        float(truncate),
+        fft_shape,
+    )
+    spectrum = fft.rfftn(padded, fft_shape)
+    spectrum *= response
+    filtered = fft.irfftn(spectrum, fft_shape)
+
+    crop = [slice(None)] * batch_dim + [
+        slice(r, r + n) for r, n in zip(radii, tiles.shape[batch_dim:])]
+    return filtered[tuple(crop)].astype(np.float32, copy=False)
+
+
+def determine_axes_to_batch_by(is_volume: bool) -> Set[Axes]:
+    """axes to group by so that each worker receives a batch of tiles to transform together:
+    every z-plane of a (round, ch) for 2-d filtering, every channel of a round for 3-d"""
+    if is_volume:
+        return {Axes.ROUND}
+    else:
+        return {Axes.ROUND, Axes.CH}
+
+
+def _filter_batch(
+        tiles: xr.DataArray, batch_func: Callable[[np.ndarray], np.ndarray], n_tile_dims: int,
+        rescale_tiles: bool,
+) -> np.ndarray:
+    filtered = batch_func(np.asarray(tiles))
+    if rescale_tiles:
+        # scale each tile by its own maximum, as Clip.SCALE_BY_CHUNK would for unbatched tiles
+        for index in np.ndindex(filtered.shape[:filtered.ndim - n_tile_dims]):
+            preserve_float_range(filtered[index], rescale=True, out=filtered[index])
+    return filtered
+
+
+def apply_batched(
+        stack: ImageStack,
+        batch_func: Callable[[np.ndarray], np.ndarray],
+        is_volume: bool,
+        clip_method: Union[str, Clip],
+        in_place: bool=False,
+        verbose: bool=False,
+        n_processes: int=None,
+) -> ImageStack:
+    """
+    Apply batch_func, which filters the trailing 2 (or 3, if is_volume) axes of a batch of tiles,
+    to an ImageStack with one worker task per batch. Clip methods have the same per-tile meaning
+    as for ImageStack.apply with determine_axes_to_group_by(is_volume).
+    """
+    rescale_tiles = clip_method == Clip.SCALE_BY_CHUNK
+    if rescale_tiles:
+        # tiles are already scaled into [0, 1]; clipping the batch is then a no-op
+        clip_method = Clip.CLIP
+    return stack.apply(
+        _filter_batch,
+        group_by=determine_axes_to_batch_by(is_volume),
+        in_place=in_place,
+        verbose=verbose,
+        n_processes=n_processes,
+        clip_method=clip_method,
+        batch_func=batch_func,
+        n_tile_dims=3 if is_volume else 2,
+        rescale_tiles=rescale_tiles,
+    )
+
+
+def tile_shape(stack: ImageStack, is_volume: bool) -> Tuple[int, ...]:
+    """shape of the tiles filtered for is_volume"""
+    if is_volume:
+        return stack.shape[Axes.ZPLANE], stack.shape[Axes.Y], stack.shape[Axes.X]
+    return stack.shape[Axes.Y], stack.shape[Axes.X]
@@ -0,0 +1,150 @@
+from copy import deepcopy
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import xarray as xr
+
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Clip
+from starfish.util.dtype import preserve_float_range
+from ._base import FilterAlgorithmBase
+from .util import determine_axes_to_group_by
+
+# the function applied to each tile by a step, whether the step filters 3-d volumes, and the
+# step's clip method
+_FusedStep = Tuple[Callable[[np.ndarray], np.ndarray], bool, Union[str, Clip]]
+
+
+def _apply_step(
+        image: np.ndarray, tile_function: Callable[[np.ndarray], np.ndarray], is_volume: bool,
+        clip_method: Union[str, Clip],
+) -> np.ndarray:
+    """apply one step to a tile or volume, clipping each of the step's own tiles as
+    ImageStack.apply would"""
+    if image.ndim == 3 and not is_volume:
+        # a 2-d step in a pipeline that is grouped by volume filters each z-plane
+        return np.stack([
+            _apply_step(plane, tile_function, is_volume, clip_method) for plane in image])
+
+    result = np.asarray(tile_function(image), dtype=np.float32)
+    if clip_method == Clip.CLIP:
+        preserve_float_range(result, rescale=False, out=result)
+    elif clip_method == Clip.SCALE_BY_CHUNK:
+        preserve_float_range(result, rescale=True, out=result)
+    return result
+
+
+def _apply_fused_steps(data: xr.DataArray, steps: Sequence[_FusedStep]) -> None:
+    """apply each step in turn to the tile (or volume) data, writing only the final result back
+    into the shared ImageStack buffer"""
+    image = np.asarray(data)
+    for tile_function, is_volume, clip_method in steps:
+        image = _apply_step(image, tile_function, is_volume, clip_method)
+    data[:] = image
+
+
+def _scale_by_image(stack: ImageStack) -> None:
+    """in-place equivalent of Clip.SCALE_BY_IMAGE for the whole ImageStack"""
+    data = stack.xarray.values
+    preserve_float_range(data, rescale=True, out=data)
+
+
+class FilterPipeline:
+
+    def __init__(self, steps: Sequence[FilterAlgorithmBase]) -> None:
+        """A sequence of filters that is executed in a single pass over each tile
+
+        Filters that are chained with their own run() methods each copy the ImageStack and make a
+        full pass over it in a new process pool. A FilterPipeline instead sends each tile (or
+        volume) to a worker once, applies every step to it while it is in cache, and writes the
+        final result back once. Each step clips its output exactly as its run() method would, and
+        is recorded in the ImageStack log.
+
+        Steps must filter tiles independently (e.g. Clip, WhiteTophat, GaussianLowPass,
+        ScaleByPercentile). If any step filters 3-d volumes, each worker receives a volume and
+        steps that filter 2-d tiles are applied to each of its z-planes. A step with
+        Clip.SCALE_BY_IMAGE needs the maximum of the whole ImageStack, so the pipeline makes a
+        separate pass for the steps that follow it.
+
+        Parameters
+        ----------
+        steps : Sequence[FilterAlgorithmBase]
+            filters to apply, in order
+
+        Examples
+        --------
+        >>> from starfish.image import Filter, FilterPipeline
+        >>> pipeline = FilterPipeline([
+        ...     Filter.Clip(p_min=10, p_max=100),
+        ...     Filter.WhiteTophat(masking_radius=15),
+        ...     Filter.GaussianLowPass(sigma=1),
+        ...     Filter.ScaleByPercentile(p=99.9),
+        ... ])
+        >>> filtered = pipeline.run(stack)
+
+        """
+        self.steps = list(steps)
+        for step in self.steps:
+            if not isinstance(step, FilterAlgorithmBase):
+                raise TypeError(f"FilterPipeline steps must be filters, not {type(step)}")
+
+    def _passes(self) -> List[List[FilterAlgorithmBase]]:
+        """split the steps into passes that end at each step that scales by the whole image"""
+        passes: List[List[FilterAlgorithmBase]] = [[]]
+        for step in self.steps:
+            passes[-1].append(step)
+            if getattr(step, 'clip_method', Clip.CLIP) == Clip.SCALE_BY_IMAGE:
+                passes.append([])
+        return [steps for steps in passes if steps]
+
+    def run(
+            self,
+            stack: ImageStack,
+            in_place: bool=False,
+            verbose: bool=False,
+            n_processes: Optional[int]=None,
+    ) -> ImageStack:
+        """Apply each filter to an image stack
+
+        Parameters
+        ----------
+        stack : ImageStack
+            Stack to be filtered.
+        in_place : bool
+            if True, process ImageStack in-place, otherwise return a new stack
+        verbose : bool
+            if True, report on filtering progress (default = False)
+        n_processes : Optional[int]
+            Number of parallel processes to devote to calculating the filters
+
+        Returns
+        -------
+        ImageStack :
+            If in-place is False, return the results of filter as a new stack.  Otherwise return the
+            original stack.
+
+        """
+        if not in_place:
+            stack = deepcopy(stack)
+
+        for steps in self._passes():
+            is_volume = any(getattr(step, 'is_volume', False) for step in steps)
+            fused_steps = [
+                (step._tile_function(stack), getattr(step, 'is_volume', False),
+                 getattr(step, 'clip_method', Clip.CLIP))
+                for step in steps
+            ]
+            stack.transform(
+                _apply_fused_steps,
+                group_by=determine_axes_to_group_by(is_volume),
+                verbose=verbose,
+                n_processes=n_processes,
+                steps=fused_steps,
+            )
+            if fused_steps[-1][2] == Clip.SCALE_BY_IMAGE:
+                _scale_by_image(stack)
+
+        for step in self.steps:
+            stack.update_log(step)
+
+        return stack
@@ -0,0 +1,122 @@
+from itertools import product
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+import xarray as xr
+
+from starfish.types import Number
+
+
+def _box_extent(size: int) -> Tuple[int, int]:
+    """offsets (before, after) of the first and last pixels of a box of size around its center,
+    matching the (origin 0) window of scipy.ndimage.uniform_filter"""
+    return size // 2, size - size // 2 - 1
+
+
+class IntegralImage:
+
+    def __init__(
+            self, image: Union[xr.DataArray, np.ndarray], max_size: Union[Number, Sequence[Number]]
+    ) -> None:
+        """Summed-area table of a 2-d or 3-d image, for box sums and means of any size up to
+        max_size at constant cost per pixel
+
+        The image is extended past its edges by reflection (scipy.ndimage's 'reflect' mode) far
+        enough for boxes of max_size, and accumulated in float64, so box means match
+        scipy.ndimage.uniform_filter up to floating point rounding. One table serves any number of
+        box sizes, e.g. to sweep the size of a mean high pass filter or to estimate background at
+        several scales.
+
+        Parameters
+        ----------
+        image : Union[xr.DataArray, np.ndarray]
+            2-d or 3-d image
+        max_size : Union[Number, Sequence[Number]]
+            largest box size that will be requested, per axis or for all axes
+
+        """
+        image = np.asarray(image)
+        self.shape = image.shape
+        max_sizes = np.broadcast_to(np.asarray(max_size, dtype=int), (image.ndim,))
+        self.pad = tuple(max(_box_extent(int(size))) for size in max_sizes)
+
+        padded = np.pad(image, [(pad, pad) for pad in self.pad], mode='symmetric')
+        # a leading row of zeros along each axis makes every box sum a difference of table entries
+        self.table = np.zeros([n + 1 for n in padded.shape], dtype=np.float64)
+        self.table[(slice(1, None),) * image.ndim] = padded
+        for axis in range(image.ndim):
+            np.cumsum(self.table, axis=axis, out=self.table)
+
+    def _normalize_size(self, size: Union[Number, Sequence[Number]]) -> Tuple[int, ...]:
+        sizes = tuple(
+            int(s) for s in np.broadcast_to(np.asarray(size), (len(self.shape),)))
+        for s, pad in zip(sizes, self.pad):
+            if s < 1 or max(_box_extent(s)) > pad:
+                raise ValueError(
+                    f"box size {size} must be at least 1 and fit the padding of the table, "
+                    f"{self.pad}")
+        return sizes
+
+    def box_sum(
+            self, size: Union[Number, Sequence[Number]], out: Optional[np.ndarray]=None
+    ) -> np.ndarray:
+        """
+        Sum of the pixels in the box of size centered on each pixel.
+
+        Parameters
+        ----------
+        size : Union[Number, Sequence[Number]]
+            box size, per axis or for all axes
+        out : Optional[np.ndarray]
+            float64 array of the image's shape to write the sums into
+
+        Returns
+        -------
+        np.ndarray :
+            float64 box sums, of the image's shape
+
+        """
+        sizes = self._normalize_size(size)
+        # in table coordinates, the box of pixel i spans entries (i + pad - before, i + pad + after]
+        lower, upper = [], []
+        for n, s, pad in zip(self.shape, sizes, self.pad):
+            before, after = _box_extent(s)
+            lower.append(slice(pad - before, pad - before + n))
+            upper.append(slice(pad + after + 1, pad + after + 1 + n))
+
+        if out is None:
+            out = np.empty(self.shape, dtype=np.float64)
+        # inclusion-exclusion over the 2 ** ndim corners of the box
+        for corner in product((False, True), repeat=len(self.shape)):
+            index = tuple(l if is_lower else u for is_lower, l, u in zip(corner, lower, upper))
+            if not any(corner):
+                out[...] = self.table[index]
+            elif sum(corner) % 2:
+                out -= self.table[index]
+            else:
+                out += self.table[index]
+        return out
+
+    def box_mean(
+            self, size: Union[Number, Sequence[Number]], out: Optional[np.ndarray]=None
+    ) -> np.ndarray:
+        """
+        Mean of the pixels in the box of size centered on each pixel, equal to
+        scipy.ndimage.uniform_filter(image, size) up to rounding.
+
+        Parameters
+        ----------
+        size : Union[Number, Sequence[Number]]
+            box size, per axis or for all axes
+        out : Optional[np.ndarray]
+            float64 array of the image's shape to write the means into
+
+        Returns
+        -------
+        np.ndarray :
+            float64 box means, of the image's shape
+
+        """
+        sums = self.box_sum(size, out=out)
+        sums /= np.prod(self._normalize_size(size))
+        return sums
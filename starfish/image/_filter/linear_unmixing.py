@@ -1,4 +1,4 @@
-from functools import partial
+from copy import deepcopy
 from typing import Optional
 
 import numpy as np
@@ -10,6 +10,10 @@ from starfish.util import click
 from ._base import FilterAlgorithmBase
 
 
+# target size of the block of unmixed rows held in memory at once by each worker
+_BLOCK_BYTES = 4 * 2 ** 20
+
+
 class LinearUnmixing(FilterAlgorithmBase):
 
     def __init__(self, coeff_mat: np.ndarray) -> None:
@@ -20,44 +24,49 @@ class LinearUnmixing(FilterAlgorithmBase):
         coeff_mat : np.ndarray
             matrix of the linear unmixing coefficients. Should take the form:
             B = AX, where B are the unmixed values, A is coeff_mat and X are
-            the observed values.
+            the observed values. coeff_mat has shape (n_ch, n_ch) to unmix every round with the
+            same coefficients, or (n_round, n_ch, n_ch) to unmix each round with its own
+            coefficients.
         """
         self.coeff_mat = coeff_mat
 
     _DEFAULT_TESTING_PARAMETERS = {"coeff_mat": np.array([[1, -0.25], [-0.25, 1]])}
 
     @staticmethod
-    def _unmix(image: xr.DataArray, coeff_mat: np.ndarray) -> np.ndarray:
-        """Perform linear unmixing of channels
+    def _unmix(image: xr.DataArray, coeff_mat: np.ndarray) -> None:
+        """Perform linear unmixing of channels in place
+
+        The channels of each pixel are multiplied by coeff_mat with one matrix product per block of
+        rows, so the memory used beyond image is a single block of about _BLOCK_BYTES, rather than
+        a copy of image per channel. Unmixed values are clipped to [0, 1].
 
         Parameters
         ----------
-        image : np.ndarray
-            image to be scaled
+        image : xr.DataArray
+            (ch, y, x) image to be unmixed, or (round, ch, y, x) if coeff_mat has one matrix per
+            round. Overwritten with the unmixed values.
 
         coeff_mat : np.ndarray
             matrix of the linear unmixing coefficients. Should take the form:
             B = AX, where B are the unmixed values, A is coeff_mat and X are
-            the observed values. coeff_mat has shape (n_ch, n_ch).
-
-        Returns
-        -------
-        np.ndarray :
-          Numpy array of same shape as image
+            the observed values. coeff_mat has shape (n_ch, n_ch), or (n_round, n_ch, n_ch).
 
         """
-
-        x = image.sizes[Axes.X.value]
-        y = image.sizes[Axes.Y.value]
-        c = image.sizes[Axes.CH.value]
-
-        # broadcast each channel coefficient across x and y
-        broadcast_coeff = np.tile(coeff_mat, reps=x * y).reshape(c, y, x, c)
-
-        # multiply the image by each coefficient
-        unmixed_image = np.sum(image.values[..., None] * broadcast_coeff, axis=-1)
-
-        return unmixed_image
+        data = image.values
+        coeff_mat = np.asarray(coeff_mat, dtype=data.dtype)
+
+        *leading_shape, y, x = data.shape
+        block_rows = max(1, _BLOCK_BYTES // (int(np.prod(leading_shape)) * x * data.itemsize))
+        buffer = np.empty(leading_shape + [block_rows * x], dtype=data.dtype)
+
+        for y_min in range(0, y, block_rows):
+            y_max = min(y_min + block_rows, y)
+            block = data[..., y_min:y_max, :]
+            unmixed = buffer[..., :(y_max - y_min) * x]
+            # contract the channel axis of each pixel in the block: (ch, ch) @ (ch, pixels)
+            np.matmul(coeff_mat, block.reshape(leading_shape + [-1]), out=unmixed)
+            np.clip(unmixed, 0, 1, out=unmixed)
+            block[...] = unmixed.reshape(block.shape)
 
     def run(
             self,
@@ -87,13 +96,27 @@ class LinearUnmixing(FilterAlgorithmBase):
             original stack.
 
         """
-        group_by = {Axes.ROUND, Axes.ZPLANE}
-        unmix = partial(self._unmix, coeff_mat=self.coeff_mat)
-        result = stack.apply(
-            unmix,
-            group_by=group_by, verbose=verbose, in_place=in_place, n_processes=n_processes
+        coeff_mat = np.asarray(self.coeff_mat)
+        n_ch = stack.shape[Axes.CH]
+        if coeff_mat.shape == (n_ch, n_ch):
+            group_by = {Axes.ROUND, Axes.ZPLANE}
+        elif coeff_mat.shape == (stack.shape[Axes.ROUND], n_ch, n_ch):
+            # each worker unmixes every round of a z-plane, each with its own matrix
+            group_by = {Axes.ZPLANE}
+        else:
+            raise ValueError(
+                f"coeff_mat must have shape (n_ch, n_ch) or (n_round, n_ch, n_ch), not "
+                f"{coeff_mat.shape} for an ImageStack with {stack.shape[Axes.ROUND]} rounds and "
+                f"{n_ch} channels")
+
+        if not in_place:
+            stack = deepcopy(stack)
+
+        stack.transform(
+            self._unmix,
+            group_by=group_by, verbose=verbose, n_processes=n_processes, coeff_mat=coeff_mat
         )
-        return result
+        return stack
 
     @staticmethod
     @click.command("LinearUnmixing")
@@ -1,5 +1,5 @@
 from functools import partial
-from typing import Optional, Set
+from typing import Optional, Set, Union
 
 import numpy as np
 import xarray as xr
@@ -9,12 +9,13 @@ from starfish.imagestack.imagestack import ImageStack
 from starfish.types import Axes
 from starfish.util import click, enum
 from ._base import FilterAlgorithmBase
+from .util import intensity_histogram
 
 
 class MatchHistograms(FilterAlgorithmBase):
 
     def __init__(
-            self, group_by: Set[Axes]
+            self, group_by: Set[Axes], engine: str='exact', n_bins: int=4096,
     ) -> None:
         """Normalize data by matching distributions of each tile or volume to a reference volume
 
@@ -33,11 +34,29 @@ class MatchHistograms(FilterAlgorithmBase):
         Parameters
         ----------
         group_by : Set[Axes]
+        engine : str ['exact', 'histogram']
+            'exact' sorts the intensities of every chunk to compute the reference distribution,
+            then sorts each chunk again to match it. 'histogram' counts the intensities of each
+            chunk into n_bins equal bins over [0, 1] in parallel, averages the quantile functions
+            of the histograms into a reference of n_bins + 1 quantiles, and maps each chunk through
+            its own cumulative histogram and the reference by linear interpolation. Intensities
+            within a bin are treated as evenly spread, so each matched intensity is within about
+            2 / n_bins in quantile of the intensity matched by 'exact'; in sparse tails of the
+            distribution this can be a larger difference in intensity. (default 'exact')
+        n_bins : int
+            number of histogram bins (and reference quantiles) used by the 'histogram' engine.
+            (default 4096)
         """
+        if engine not in self._engines:
+            raise ValueError(f"engine must be one of {self._engines}, not {engine}")
         self.group_by = group_by
+        self.engine = engine
+        self.n_bins = n_bins
 
     _DEFAULT_TESTING_PARAMETERS = {"group_by": {Axes.CH, Axes.ROUND}}
 
+    _engines = {'exact', 'histogram'}
+
     def _compute_reference_distribution(self, data: ImageStack) -> xr.DataArray:
         """compute the average reference distribution across the ImageStack"""
         chunk_key = enum.harmonize(data.shape.keys() - self.group_by)
@@ -52,6 +71,67 @@ class MatchHistograms(FilterAlgorithmBase):
         reference = reference.unstack("chunk_key")
         return reference
 
+    @staticmethod
+    def _cumulative_histogram(image: Union[xr.DataArray, np.ndarray], n_bins: int) -> np.ndarray:
+        """return the fraction of the intensities of image that fall below each of the n_bins + 1
+        edges of n_bins equal bins over [0, 1]"""
+        cdf = np.zeros(n_bins + 1)
+        np.cumsum(intensity_histogram(image, n_bins), out=cdf[1:])
+        cdf /= cdf[-1]
+        return cdf
+
+    @staticmethod
+    def _quantiles(cdf: np.ndarray, probabilities: np.ndarray) -> np.ndarray:
+        """invert a cumulative histogram from _cumulative_histogram at probabilities"""
+        n_bins = cdf.size - 1
+        edges = np.linspace(0, 1, n_bins + 1)
+        # interpolate only across occupied bins, so the ends of the quantile function are the edges
+        # of the lowest and highest occupied bins rather than 0 and 1
+        occupied = np.flatnonzero(np.diff(cdf) > 0)
+        cumulative = np.stack([cdf[occupied], cdf[occupied + 1]], axis=1).ravel()
+        intensities = np.stack([edges[occupied], edges[occupied + 1]], axis=1).ravel()
+        return np.interp(probabilities, cumulative, intensities)
+
+    def _compute_reference_quantiles(
+            self, data: ImageStack, verbose: bool=False, n_processes: Optional[int]=None,
+    ) -> np.ndarray:
+        """compute the average quantile function of the chunks of the ImageStack at n_bins + 1
+        evenly spaced probabilities from their histograms"""
+        cumulative_histograms = data.transform(
+            self._cumulative_histogram,
+            group_by=self.group_by, verbose=verbose, n_processes=n_processes, n_bins=self.n_bins
+        )
+        probabilities = np.linspace(0, 1, self.n_bins + 1)
+        return np.mean([
+            self._quantiles(cdf, probabilities) for cdf, _ in cumulative_histograms], axis=0)
+
+    @staticmethod
+    def _match_histogram_quantiles(
+        image: xr.DataArray, reference_quantiles: np.ndarray
+    ) -> np.ndarray:
+        """
+        matches the intensity distribution of image to the quantile function reference_quantiles,
+        evaluated at evenly spaced probabilities
+
+        Parameters
+        ----------
+        image : xr.DataArray
+            3-d image data
+        reference_quantiles : np.ndarray
+            n_bins + 1 intensities of the reference distribution
+
+        Returns
+        -------
+        np.ndarray :
+            image, with intensities matched to reference_quantiles
+        """
+        n_bins = reference_quantiles.size - 1
+        image = np.asarray(image)
+        cdf = MatchHistograms._cumulative_histogram(image, n_bins)
+        quantile = np.interp(image, np.linspace(0, 1, n_bins + 1), cdf)
+        matched = np.interp(quantile, np.linspace(0, 1, n_bins + 1), reference_quantiles)
+        return matched.astype(np.float32)
+
     @staticmethod
     def _match_histograms(
         image: xr.DataArray, reference: np.ndarray
@@ -103,8 +183,14 @@ class MatchHistograms(FilterAlgorithmBase):
         """
         if verbose:
             print("Calculating reference distribution...")
-        reference_image = self._compute_reference_distribution(stack)
-        apply_function = partial(self._match_histograms, reference=reference_image)
+        if self.engine == 'histogram':
+            reference_quantiles = self._compute_reference_quantiles(
+                stack, verbose=verbose, n_processes=n_processes)
+            apply_function = partial(
+                self._match_histogram_quantiles, reference_quantiles=reference_quantiles)
+        else:
+            reference_image = self._compute_reference_distribution(stack)
+            apply_function = partial(self._match_histograms, reference=reference_image)
         result = stack.apply(
             apply_function,
             group_by=self.group_by, verbose=verbose, in_place=in_place, n_processes=n_processes
@@ -119,6 +205,13 @@ class MatchHistograms(FilterAlgorithmBase):
               "e.g. {'c', 'r'} would equalize each volume, whereas {'c',} would equalize all "
               "volumes within a channel.")
     )
+    @click.option(
+        "--engine", default='exact',
+        help="str ['exact', 'histogram'] how to compute and match the reference distribution. "
+             "Default: exact")
+    @click.option(
+        "--n-bins", default=4096, type=int,
+        help="number of histogram bins used by the histogram engine")
     @click.pass_context
-    def _cli(ctx, group_by):
-        ctx.obj["component"]._cli_run(ctx, MatchHistograms(group_by))
+    def _cli(ctx, group_by, engine, n_bins):
+        ctx.obj["component"]._cli_run(ctx, MatchHistograms(group_by, engine, n_bins))
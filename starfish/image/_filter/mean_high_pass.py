@@ -10,6 +10,7 @@ from starfish.types import Clip, Number
 from starfish.util import click
 from starfish.util.dtype import preserve_float_range
 from ._base import FilterAlgorithmBase
+from .integral_image import IntegralImage
 from .util import (
     determine_axes_to_group_by, validate_and_broadcast_kernel_size
 )
@@ -19,7 +20,7 @@ class MeanHighPass(FilterAlgorithmBase):
 
     def __init__(
         self, size: Union[Number, Tuple[Number]], is_volume: bool=False,
-        clip_method: Union[str, Clip]=Clip.CLIP
+        clip_method: Union[str, Clip]=Clip.CLIP, engine: str='uniform_filter',
     ) -> None:
         """Mean high pass filter.
 
@@ -48,14 +49,23 @@ class MeanHighPass(FilterAlgorithmBase):
             Clip.SCALE_BY_CHUNK: data above 1 are scaled by the maximum value, with the maximum
                 value calculated over each slice, where slice shapes are determined by the group_by
                 parameters
+        engine : str ['uniform_filter', 'integral_image']
+            'uniform_filter' computes the mean with scipy.ndimage.uniform_filter. 'integral_image'
+            computes it from a summed-area table (see IntegralImage) and writes the difference
+            and clipping into a single output buffer; the results are equal up to floating point
+            rounding. (default 'uniform_filter')
         """
-
+        if engine not in self._engines:
+            raise ValueError(f"engine must be one of {self._engines}, not {engine}")
         self.size = validate_and_broadcast_kernel_size(size, is_volume)
         self.is_volume = is_volume
         self.clip_method = clip_method
+        self.engine = engine
 
     _DEFAULT_TESTING_PARAMETERS = {"size": 1}
 
+    _engines = {'uniform_filter', 'integral_image'}
+
     @staticmethod
     def _high_pass(
         image: Union[xr.DataArray, np.ndarray], size: Number, rescale: bool=False
@@ -85,6 +95,25 @@ class MeanHighPass(FilterAlgorithmBase):
 
         return filtered
 
+    @staticmethod
+    def _high_pass_integral(
+        image: Union[xr.DataArray, np.ndarray], size: Number, rescale: bool=False
+    ) -> np.ndarray:
+        """_high_pass, computing the mean from the summed-area table of image"""
+        image = np.asarray(image)
+        blurred = IntegralImage(image, size).box_mean(size)
+
+        filtered = np.empty(image.shape, dtype=np.float32)
+        np.subtract(image, blurred, out=filtered, casting='same_kind')
+        preserve_float_range(filtered, rescale, out=filtered)
+
+        return filtered
+
+    def _tile_function(self, stack: ImageStack) -> Callable[[np.ndarray], np.ndarray]:
+        if self.engine == 'integral_image':
+            return partial(self._high_pass_integral, size=self.size)
+        return partial(self._high_pass, size=self.size)
+
     def run(
             self,
             stack: ImageStack,
@@ -114,9 +143,8 @@ class MeanHighPass(FilterAlgorithmBase):
 
         """
         group_by = determine_axes_to_group_by(self.is_volume)
-        high_pass: Callable = partial(self._high_pass, size=self.size)
         result = stack.apply(
-            high_pass,
+            self._tile_function(stack),
             group_by=group_by, verbose=verbose, in_place=in_place, n_processes=n_processes,
             clip_method=self.clip_method
         )
@@ -133,6 +161,10 @@ class MeanHighPass(FilterAlgorithmBase):
         "--clip-method", default=Clip.CLIP, type=Clip,
         help="method to constrain data to [0,1]. options: 'clip', 'scale_by_image', "
              "'scale_by_chunk'")
+    @click.option(
+        "--engine", default='uniform_filter',
+        help="str ['uniform_filter', 'integral_image'] how to compute the mean. "
+             "Default: uniform_filter")
     @click.pass_context
-    def _cli(ctx, size, is_volume, clip_method):
-        ctx.obj["component"]._cli_run(ctx, MeanHighPass(size, is_volume, clip_method))
+    def _cli(ctx, size, is_volume, clip_method, engine):
+        ctx.obj["component"]._cli_run(ctx, MeanHighPass(size, is_volume, clip_method, engine))
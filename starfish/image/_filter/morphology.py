@@ -0,0 +1,240 @@
+"""Fast approximations of grey-level opening with flat disk and ball structuring elements, used
+by WhiteTophat.
+
+The 'decomposed' opening replaces the disk (ball) by a Minkowski sum of line segments along the
+axes, the diagonals of each plane and, in 3-d, the diagonals of the cube. Erosion (dilation) by a
+Minkowski sum is the sequence of erosions (dilations) by its segments, and a running minimum
+(maximum) along a segment costs O(log(length)) per pixel, so the opening costs O(log(radius)) per
+pixel instead of O(radius ** 2) (O(radius ** 3) for a ball). Segment lengths are chosen so that the
+polygon (polyhedron) they generate has the smallest symmetric difference with skimage's disk (ball).
+
+The 'downsampled' opening shrinks the image by taking the minimum of each block of pixels, opens
+the small image with a proportionally smaller disk (ball), and interpolates the result back to
+full size, as ImageJ's rolling ball background subtraction does for large radii.
+"""
+from functools import lru_cache
+from itertools import product
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.ndimage import (
+    maximum_filter1d,
+    minimum_filter1d,
+    zoom,
+)
+from skimage.morphology import ball, disk, opening
+
+# a line segment of the decomposition: direction (one step, in {-1, 0, 1} per axis) and half length
+_Segment = Tuple[Tuple[int, ...], int]
+
+
+def _identity(dtype: np.dtype, reduce: np.ufunc):
+    """the value that pixels outside the image take for reduce: the largest value of dtype for
+    np.minimum and the smallest for np.maximum"""
+    if np.issubdtype(dtype, np.floating):
+        return np.inf if reduce is np.minimum else -np.inf
+    info = np.iinfo(dtype)
+    return info.max if reduce is np.minimum else info.min
+
+
+def _shifted_reduce(
+        array: np.ndarray, step: Sequence[int], shift: int, reduce: np.ufunc
+) -> np.ndarray:
+    """return reduce(array[p], array[p + shift * step]) for every pixel p, keeping array[p] where
+    p + shift * step falls outside array"""
+    result = array.copy()
+    target, source = [], []
+    for axis_step, size in zip(step, array.shape):
+        offset = axis_step * shift
+        target.append(slice(max(-offset, 0), size - max(offset, 0)))
+        source.append(slice(max(offset, 0), size - max(-offset, 0)))
+    reduce(result[tuple(target)], array[tuple(source)], out=result[tuple(target)])
+    return result
+
+
+def line_filter(
+        image: np.ndarray, step: Sequence[int], half_length: int, reduce: np.ufunc
+) -> np.ndarray:
+    """
+    Running minimum (reduce=np.minimum) or maximum (reduce=np.maximum) of image over the line
+    segment of pixels p + t * step, for t in [-half_length, half_length]. Pixels outside the image
+    are ignored.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        image to filter
+    step : Sequence[int]
+        direction of the line, as a step of -1, 0 or 1 along each axis of image
+    half_length : int
+        number of steps the segment extends on either side of each pixel
+    reduce : np.ufunc
+        np.minimum to erode, or np.maximum to dilate
+
+    Returns
+    -------
+    np.ndarray :
+        filtered image
+
+    """
+    if half_length == 0:
+        return image
+    axes = np.flatnonzero(step)
+    if len(axes) == 1:
+        # axis-aligned lines use scipy's running filters; 'nearest' extension leaves the extremum
+        # of each window unchanged, just like ignoring pixels outside the image
+        filter1d = minimum_filter1d if reduce is np.minimum else maximum_filter1d
+        return filter1d(image, 2 * half_length + 1, axis=int(axes[0]), mode='nearest')
+
+    # diagonal lines: pad with the identity so that every window lies inside the array, double
+    # the window until it covers half the segment, then combine two overlapping windows, which is
+    # exact because minima and maxima are idempotent
+    pad_width = [(half_length, half_length) if s else (0, 0) for s in step]
+    reduced = np.pad(
+        image, pad_width, mode='constant', constant_values=_identity(image.dtype, reduce))
+    length = 2 * half_length + 1
+    window = 1
+    while 2 * window <= length:
+        reduced = _shifted_reduce(reduced, step, window, reduce)
+        window *= 2
+    if window < length:
+        reduced = _shifted_reduce(reduced, step, length - window, reduce)
+
+    # the window of padded pixel q starts at q; the centered window of p starts at p - h * step
+    crop = tuple(
+        slice(half_length * (1 - s), half_length * (1 - s) + n) if s else slice(None)
+        for s, n in zip(step, image.shape))
+    return reduced[crop]
+
+
+def _line_families(n_dim: int) -> List[List[Tuple[int, ...]]]:
+    """directions of the segments of the decomposition, grouped into families that share a half
+    length: the axes, the diagonals of each plane and, in 3-d, the diagonals of the cube"""
+    families: List[List[Tuple[int, ...]]] = [[] for _ in range(n_dim)]
+    for step in product((-1, 0, 1), repeat=n_dim):
+        nonzero = [s for s in step if s]
+        # count each line once, by the direction whose first nonzero step is positive
+        if nonzero and nonzero[0] == 1:
+            families[len(nonzero) - 1].append(step)
+    return families
+
+
+def _segments(
+        families: Sequence[Sequence[Tuple[int, ...]]], half_lengths: Sequence[int]
+) -> List[_Segment]:
+    return [
+        (step, half_length)
+        for family, half_length in zip(families, half_lengths)
+        for step in family
+        if half_length
+    ]
+
+
+def _footprint(radius: int, n_dim: int) -> np.ndarray:
+    return disk(radius) if n_dim == 2 else ball(radius)
+
+
+def _segments_footprint(segments: Sequence[_Segment], radius: int, n_dim: int) -> np.ndarray:
+    """the structuring element generated by segments, in a (2 * radius + 1) ** n_dim array"""
+    footprint = np.zeros((2 * radius + 1,) * n_dim, dtype=np.uint8)
+    footprint[(radius,) * n_dim] = 1
+    for step, half_length in segments:
+        footprint = line_filter(footprint, step, half_length, np.maximum)
+    return footprint
+
+
+@lru_cache(maxsize=32)
+def decompose(radius: int, n_dim: int) -> Tuple[_Segment, ...]:
+    """
+    Return the line segments whose Minkowski sum best approximates skimage's disk (n_dim=2) or
+    ball (n_dim=3) of radius.
+
+    Segments run along each axis, along both diagonals of each plane and, in 3-d, along the four
+    diagonals of the cube. The half length of each family of segments is chosen to minimize the
+    number of pixels in the symmetric difference between the generated polygon (polyhedron) and
+    the disk (ball).
+    """
+    target = _footprint(radius, n_dim).astype(bool)
+    families = _line_families(n_dim)
+    # the number of segments of each family that extend along any one axis
+    axis_extents = [sum(1 for step in family if step[0]) for family in families]
+
+    best: List[_Segment] = []
+    best_key: Optional[Tuple[int, int]] = None
+    for half_lengths in product(range(radius + 1), repeat=n_dim):
+        # the generated shape must fit in the bounding box of the disk
+        if np.dot(half_lengths, axis_extents) > radius:
+            continue
+        segments = _segments(families, half_lengths)
+        generated = _segments_footprint(segments, radius, n_dim).astype(bool)
+        # among equally good approximations, prefer the larger one
+        key = (np.count_nonzero(generated != target), -np.count_nonzero(generated))
+        if best_key is None or key < best_key:
+            best, best_key = segments, key
+    return tuple(best)
+
+
+def decomposed_opening(image: np.ndarray, radius: int) -> np.ndarray:
+    """grey-level opening of a 2-d or 3-d image with the line decomposition of a disk (ball) of
+    radius"""
+    segments = decompose(radius, image.ndim)
+    opened = image
+    for step, half_length in segments:
+        opened = line_filter(opened, step, half_length, np.minimum)
+    for step, half_length in segments:
+        opened = line_filter(opened, step, half_length, np.maximum)
+    return opened
+
+
+def shrink_factor(radius: int) -> int:
+    """the factor by which ImageJ's rolling ball background subtraction shrinks images for a
+    radius"""
+    if radius <= 10:
+        return 1
+    elif radius <= 30:
+        return 2
+    elif radius <= 100:
+        return 4
+    return 8
+
+
+def _ellipsoid(radii: Sequence[float]) -> np.ndarray:
+    grid = np.ogrid[tuple(slice(-int(r), int(r) + 1) for r in radii)]
+    squared_distance = np.zeros([2 * int(r) + 1 for r in radii])
+    for axis_grid, r in zip(grid, radii):
+        squared_distance = squared_distance + (axis_grid / r) ** 2
+    return (squared_distance <= 1).astype(np.uint8)
+
+
+def downsampled_opening(image: np.ndarray, radius: int) -> np.ndarray:
+    """
+    Approximate the grey-level opening of a 2-d or 3-d image with a disk (ball) of radius by
+    opening an image shrunk by shrink_factor(radius) along y and x with a proportionally smaller
+    structuring element, then interpolating back to full size. The result is never larger than
+    image.
+    """
+    factor = shrink_factor(radius)
+    if factor == 1:
+        return opening(image, _footprint(radius, image.ndim))
+
+    # minimum of each (factor x factor) block, padding the edges with their nearest pixels
+    pad_width = [(0, 0)] * (image.ndim - 2) + [(0, -n % factor) for n in image.shape[-2:]]
+    padded = np.pad(image, pad_width, mode='edge')
+    blocks_shape: List[int] = list(image.shape[:-2])
+    for n in padded.shape[-2:]:
+        blocks_shape += [n // factor, factor]
+    shrunk = padded.reshape(blocks_shape).min(axis=(-3, -1))
+
+    radii = [float(radius)] * (image.ndim - 2) + [radius / factor] * 2
+    shrunk_opened = opening(shrunk, _ellipsoid(radii))
+
+    # interpolate the shrunk background back to full size
+    zoomed = zoom(shrunk_opened.astype(np.float64), [1] * (image.ndim - 2) + [factor] * 2, order=1)
+    opened = zoomed[tuple(slice(0, n) for n in image.shape)].astype(image.dtype, copy=False)
+    return np.minimum(opened, image)
+
+
+OPENINGS: Dict[str, Callable[[np.ndarray, int], np.ndarray]] = {
+    'decomposed': decomposed_opening,
+    'downsampled': downsampled_opening,
+}
@@ -1,21 +1,27 @@
+from copy import deepcopy
 from functools import partial
-from typing import Optional, Union
+from typing import Callable, Optional, Tuple, Union
 
 import numpy as np
 import xarray as xr
 
 from starfish.imagestack.imagestack import ImageStack
-from starfish.types import Clip
+from starfish.types import Axes, Clip
 from starfish.util import click
 from ._base import FilterAlgorithmBase
-from .util import determine_axes_to_group_by
+from .util import (
+    determine_axes_to_group_by,
+    histogram_percentile,
+    intensity_histogram,
+    PERCENTILE_ENGINES,
+)
 
 
 class ScaleByPercentile(FilterAlgorithmBase):
 
     def __init__(
         self, p: int=0, is_volume: bool=False,
-        clip_method: Union[str, Clip]=Clip.CLIP
+        clip_method: Union[str, Clip]=Clip.CLIP, engine: str='exact', n_bins: int=4096,
     ) -> None:
         """Image scaling filter
 
@@ -34,10 +40,22 @@ class ScaleByPercentile(FilterAlgorithmBase):
             Clip.SCALE_BY_CHUNK: data above 1 are scaled by the maximum value, with the maximum
                 value calculated over each slice, where slice shapes are determined by the group_by
                 parameters
+        engine : str ['exact', 'histogram']
+            'exact' computes each percentile with np.percentile. 'histogram' estimates it from an
+            n_bins histogram of the tile, to within 1 / n_bins, without copying or sorting the
+            tile. With Clip.SCALE_BY_IMAGE, the 'histogram' engine also finds the maximum of the
+            scaled ImageStack while the histograms are computed, so the stack is scaled in a
+            single in-place pass. (default 'exact')
+        n_bins : int
+            number of histogram bins used by the 'histogram' engine (default 4096)
         """
+        if engine not in PERCENTILE_ENGINES:
+            raise ValueError(f"engine must be one of {PERCENTILE_ENGINES}, not {engine}")
         self.p = p
         self.is_volume = is_volume
         self.clip_method = clip_method
+        self.engine = engine
+        self.n_bins = n_bins
 
     _DEFAULT_TESTING_PARAMETERS = {"p": 0}
 
@@ -69,6 +87,50 @@ class ScaleByPercentile(FilterAlgorithmBase):
 
         return image
 
+    @staticmethod
+    def _scale_histogram(
+            image: Union[xr.DataArray, np.ndarray], p: int, n_bins: int
+    ) -> np.ndarray:
+        """_scale, estimating the percentile from an n_bins histogram of image"""
+        v = histogram_percentile(intensity_histogram(image, n_bins), p)
+
+        image = image / v
+
+        return image
+
+    @staticmethod
+    def _percentile_and_max(
+            image: xr.DataArray, p: int, n_bins: int
+    ) -> Tuple[float, float]:
+        """estimate the p-th percentile of image from its histogram, and find its maximum"""
+        v = histogram_percentile(intensity_histogram(image, n_bins), p)
+        return float(v), float(image.max())
+
+    def _scale_by_image(
+            self, stack: ImageStack, verbose: bool, n_processes: Optional[int]
+    ) -> None:
+        """scale each tile of stack by its percentile, then scale the stack by the maximum of the
+        scaled tiles if it exceeds 1, in place"""
+        group_by = determine_axes_to_group_by(self.is_volume)
+        percentiles_and_maxima = stack.transform(
+            self._percentile_and_max,
+            group_by=group_by, verbose=verbose, n_processes=n_processes, p=self.p,
+            n_bins=self.n_bins,
+        )
+        image_max = max(tile_max / v for (v, tile_max), _ in percentiles_and_maxima)
+        image_scale = max(image_max, 1)
+
+        data = stack.xarray.values
+        for (v, _), selector in percentiles_and_maxima:
+            tile = data[tuple(
+                selector.get(axis, slice(None)) for axis in (Axes.ROUND, Axes.CH, Axes.ZPLANE))]
+            tile /= v * image_scale
+
+    def _tile_function(self, stack: ImageStack) -> Callable[[np.ndarray], np.ndarray]:
+        if self.engine == 'histogram':
+            return partial(self._scale_histogram, p=self.p, n_bins=self.n_bins)
+        return partial(self._scale, p=self.p)
+
     def run(
             self,
             stack: ImageStack,
@@ -97,10 +159,15 @@ class ScaleByPercentile(FilterAlgorithmBase):
             original stack.
 
         """
+        if self.engine == 'histogram' and self.clip_method == Clip.SCALE_BY_IMAGE:
+            if not in_place:
+                stack = deepcopy(stack)
+            self._scale_by_image(stack, verbose, n_processes)
+            return stack
+
         group_by = determine_axes_to_group_by(self.is_volume)
-        clip = partial(self._scale, p=self.p)
         result = stack.apply(
-            clip,
+            self._tile_function(stack),
             group_by=group_by, verbose=verbose, in_place=in_place, n_processes=n_processes,
             clip_method=self.clip_method
         )
@@ -116,6 +183,13 @@ class ScaleByPercentile(FilterAlgorithmBase):
         "--clip-method", default=Clip.CLIP, type=Clip,
         help="method to constrain data to [0,1]. options: 'clip', 'scale_by_image', "
              "'scale_by_chunk'")
+    @click.option(
+        "--engine", default='exact',
+        help="str ['exact', 'histogram'] how to compute percentiles. Default: exact")
+    @click.option(
+        "--n-bins", default=4096, type=int,
+        help="number of histogram bins used by the histogram engine")
     @click.pass_context
-    def _cli(ctx, p, is_volume, clip_method):
-        ctx.obj["component"]._cli_run(ctx, ScaleByPercentile(p, is_volume, clip_method))
+    def _cli(ctx, p, is_volume, clip_method, engine, n_bins):
+        ctx.obj["component"]._cli_run(
+            ctx, ScaleByPercentile(p, is_volume, clip_method, engine, n_bins))
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter, gaussian_laplace
+
+from starfish.image._filter.bandpass import Bandpass
+from starfish.image._filter.fft_engine import fft_gaussian_filter, select_engine
+from starfish.image._filter.gaussian_high_pass import GaussianHighPass
+from starfish.image._filter.gaussian_low_pass import GaussianLowPass
+from starfish.image._filter.laplace import Laplace
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Clip
+
+
+@pytest.mark.parametrize('mode', ['reflect', 'mirror', 'nearest', 'wrap', 'constant'])
+def test_fft_gaussian_filter_matches_scipy(mode):
+    tiles = np.random.RandomState(0).rand(3, 30, 40).astype(np.float32)
+
+    expected = np.stack([gaussian_filter(tile, (2, 3.5), mode=mode) for tile in tiles])
+    observed = fft_gaussian_filter(tiles, (2, 3.5), mode=mode)
+    assert np.allclose(observed, expected, atol=1e-6)
+
+    expected = np.stack([gaussian_laplace(tile, (2, 0), mode=mode) for tile in tiles])
+    observed = fft_gaussian_filter(tiles, (2, 0), orders=[(2, 0), (0, 2)], mode=mode)
+    assert np.allclose(observed, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize('filter_class, kwargs', [
+    (GaussianLowPass, {'sigma': 2}),
+    (GaussianHighPass, {'sigma': 3}),
+    (Laplace, {'sigma': 1.5}),
+    (Bandpass, {'lshort': 1, 'llong': 5, 'threshold': 0.01}),
+])
+@pytest.mark.parametrize('is_volume', [False, True])
+@pytest.mark.parametrize('clip_method', [Clip.CLIP, Clip.SCALE_BY_CHUNK])
+def test_fft_engine_matches_spatial_engine(filter_class, kwargs, is_volume, clip_method):
+    data = np.random.RandomState(1).rand(2, 2, 3, 30, 40).astype(np.float32)
+    stack = ImageStack.from_numpy_array(data)
+
+    expected = filter_class(
+        **kwargs, is_volume=is_volume, clip_method=clip_method, engine='spatial'
+    ).run(stack, n_processes=1)
+    observed = filter_class(
+        **kwargs, is_volume=is_volume, clip_method=clip_method, engine='fft'
+    ).run(stack, n_processes=1)
+    assert np.allclose(observed.xarray.values, expected.xarray.values, atol=1e-6)
+
+
+def test_auto_engine_prefers_fft_for_large_sigma():
+    assert select_engine('auto', (1024, 1024), (1, 1)) == 'spatial'
+    assert select_engine('auto', (1024, 1024), (32, 32)) == 'fft'
+    assert select_engine('auto', (1024, 1024), (32, 32), mode=['reflect', 'wrap']) == 'spatial'
+    assert select_engine('spatial', (1024, 1024), (32, 32)) == 'spatial'
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from starfish.image._filter.clip import Clip as ClipFilter
+from starfish.image._filter.filter_pipeline import FilterPipeline
+from starfish.image._filter.gaussian_low_pass import GaussianLowPass
+from starfish.image._filter.max_proj import MaxProj
+from starfish.image._filter.scale_by_percentile import ScaleByPercentile
+from starfish.image._filter.white_tophat import WhiteTophat
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Clip
+
+
+def random_image_stack() -> ImageStack:
+    data = np.random.RandomState(0).uniform(0, 1, (2, 2, 3, 30, 40)).astype(np.float32)
+    return ImageStack.from_numpy_array(data)
+
+
+def notebook_filters(is_volume: bool=False):
+    return [
+        ClipFilter(p_min=10, p_max=100),
+        WhiteTophat(masking_radius=3, is_volume=is_volume),
+        GaussianLowPass(sigma=1),
+        ScaleByPercentile(p=99, clip_method=Clip.SCALE_BY_CHUNK),
+    ]
+
+
+@pytest.mark.parametrize('is_volume', [False, True])
+def test_pipeline_matches_chained_filters(is_volume):
+    stack = random_image_stack()
+
+    expected = stack
+    for step in notebook_filters(is_volume):
+        expected = step.run(expected, n_processes=1)
+
+    observed = FilterPipeline(notebook_filters(is_volume)).run(stack, n_processes=1)
+
+    assert np.allclose(observed.xarray.values, expected.xarray.values)
+    # the input is not modified, and each step is logged
+    assert np.array_equal(stack.xarray.values, random_image_stack().xarray.values)
+    assert [entry['method'] for entry in observed.log] == [
+        'Clip', 'WhiteTophat', 'GaussianLowPass', 'ScaleByPercentile']
+
+
+def test_pipeline_scales_by_image_between_passes():
+    stack = random_image_stack()
+    pipeline = FilterPipeline([
+        ScaleByPercentile(p=50, clip_method=Clip.SCALE_BY_IMAGE),
+        ClipFilter(p_min=0, p_max=90),
+    ])
+    assert len(pipeline._passes()) == 2
+
+    observed = pipeline.run(stack, n_processes=1).xarray.values
+    data = stack.xarray.values
+    scaled = data / np.percentile(data, 50, axis=(-2, -1))[..., None, None]
+    scaled /= scaled.max()
+    expected = np.clip(scaled, None, np.percentile(scaled, 90, axis=(-2, -1))[..., None, None])
+    assert np.allclose(observed, expected, atol=1e-6)
+
+
+def test_pipeline_rejects_filters_that_need_the_whole_stack():
+    stack = random_image_stack()
+    pipeline = FilterPipeline([MaxProj(dims=['r'])])
+    with pytest.raises(NotImplementedError):
+        pipeline.run(stack, n_processes=1)
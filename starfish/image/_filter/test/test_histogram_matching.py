@@ -30,3 +30,25 @@ def test_match_histograms():
     mh = MatchHistograms({Axes.ROUND})
     results2 = mh.run(stack)
     assert len(np.unique(results2.xarray.sum(("x", "y", "z")))) == 4
+
+
+def test_histogram_engine_matches_exact_within_quantile_resolution():
+    rs = np.random.RandomState(0)
+    image = rs.gamma(2, 0.05, (2, 3, 1, 60, 70)) * rs.uniform(0.5, 1.5, (2, 3, 1, 1, 1))
+    stack = ImageStack.from_numpy_array(np.clip(image, 0, 1).astype(np.float32))
+    n_bins = 256
+
+    for group_by in ({Axes.CH, Axes.ROUND}, {Axes.CH}):
+        exact = MatchHistograms(group_by).run(stack, n_processes=1).xarray.values
+        sketched = MatchHistograms(group_by, engine='histogram', n_bins=n_bins).run(
+            stack, n_processes=1).xarray.values
+
+        # compare the quantiles of the matched intensities within each exactly matched volume
+        for r in range(2):
+            for c in range(3):
+                reference = np.sort(exact[r, c].ravel())
+                exact_quantiles = np.searchsorted(reference, exact[r, c].ravel(), side='right')
+                sketched_quantiles = np.searchsorted(
+                    reference, sketched[r, c].ravel(), side='right')
+                error = np.abs(exact_quantiles - sketched_quantiles) / reference.size
+                assert error.max() <= 2 / n_bins
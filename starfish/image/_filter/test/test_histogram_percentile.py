@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from starfish.image._filter.clip import Clip as ClipFilter
+from starfish.image._filter.scale_by_percentile import ScaleByPercentile
+from starfish.image._filter.util import histogram_percentile, intensity_histogram
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Clip
+
+
+def gamma_image(shape) -> np.ndarray:
+    return np.clip(np.random.RandomState(0).gamma(2, 0.05, shape), 0, 1).astype(np.float32)
+
+
+@pytest.mark.parametrize('size', [1, 10, 10000])
+def test_histogram_percentile_is_within_one_bin(size):
+    image = gamma_image(size)
+    n_bins = 256
+    q = [0, 1, 5, 50, 99, 99.9, 100]
+
+    estimate = histogram_percentile(intensity_histogram(image, n_bins), q)
+
+    assert np.all(np.abs(estimate - np.percentile(image, q)) <= 1 / n_bins)
+
+
+def test_histogram_percentiles_of_tiles_can_be_combined():
+    image = gamma_image((4, 100))
+    counts = sum(intensity_histogram(tile, 256) for tile in image)
+    assert np.abs(histogram_percentile(counts, 90) - np.percentile(image, 90)) <= 1 / 256
+
+
+@pytest.mark.parametrize('clip_method', [Clip.CLIP, Clip.SCALE_BY_CHUNK, Clip.SCALE_BY_IMAGE])
+def test_scale_by_percentile_histogram_engine(clip_method):
+    data = gamma_image((2, 3, 2, 30, 40))
+    stack = ImageStack.from_numpy_array(data)
+
+    estimated = ScaleByPercentile(
+        p=95, clip_method=clip_method, engine='histogram', n_bins=1024).run(stack, n_processes=1)
+
+    expected = data / np.percentile(data, 95, axis=(-2, -1), keepdims=True)
+    if clip_method == Clip.CLIP:
+        expected = np.clip(expected, 0, 1)
+    elif clip_method == Clip.SCALE_BY_CHUNK:
+        expected /= np.maximum(expected.max(axis=(-2, -1), keepdims=True), 1)
+    else:
+        expected /= expected.max()
+    # a percentile within one bin of ~0.2 changes the scale of each tile by at most ~0.5%
+    assert np.allclose(estimated.xarray.values, expected, rtol=1e-2, atol=1e-3)
+    assert np.array_equal(stack.xarray.values, data)
+
+
+def test_clip_histogram_engine():
+    stack = ImageStack.from_numpy_array(gamma_image((2, 3, 2, 30, 40)))
+
+    exact = ClipFilter(p_min=5, p_max=95).run(stack, n_processes=1)
+    estimated = ClipFilter(p_min=5, p_max=95, engine='histogram', n_bins=1024).run(
+        stack, n_processes=1)
+
+    assert np.allclose(estimated.xarray.values, exact.xarray.values, atol=1 / 1024)
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from scipy.ndimage import uniform_filter
+
+from starfish.image._filter.integral_image import IntegralImage
+from starfish.image._filter.mean_high_pass import MeanHighPass
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Clip
+
+
+@pytest.mark.parametrize('shape, sizes', [
+    ((37, 41), [1, 2, 3, 4, 7, (3, 8), 30]),
+    ((5, 20, 22), [1, 3, (3, 9, 9), (1, 2, 4)]),
+])
+def test_box_means_match_uniform_filter(shape, sizes):
+    image = np.random.RandomState(0).uniform(0, 1, shape).astype(np.float32)
+    table = IntegralImage(image, max_size=30)
+
+    # one table serves every size
+    for size in sizes:
+        expected = uniform_filter(image.astype(np.float64), size)
+        assert np.allclose(table.box_mean(size), expected, atol=1e-12)
+
+
+def test_box_size_must_fit_the_table():
+    table = IntegralImage(np.zeros((10, 10)), max_size=3)
+    with pytest.raises(ValueError):
+        table.box_mean(5)
+
+
+@pytest.mark.parametrize('is_volume', [False, True])
+@pytest.mark.parametrize('clip_method', [Clip.CLIP, Clip.SCALE_BY_CHUNK])
+def test_mean_high_pass_engines_agree(is_volume, clip_method):
+    data = np.random.RandomState(0).uniform(0, 1, (2, 2, 4, 30, 40)).astype(np.float32)
+    stack = ImageStack.from_numpy_array(data)
+
+    expected = MeanHighPass(
+        size=5, is_volume=is_volume, clip_method=clip_method).run(stack, n_processes=1)
+    observed = MeanHighPass(
+        size=5, is_volume=is_volume, clip_method=clip_method, engine='integral_image',
+    ).run(stack, n_processes=1)
+
+    assert np.allclose(observed.xarray.values, expected.xarray.values, atol=1e-6)
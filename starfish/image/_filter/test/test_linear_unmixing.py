@@ -32,3 +32,22 @@ def test_linear_unmixing():
     stack2 = filter_unmix.run(stack, in_place=False, verbose=False, n_processes=1)
 
     assert np.all(ref_result == stack2.xarray.values)
+
+def test_linear_unmixing_mixes_channels():
+    """ Each unmixed channel is a combination of the observed channels, with one matrix per round
+    """
+    data = np.random.RandomState(0).uniform(0, 1, (2, 3, 2, 9, 7)).astype(np.float32)
+    stack = ImageStack.from_numpy_array(data)
+    coeff_mat = np.array([
+        [[1, -0.25, 0], [0, 1, -0.1], [0.2, 0, 0.5]],
+        [[0.5, 0, 0], [-0.25, 1, -0.25], [0, 0.3, 0.6]],
+    ])
+
+    unmixed = LinearUnmixing(coeff_mat=coeff_mat).run(stack, n_processes=1)
+
+    expected = np.clip(np.einsum('rij,rjzyx->rizyx', coeff_mat, data), 0, 1)
+    assert np.allclose(unmixed.xarray.values, expected, atol=1e-6)
+
+    shared = LinearUnmixing(coeff_mat=coeff_mat[1]).run(stack, n_processes=1)
+    expected = np.clip(np.einsum('ij,rjzyx->rizyx', coeff_mat[1], data), 0, 1)
+    assert np.allclose(shared.xarray.values, expected, atol=1e-6)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from starfish.image._filter.richardson_lucy_deconvolution import DeconvolvePSF
+from starfish.imagestack.imagestack import ImageStack
+
+
+def blurred_spots_image_stack() -> ImageStack:
+    np.random.seed(0)
+    data = np.zeros((2, 1, 1, 40, 50), dtype=np.float32)
+    data[:, :, :, np.random.randint(0, 40, 20), np.random.randint(0, 50, 20)] = 0.8
+    data += np.random.uniform(0, 0.05, data.shape).astype(np.float32)
+    return ImageStack.from_numpy_array(data)
+
+
+def test_rfft_engine_matches_scipy_engine():
+    stack = blurred_spots_image_stack()
+    expected = DeconvolvePSF(num_iter=15, sigma=2).run(stack, n_processes=1)
+    observed = DeconvolvePSF(num_iter=15, sigma=2, engine='rfft').run(stack, n_processes=1)
+    assert np.allclose(observed.xarray.values, expected.xarray.values, atol=1e-5)
+
+
+def test_rfft_engine_stops_early():
+    image = blurred_spots_image_stack().xarray.values[0, 0, 0]
+    psf = DeconvolvePSF(num_iter=1, sigma=2).psf
+    converged = DeconvolvePSF._richardson_lucy_deconv_rfft(image, 100, psf, tolerance=0.05)
+    assert converged.dtype == np.float32
+
+    # the early-stopped estimate is the estimate after some smaller number of iterations
+    n_iterations = [
+        n for n in range(1, 100)
+        if np.allclose(converged, DeconvolvePSF._richardson_lucy_deconv_rfft(image, n, psf))
+    ]
+    assert n_iterations
@@ -1,7 +1,9 @@
 import numpy as np
 import pytest
 from skimage.filters import gaussian
+from skimage.morphology import opening
 
+from starfish.image._filter.morphology import _segments_footprint, decompose, decomposed_opening
 from starfish.image._filter.white_tophat import WhiteTophat
 
 
@@ -52,3 +54,46 @@ def test_white_tophat(is_volume: bool):
         small_ratio = filtered[80, 80] / small_spot_intensity
 
     assert large_ratio < small_ratio
+
+
+@pytest.mark.parametrize('is_volume', [True, False])
+@pytest.mark.parametrize('engine', ['decomposed', 'downsampled'])
+def test_white_tophat_engines(is_volume: bool, engine: str):
+    """approximate engines preserve the small spot and suppress the big one"""
+    image = simple_spot_3d()
+    if not is_volume:
+        image = image.max(axis=0)
+
+    wth = WhiteTophat(masking_radius=2, is_volume=is_volume, engine=engine)
+    filtered = wth._white_tophat(image)
+
+    center_small, center_big = (80,) * image.ndim, (20,) * image.ndim
+    assert filtered[center_big] / image[center_big] < filtered[center_small] / image[center_small]
+
+
+@pytest.mark.parametrize('shape', [(60, 70), (12, 40, 50)])
+def test_decomposed_opening_uses_line_decomposition(shape):
+    """away from the borders, the decomposed opening is the opening with the structuring element
+    generated by its line segments"""
+    image = np.random.RandomState(0).uniform(0, 1, shape).astype(np.float32)
+    radius = 4
+
+    segments = decompose(radius, image.ndim)
+    footprint = _segments_footprint(segments, radius, image.ndim)
+    expected = opening(image, footprint)
+
+    interior = tuple(slice(2 * radius, n - 2 * radius) for n in shape)
+    assert np.array_equal(decomposed_opening(image, radius)[interior], expected[interior])
+
+
+def test_downsampled_white_tophat_is_close_to_exact():
+    rs = np.random.RandomState(0)
+    image = np.zeros((200, 200))
+    image[tuple(rs.randint(0, 200, (2, 100)))] = 1
+    background = np.linspace(0, 0.3, 200)[None, :] + np.zeros((200, 1))
+    image = np.clip(gaussian(image, sigma=1.5) * 10 + background, 0, 1).astype(np.float32)
+
+    exact = WhiteTophat(masking_radius=15)._white_tophat(image)
+    for engine in ('decomposed', 'downsampled'):
+        approximate = WhiteTophat(masking_radius=15, engine=engine)._white_tophat(image)
+        assert np.abs(approximate - exact).mean() < 0.0025
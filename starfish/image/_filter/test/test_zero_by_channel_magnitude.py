@@ -19,3 +19,17 @@ def test_zero_by_channel_magnitude_produces_accurate_results():
     zcm = ZeroByChannelMagnitude(thresh=np.inf, normalize=False)
     filtered = zcm.run(imagestack, in_place=False, n_processes=1)
     assert np.all(filtered.xarray == 0)
+
+
+def test_zero_by_channel_magnitude_normalizes_each_round():
+    data = np.random.RandomState(0).uniform(0, 1, (2, 3, 2, 5, 4)).astype(np.float32)
+    imagestack = ImageStack.from_numpy_array(data)
+
+    zcm = ZeroByChannelMagnitude(thresh=0.9, normalize=True)
+    filtered = zcm.run(imagestack, in_place=False, n_processes=1)
+
+    magnitude = np.linalg.norm(data, ord=2, axis=1, keepdims=True)
+    expected = np.where(magnitude >= 0.9, data / magnitude, 0)
+    assert np.allclose(filtered.xarray.values, expected, atol=1e-6)
+    # the input stack is unchanged
+    assert np.array_equal(imagestack.xarray.values, data)
@@ -1,10 +1,14 @@
-from typing import Set, Tuple, Union
+from typing import Sequence, Set, Tuple, Union
 
 import numpy as np
+import xarray as xr
 from skimage.morphology import binary_opening, disk
 
 from starfish.types import Axes, Number
 
+# ways the percentile filters (Clip, ScaleByPercentile) can compute percentiles
+PERCENTILE_ENGINES = {'exact', 'histogram'}
+
 
 def bin_thresh(img: np.ndarray, thresh: Number) -> np.ndarray:
     """
@@ -116,3 +120,66 @@ def determine_axes_to_group_by(is_volume: bool) -> Set[Axes]:
         return {Axes.ROUND, Axes.CH}
     else:
         return {Axes.ROUND, Axes.CH, Axes.ZPLANE}
+
+
+def intensity_histogram(image: Union[xr.DataArray, np.ndarray], n_bins: int) -> np.ndarray:
+    """
+    Count the intensities of an image into n_bins equal bins over [0, 1]. Histograms of different
+    tiles can be summed to obtain the histogram of their union.
+
+    Parameters
+    ----------
+    image : Union[xr.DataArray, np.ndarray]
+        Image whose intensities lie in [0, 1].
+    n_bins : int
+        Number of bins.
+
+    Returns
+    -------
+    np.ndarray :
+        Number of pixels in each bin.
+
+    """
+    # np.histogram bins equal-width ranges in fixed-size blocks, without sorting or copying image
+    counts, _ = np.histogram(np.asarray(image), bins=n_bins, range=(0, 1))
+    return counts
+
+
+def histogram_percentile(
+        counts: np.ndarray, q: Union[Number, Sequence[Number]]
+) -> np.ndarray:
+    """
+    Estimate the q-th percentile(s) of the intensities counted by intensity_histogram.
+
+    Percentiles are interpolated between ranks as np.percentile does, placing the pixels of each
+    bin evenly across it. The estimate is within one bin width (1 / n_bins) of np.percentile.
+
+    Parameters
+    ----------
+    counts : np.ndarray
+        Histogram returned by intensity_histogram.
+    q : Union[Number, Sequence[Number]]
+        Percentile or sequence of percentiles to compute, in [0, 100].
+
+    Returns
+    -------
+    np.ndarray :
+        Estimated percentile(s), with the shape of q.
+
+    """
+    counts = np.asarray(counts)
+    n_bins = counts.size
+    cumulative = np.cumsum(counts)
+    n_pixels = cumulative[-1]
+
+    def position(rank: np.ndarray) -> np.ndarray:
+        """estimated intensity of the pixel with the given (integer) rank"""
+        rank = np.minimum(rank, n_pixels - 1)
+        bin_index = np.searchsorted(cumulative, rank, side='right')
+        rank_in_bin = rank - (cumulative[bin_index] - counts[bin_index])
+        return (bin_index + (rank_in_bin + 0.5) / counts[bin_index]) / n_bins
+
+    rank = np.asarray(q, dtype=np.float64) / 100 * (n_pixels - 1)
+    lower = np.floor(rank)
+    lower_value = position(lower)
+    return lower_value + (rank - lower) * (position(lower + 1) - lower_value)
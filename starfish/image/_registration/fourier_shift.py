@@ -1,16 +1,28 @@
 from copy import deepcopy
-from typing import Tuple, Union
+from functools import partial
+from multiprocessing import Pool
+from typing import Callable, Dict, MutableMapping, Optional, Sequence, Tuple, Union
+from weakref import WeakKeyDictionary
 
 import numpy as np
+import xarray as xr
 from scipy.ndimage import fourier_shift
 from skimage.feature import register_translation
 
 from starfish.imagestack.imagestack import ImageStack
+from starfish.multiprocessing.shmem import SharedMemory
 from starfish.types import Axes
 from starfish.util import click
 from starfish.util.dtype import preserve_float_range
+from starfish.util.fft import irfftn, rfftn
 from ._base import RegistrationAlgorithmBase
+from .pyramid import compute_shift_pyramid
+from .translation import apply_shift, APPLY_METHODS, select_shift_method
 
+# the FFT of the reference maximum projection of each FourierShiftRegistration, computed on first
+# use by the parallel engine. It is kept outside the instances so that it is not recorded in the
+# ImageStack log with the instance's attributes.
+_reference_spectra: MutableMapping["FourierShiftRegistration", np.ndarray] = WeakKeyDictionary()
 
 class FourierShiftRegistration(RegistrationAlgorithmBase):
     """
@@ -19,7 +31,11 @@ class FourierShiftRegistration(RegistrationAlgorithmBase):
     Performs a simple translation registration.
 
     """
-    def __init__(self, upsampling: int, reference_stack: Union[str, ImageStack], **kwargs) -> None:
+    def __init__(
+            self, upsampling: int, reference_stack: Union[str, ImageStack], engine: str='serial',
+            apply_method: str='auto', pyramid: bool=False, coarse_size: int=512, window: int=256,
+            **kwargs
+    ) -> None:
         """Implements fourier shift registrations, which performs a simple translation registration
 
         Parameters
@@ -28,13 +44,47 @@ class FourierShiftRegistration(RegistrationAlgorithmBase):
             images are registered to within 1 / upsample_factor of a pixel
         reference_stack : ImageStack
             the ImageStack against which this object will register images
+        engine : str ['serial', 'parallel']
+            'serial' estimates and applies the shift of each round in turn. 'parallel' transforms
+            the reference once, estimates the shifts of all rounds in a worker pool, and shifts
+            each (round, channel, z) tile in the worker pool with single precision real FFTs,
+            writing directly into the stack. The results are equal up to floating point rounding.
+            (default 'serial')
+        apply_method : str ['auto', 'fourier', 'linear', 'cubic']
+            How each round is translated by its shift. 'fourier' always uses an FFT pair. 'auto'
+            leaves rounds that are not shifted untouched and rolls rounds shifted by whole pixels,
+            which gives the same result as the FFT pair, and uses the FFT pair for subpixel
+            shifts. 'linear' and 'cubic' are like 'auto', but interpolate subpixel shifts in real
+            space, which is faster but smooths the image slightly. The method used for each round
+            is recorded in the ImageStack log as shift_methods. (default 'auto')
+        pyramid : bool
+            If True, estimate the shifts coarse-to-fine with compute_shift_pyramid, which is much
+            faster for large tiles, instead of cross-correlating the full maximum projections.
+            (default False)
+        coarse_size : int
+            pyramid only: the maximum projections are halved until neither side is larger than
+            coarse_size, where the shift is first estimated. (default 512)
+        window : int
+            pyramid only: side of the windows that refine the shift at each finer level.
+            (default 256)
 
         See Also
         --------
         https://en.wikipedia.org/wiki/Phase_correlation
 
         """
+        if engine not in self._engines:
+            raise ValueError(f"engine must be one of {self._engines}, not {engine}")
+        if apply_method not in APPLY_METHODS:
+            raise ValueError(f"apply_method must be one of {APPLY_METHODS}, not {apply_method}")
         self.upsampling = upsampling
+        self.engine = engine
+        self.apply_method = apply_method
+        self.pyramid = pyramid
+        self.coarse_size = coarse_size
+        self.window = window
+        # the method used to translate each round by the last call to run
+        self.shift_methods: Dict[int, str] = {}
 
         # TODO ambrosejcarr: remove the ability to load from string in the constructor, move to CLI
         if isinstance(reference_stack, ImageStack):
@@ -42,7 +92,23 @@ class FourierShiftRegistration(RegistrationAlgorithmBase):
         else:
             self.reference_stack = ImageStack.from_path_or_url(reference_stack)
 
-    def run(self, image: ImageStack, in_place: bool=False, *args) -> ImageStack:
+    _engines = {'serial', 'parallel'}
+
+    def _reference_image(self) -> np.ndarray:
+        reference_image_mp = self.reference_stack.max_proj(Axes.ROUND, Axes.CH, Axes.ZPLANE)
+        return reference_image_mp._squeezed_numpy(Axes.ROUND, Axes.CH, Axes.ZPLANE)
+
+    def reference_spectrum(self) -> np.ndarray:
+        """return the FFT of the maximum projection of the reference stack, which is computed once
+        and reused for every round and every stack registered by this object"""
+        spectrum = _reference_spectra.get(self)
+        if spectrum is None:
+            spectrum = _reference_spectra[self] = np.fft.fftn(self._reference_image())
+        return spectrum
+
+    def run(
+            self, image: ImageStack, in_place: bool=False, n_processes: Optional[int]=None, *args
+    ) -> ImageStack:
         """Register an ImageStack against a reference image.
 
         Parameters
@@ -51,6 +117,9 @@ class FourierShiftRegistration(RegistrationAlgorithmBase):
             The stack to be registered
         in_place : bool
             If false, return a new registered stack. Else, register in-place (default False)
+        n_processes : Optional[int]
+            Number of parallel processes used by the parallel engine. If None, uses the output of
+            os.cpu_count() (default = None).
 
         Returns
         -------
@@ -61,19 +130,29 @@ class FourierShiftRegistration(RegistrationAlgorithmBase):
         if not in_place:
             image = deepcopy(image)
 
+        if self.engine == 'parallel':
+            self._run_parallel(image, n_processes)
+            return image
+
         # TODO: (ambrosejcarr) is this the appropriate way of dealing with Z in registration?
         mp = image.max_proj(Axes.CH, Axes.ZPLANE)
         mp_numpy = mp._squeezed_numpy(Axes.CH, Axes.ZPLANE)
-        reference_image_mp = self.reference_stack.max_proj(Axes.ROUND, Axes.CH, Axes.ZPLANE)
-        reference_image_numpy = reference_image_mp._squeezed_numpy(Axes.ROUND,
-                                                                   Axes.CH,
-                                                                   Axes.ZPLANE)
+        reference_image_numpy = self._reference_image()
+        estimate_shift: Callable[..., Tuple[np.ndarray, float]] = compute_shift
+        if self.pyramid:
+            estimate_shift = partial(
+                compute_shift_pyramid, coarse_size=self.coarse_size, window=self.window)
 
+        shift_methods = {}
         for r in image.axis_labels(Axes.ROUND):
             # compute shift between maximum projection (across channels) and dots, for each round
             # TODO: make the max projection array ignorant of axes ordering.
-            shift, error = compute_shift(mp_numpy[r, :, :], reference_image_numpy, self.upsampling)
-            print(f"For round: {r}, Shift: {shift}, Error: {error}")
+            shift, error = estimate_shift(mp_numpy[r, :, :], reference_image_numpy, self.upsampling)
+            method = select_shift_method(shift, self.apply_method)
+            shift_methods[r] = method
+            print(f"For round: {r}, Shift: {shift}, Error: {error}, Method: {method}")
+            if method == 'identity':
+                continue
 
             for c in image.axis_labels(Axes.CH):
                 for z in image.axis_labels(Axes.ZPLANE):
@@ -82,21 +161,82 @@ class FourierShiftRegistration(RegistrationAlgorithmBase):
                     data, axes = image.get_slice(selector=selector)
                     assert len(axes) == 0
 
-                    result = shift_im(data, shift)
+                    if method == 'fourier':
+                        result = shift_im(data, shift)
+                    else:
+                        result = apply_shift(data, shift, method)
                     result = preserve_float_range(result)
 
                     image.set_slice(selector=selector, data=result)
 
+        self.shift_methods = shift_methods
         return image
 
+    def _run_parallel(self, image: ImageStack, n_processes: Optional[int]) -> None:
+        mp = image.max_proj(Axes.CH, Axes.ZPLANE)
+        mp_numpy = mp._squeezed_numpy(Axes.CH, Axes.ZPLANE)
+        rounds = list(image.axis_labels(Axes.ROUND))
+
+        # workers inherit the projections and the reference when the pool starts, so neither is
+        # pickled per round. The pyramid estimate needs the reference image, the full estimate
+        # only its spectrum
+        if self.pyramid:
+            reference = self._reference_image()
+        else:
+            reference = self.reference_spectrum()
+        with Pool(
+                processes=n_processes,
+                initializer=SharedMemory.initializer,
+                initargs=((mp_numpy, reference, self.upsampling, self.pyramid, self.coarse_size,
+                           self.window),)) as pool:
+            estimates = pool.map(_compute_round_shift, range(len(rounds)))
+
+        shifts = []
+        shift_methods = {}
+        for r, (shift, error) in zip(rounds, estimates):
+            method = select_shift_method(shift, self.apply_method)
+            print(f"For round: {r}, Shift: {shift}, Error: {error}, Method: {method}")
+            shifts.append(shift)
+            shift_methods[r] = method
+        self.shift_methods = shift_methods
+
+        if any(method != 'identity' for method in shift_methods.values()):
+            # each worker receives the (round, y, x) array of one (channel, z) pair
+            image.transform(
+                shift_rounds_in_place,
+                group_by={Axes.CH, Axes.ZPLANE},
+                n_processes=n_processes,
+                shifts=np.array(shifts),
+                methods=[shift_methods[r] for r in rounds],
+            )
+
     @staticmethod
     @click.command("FourierShiftRegistration")
     @click.option("--upsampling", default=1, type=int, help="Amount of up-sampling")
     @click.option("--reference-stack", required=True, type=click.Path(exists=True),
                   help="The image stack to align the input image stack to.")
+    @click.option(
+        "--engine", default='serial',
+        help="str ['serial', 'parallel'] how to estimate and apply the shifts. Default: serial")
+    @click.option(
+        "--apply-method", default='auto',
+        help="str ['auto', 'fourier', 'linear', 'cubic'] how to translate each round by its "
+             "shift. Default: auto")
+    @click.option(
+        "--pyramid", is_flag=True,
+        help="estimate the shifts coarse-to-fine, which is faster for large tiles")
+    @click.option(
+        "--coarse-size", default=512, type=int,
+        help="pyramid only: size to which the tiles are halved for the first estimate")
+    @click.option(
+        "--window", default=256, type=int,
+        help="pyramid only: size of the windows that refine the shift at finer levels")
     @click.pass_context
-    def _cli(ctx, upsampling, reference_stack):
-        ctx.obj["component"]._cli_run(ctx, FourierShiftRegistration(upsampling, reference_stack))
+    def _cli(ctx, upsampling, reference_stack, engine, apply_method, pyramid, coarse_size, window):
+        ctx.obj["component"]._cli_run(
+            ctx,
+            FourierShiftRegistration(
+                upsampling, reference_stack, engine, apply_method, pyramid, coarse_size, window))
 
 
 def compute_shift(
@@ -129,3 +269,71 @@ def shift_im(im: np.ndarray, shift: np.ndarray) -> np.ndarray:
     fim_shift = fourier_shift(np.fft.fftn(im), shift * -1)
     im_shift = np.fft.ifftn(fim_shift)
     return im_shift.real
+
+
+def _compute_round_shift(round_index: int) -> Tuple[np.ndarray, float]:
+    """compute_shift for one round of the maximum projections stored in the pool's shared payload,
+    using the precomputed spectrum of the reference, or compute_shift_pyramid using the reference
+    image"""
+    projections, reference, upsampling, pyramid, coarse_size, window = SharedMemory.get_payload()
+    if pyramid:
+        return compute_shift_pyramid(
+            projections[round_index], reference, upsampling, coarse_size, window)
+    shift, error, _ = register_translation(
+        np.fft.fftn(projections[round_index]), reference, upsampling, space='fourier')
+    return shift, error
+
+
+def _shift_spectrum(spectrum: np.ndarray, shifts: np.ndarray, shape: Tuple[int, int]) -> None:
+    """multiply the rfftn of a batch of (y, x) images by the phase ramps that translate each image
+    by the corresponding row of shifts"""
+    y_frequencies = np.fft.fftfreq(shape[0])
+    x_frequencies = np.fft.rfftfreq(shape[1])
+    for image_spectrum, (y_shift, x_shift) in zip(spectrum, shifts):
+        # the ramp is separable, so two 1-d ramps are broadcast instead of building a full one
+        y_ramp = np.exp(-2j * np.pi * y_shift * y_frequencies).astype(spectrum.dtype)
+        x_ramp = np.exp(-2j * np.pi * x_shift * x_frequencies).astype(spectrum.dtype)
+        image_spectrum *= y_ramp[:, None]
+        image_spectrum *= x_ramp[None, :]
+
+
+def shift_rounds_in_place(
+        rounds: Union[xr.DataArray, np.ndarray], shifts: np.ndarray,
+        methods: Optional[Sequence[str]]=None,
+) -> None:
+    """
+    Register each (y, x) image of a (round, y, x) array in place, equivalent to shift_im followed
+    by preserve_float_range, but with single precision real FFTs.
+
+    Parameters
+    ----------
+    rounds : Union[xr.DataArray, np.ndarray]
+        (round, y, x) float32 image data, overwritten with the registered images
+    shifts : np.ndarray
+        (round, 2) array of the shifts returned by compute_shift for each round
+    methods : Optional[Sequence[str]]
+        the select_shift_method result for each round. If None, every round is shifted with real
+        FFTs.
+    """
+    data = np.asarray(rounds)
+    if methods is None:
+        methods = ['fourier'] * len(data)
+
+    fourier_rounds = [i for i, method in enumerate(methods) if method == 'fourier']
+    if fourier_rounds:
+        shape = data.shape[-2:]
+        spectrum = rfftn(data[fourier_rounds], shape)
+        _shift_spectrum(spectrum, -shifts[fourier_rounds], shape)
+        shifted = irfftn(spectrum, shape)
+        if len(fourier_rounds) == len(data):
+            preserve_float_range(shifted, out=data)
+        else:
+            data[fourier_rounds] = preserve_float_range(shifted, out=shifted)
+
+    for i, method in enumerate(methods):
+        if method in ('identity', 'fourier'):
+            continue
+        # real-space shifts read the round while writing it, so they work from a copy
+        apply_shift(data[i].copy(), shifts[i], method, out=data[i])
+        if method != 'roll':
+            preserve_float_range(data[i], out=data[i])
@@ -0,0 +1,107 @@
+"""Coarse-to-fine estimation of the translation between two large images.
+
+compute_shift cross-correlates the full images, and its subpixel refinement evaluates an upsampled
+DFT of the full cross-power spectrum. compute_shift_pyramid instead finds the shift on block-mean
+downsampled images, then at each finer level only corrects it by the few pixels that the coarser
+level could not resolve, by cross-correlating a fixed-size window of the reference with the
+window of the image that the current estimate maps onto it. The subpixel step is carried out on
+the full resolution windows.
+"""
+from typing import List, Tuple
+
+import numpy as np
+from skimage.feature import register_translation
+
+# the maximum number of whole pixel corrections made at each level of the pyramid
+_MAX_ALIGNMENT_STEPS = 4
+
+
+def downsample(image: np.ndarray) -> np.ndarray:
+    """halve the size of a 2-d image by averaging 2x2 blocks, dropping an odd last row or column"""
+    rows, cols = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    cropped = image[:rows, :cols]
+    return cropped.reshape(rows // 2, 2, cols // 2, 2).mean(axis=(1, 3))
+
+
+def _refine_shift(
+        im: np.ndarray, ref: np.ndarray, shift: np.ndarray, upsample_factor: int, window: int
+) -> Tuple[np.ndarray, float]:
+    """correct an integer estimate of the shift between im and ref by registering the central
+    window of ref against the window of im that shift maps onto it
+
+    Windows that are misaligned by whole pixels do not share their edges, which biases the
+    subpixel estimate, so the windows are first aligned to the nearest pixel and only then
+    registered to within 1 / upsample_factor of a pixel.
+    """
+    starts = [(n - min(window, n)) // 2 for n in ref.shape]
+    stops = [start + min(window, n) for start, n in zip(starts, ref.shape)]
+    ref_window = ref[starts[0]:stops[0], starts[1]:stops[1]]
+
+    def im_window(shift: np.ndarray) -> np.ndarray:
+        # the shifts are periodic, so the window of im wraps around its edges
+        rows, cols = (
+            (np.arange(start, stop) + int(s)) % n
+            for start, stop, s, n in zip(starts, stops, shift, im.shape))
+        return im[np.ix_(rows, cols)]
+
+    for _ in range(_MAX_ALIGNMENT_STEPS):
+        residual, error, _ = register_translation(im_window(shift), ref_window)
+        if not residual.any():
+            break
+        shift = shift + residual
+    if upsample_factor > 1:
+        residual, error, _ = register_translation(im_window(shift), ref_window, upsample_factor)
+        shift = shift + residual
+    return shift, error
+
+
+def compute_shift_pyramid(
+        im: np.ndarray, ref: np.ndarray, upsample_factor: int=1, coarse_size: int=512,
+        window: int=256,
+) -> Tuple[np.ndarray, float]:
+    """calculate subpixel image translation by coarse-to-fine cross-correlation
+
+    Parameters
+    ----------
+    im : np.ndarray
+        reference image
+    ref : np.ndarray
+        target image
+    upsample_factor : int
+        images are registered to within 1 / upsample_factor of a pixel
+    coarse_size : int
+        images are halved until neither side is larger than coarse_size, and the shift is first
+        estimated on the full downsampled images
+    window : int
+        side of the windows that refine the shift at each finer level. Shifts are resolved to
+        within a few pixels at the coarser level, so the window only needs to be large enough to
+        contain distinctive features.
+
+    Returns
+    -------
+    np.ndarray :
+        shift vector required to register ref
+    float :
+        translation invariant normalized RMS error, computed on the full resolution windows
+
+    See Also
+    --------
+    compute_shift : the same estimate from the full resolution images
+
+    """
+    levels: List[Tuple[np.ndarray, np.ndarray]] = [
+        (np.asarray(im, dtype=np.float64), np.asarray(ref, dtype=np.float64))]
+    while max(levels[-1][1].shape) > coarse_size:
+        levels.append((downsample(levels[-1][0]), downsample(levels[-1][1])))
+    coarse_im, coarse_ref = levels[-1]
+    if len(levels) == 1:
+        shift, error, _ = register_translation(coarse_im, coarse_ref, upsample_factor)
+        return shift, error
+
+    shift, error, _ = register_translation(coarse_im, coarse_ref)
+    for level in range(len(levels) - 2, -1, -1):
+        level_im, level_ref = levels[level]
+        shift = shift * 2
+        upsampling = upsample_factor if level == 0 else 1
+        shift, error = _refine_shift(level_im, level_ref, shift, upsampling, window)
+    return shift, error
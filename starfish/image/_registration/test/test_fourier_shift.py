@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter
+
+from starfish.image._registration.fourier_shift import FourierShiftRegistration
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Axes
+
+
+def shifted_stack(shifts, n_ch=2, n_z=2, shape=(64, 60), seed=0):
+    """a stack whose rounds are the same smooth random image, rolled by shifts"""
+    np.random.seed(seed)
+    image = gaussian_filter(np.random.random(shape), 2)
+    image = (image - image.min()) / (image.max() - image.min())
+    data = np.empty((len(shifts), n_ch, n_z) + shape, dtype=np.float32)
+    for r, shift in enumerate(shifts):
+        data[r] = np.roll(image, shift, axis=(0, 1))
+    return ImageStack.from_numpy_array(data)
+
+
+def test_engine_is_validated():
+    reference = shifted_stack([(0, 0)])
+    with pytest.raises(ValueError):
+        FourierShiftRegistration(upsampling=1, reference_stack=reference, engine='gpu')
+
+
+def test_parallel_engine_matches_serial_engine():
+    """the parallel engine estimates the same shifts as the serial engine, and shifts the stack
+    into the same registered images up to single precision rounding"""
+    stack = shifted_stack([(0, 0), (3, -2), (-5, 4)])
+    reference = stack.sel({Axes.ROUND: 0})
+
+    serial = FourierShiftRegistration(upsampling=10, reference_stack=reference).run(stack)
+    registration = FourierShiftRegistration(
+        upsampling=10, reference_stack=reference, engine='parallel')
+    parallel = registration.run(stack, n_processes=2)
+
+    assert np.allclose(parallel.xarray.values, serial.xarray.values, atol=1e-5)
+    # every round is registered onto the reference
+    for r in range(3):
+        assert np.allclose(parallel.xarray.values[r], stack.xarray.values[0], atol=1e-4)
+
+    # the reference spectrum is computed once and reused for the next stack
+    spectrum = registration.reference_spectrum()
+    registered = registration.run(stack, n_processes=1)
+    assert registration.reference_spectrum() is spectrum
+    # and is not recorded in the log
+    assert not any(
+        isinstance(value, np.ndarray) for value in registered.log[-1]["arguments"].values())
+
+
+@pytest.mark.parametrize("engine", ['serial', 'parallel'])
+def test_auto_apply_method_rolls_whole_pixel_shifts(engine):
+    """whole-pixel shifts are applied without FFTs, with the same result, and the method used for
+    each round is recorded in the log"""
+    stack = shifted_stack([(0, 0), (3, -2), (-5, 4)])
+    reference = stack.sel({Axes.ROUND: 0})
+
+    fourier = FourierShiftRegistration(
+        upsampling=1, reference_stack=reference, engine=engine, apply_method='fourier',
+    ).run(stack, n_processes=1)
+    registered = FourierShiftRegistration(
+        upsampling=1, reference_stack=reference, engine=engine,
+    ).run(stack, n_processes=1)
+
+    assert np.allclose(registered.xarray.values, fourier.xarray.values, atol=1e-5)
+    assert registered.log[-1]["arguments"]["shift_methods"] == {
+        0: 'identity', 1: 'roll', 2: 'roll'}
+    assert fourier.log[-1]["arguments"]["shift_methods"] == {
+        0: 'fourier', 1: 'fourier', 2: 'fourier'}
+
+
+@pytest.mark.parametrize("engine", ['serial', 'parallel'])
+def test_log_records_the_shift_methods_of_each_run(engine):
+    """registering a second stack with the same instance does not rewrite the log of the first"""
+    stack = shifted_stack([(0, 0), (3, -2), (-5, 4)])
+    reference = stack.sel({Axes.ROUND: 0})
+    registration = FourierShiftRegistration(upsampling=1, reference_stack=reference, engine=engine)
+
+    first = registration.run(stack, n_processes=1)
+    second = registration.run(shifted_stack([(0, 0), (0, 0), (2, 1)]), n_processes=1)
+
+    assert first.log[-1]["arguments"]["shift_methods"] == {0: 'identity', 1: 'roll', 2: 'roll'}
+    assert second.log[-1]["arguments"]["shift_methods"] == {
+        0: 'identity', 1: 'identity', 2: 'roll'}
+
+
+@pytest.mark.parametrize("engine", ['serial', 'parallel'])
+def test_pyramid_estimation(engine):
+    """the 64x60 tiles are halved twice to 16x15 for the first estimate, which is refined on 32
+    pixel windows"""
+    stack = shifted_stack([(0, 0), (3, -2), (-5, 4)])
+    reference = stack.sel({Axes.ROUND: 0})
+    registered = FourierShiftRegistration(
+        upsampling=10, reference_stack=reference, engine=engine, pyramid=True, coarse_size=16,
+        window=32,
+    ).run(stack, n_processes=1)
+    for r in range(3):
+        assert np.allclose(registered.xarray.values[r], stack.xarray.values[0], atol=1e-4)
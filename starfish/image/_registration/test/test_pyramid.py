@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter
+
+from starfish.image._registration.fourier_shift import compute_shift, shift_im
+from starfish.image._registration.pyramid import compute_shift_pyramid, downsample
+
+
+def test_downsample_averages_blocks():
+    image = np.arange(30, dtype=float).reshape(5, 6)
+    assert np.array_equal(downsample(image), [[3.5, 5.5, 7.5], [15.5, 17.5, 19.5]])
+
+
+@pytest.mark.parametrize("shape, shift", [
+    ((1000, 1100), (37.3, -81.6)),
+    ((1000, 1100), (-410., 3.)),
+    ((200, 180), (12.5, -7.)),
+])
+def test_pyramid_shift_matches_compute_shift(shape, shift):
+    """the coarse-to-fine estimate finds the shift found from the full images"""
+    ref = gaussian_filter(np.random.RandomState(0).random_sample(shape), 2, mode='wrap')
+    im = shift_im(ref, -np.array(shift))
+
+    expected, _ = compute_shift(im, ref, upsample_factor=10)
+    estimated, error = compute_shift_pyramid(
+        im, ref, upsample_factor=10, coarse_size=256, window=128)
+
+    assert np.allclose(expected, shift, atol=0.1)
+    assert np.allclose(estimated, expected, atol=0.1)
+    assert 0 <= error < 0.5
+
+
+def test_windows_are_aligned_before_the_subpixel_estimate():
+    """a coarse estimate that is a pixel off is corrected before the subpixel step, which would
+    otherwise be biased by the edges of the misaligned windows"""
+    ref = gaussian_filter(np.random.RandomState(0).random_sample((64, 60)), 2, mode='wrap')
+    im = np.roll(ref, (3, -2), axis=(0, 1))
+
+    estimated, _ = compute_shift_pyramid(im, ref, upsample_factor=10, coarse_size=16, window=32)
+    assert np.allclose(estimated, [3, -2])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter
+
+from starfish.image._registration.fourier_shift import shift_im
+from starfish.image._registration.translation import (
+    apply_shift,
+    interpolate_shift,
+    roll_shift,
+    select_shift_method,
+)
+
+
+@pytest.mark.parametrize("shift, apply_method, expected", [
+    ((0., 0.), 'auto', 'identity'),
+    ((2., -3.), 'auto', 'roll'),
+    ((2.0000001, -3.), 'cubic', 'roll'),
+    ((0.5, -3.), 'auto', 'fourier'),
+    ((0.5, -3.), 'linear', 'linear'),
+    ((2., -3.), 'fourier', 'fourier'),
+])
+def test_select_shift_method(shift, apply_method, expected):
+    assert select_shift_method(shift, apply_method) == expected
+
+
+def test_select_shift_method_rejects_unknown_methods():
+    with pytest.raises(ValueError):
+        select_shift_method((0, 0), 'nearest')
+
+
+@pytest.mark.parametrize("shift", [(0, 0), (3, -2), (-70, 121), (64, 0)])
+def test_roll_shift_matches_fourier_shift(shift):
+    image = np.random.RandomState(0).random_sample((64, 60)).astype(np.float32)
+    rolled = roll_shift(image, shift)
+    assert np.array_equal(rolled, np.roll(image, [-s for s in shift], axis=(0, 1)))
+    assert np.allclose(rolled, shift_im(image, np.array(shift)), atol=1e-5)
+
+
+@pytest.mark.parametrize("method, atol", [('linear', 0.02), ('cubic', 2e-3)])
+def test_interpolate_shift_approximates_fourier_shift(method, atol):
+    """interpolating a smooth image is close to the Fourier shift, cubic more so than linear"""
+    image = gaussian_filter(np.random.RandomState(0).random_sample((64, 60)), 3, mode='wrap')
+    image = ((image - image.min()) / (image.max() - image.min())).astype(np.float32)
+    shift = np.array([2.3, -4.75])
+
+    interpolated = interpolate_shift(image, shift, method)
+    assert interpolated.dtype == np.float32
+    assert np.abs(interpolated - shift_im(image, shift)).max() < atol
+
+    # whole-pixel shifts interpolate to the rolled image
+    assert np.allclose(interpolate_shift(image, (3, -2), method), roll_shift(image, (3, -2)))
+
+
+def test_apply_shift_writes_into_out():
+    image = np.random.RandomState(0).random_sample((2, 16, 16)).astype(np.float32)
+    out = np.empty_like(image)
+    result = apply_shift(image, (1, 2), 'roll', out=out)
+    assert result is out
+    assert np.array_equal(out, np.roll(image, (-1, -2), axis=(1, 2)))
@@ -0,0 +1,147 @@
+"""Real-space translation of images by the shifts estimated by FourierShiftRegistration.
+
+A Fourier shift translates an image periodically: pixel p of the result is pixel p + shift of the
+image, wrapping around its edges. For whole-pixel shifts the same result is a rearrangement of
+the image's pixels, so it is computed exactly with slice copies instead of an FFT pair. Subpixel
+shifts can instead be interpolated with separable linear or cubic convolution, which is cheaper
+than an FFT pair but smooths the image slightly.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# shifts closer than this to a whole number of pixels are applied as whole-pixel shifts
+INTEGER_TOLERANCE = 1e-6
+
+APPLY_METHODS = {'fourier', 'auto', 'linear', 'cubic'}
+
+# offsets, relative to the floor of the shift, of the pixels that each interpolation combines
+_TAPS: Dict[str, Tuple[int, ...]] = {'linear': (0, 1), 'cubic': (-1, 0, 1, 2)}
+
+
+def select_shift_method(shift: Sequence[float], apply_method: str) -> str:
+    """
+    Return the cheapest way to translate an image by shift that apply_method allows.
+
+    Parameters
+    ----------
+    shift : Sequence[float]
+        (y, x) shift, as returned by compute_shift
+    apply_method : str ['fourier', 'auto', 'linear', 'cubic']
+        'fourier' always translates with an FFT pair. 'auto' leaves images that are not shifted
+        untouched, rolls images shifted by whole pixels, and translates the others with an FFT
+        pair, all of which give the result of the FFT pair. 'linear' and 'cubic' behave like
+        'auto', but interpolate subpixel shifts in real space.
+
+    Returns
+    -------
+    str : one of 'identity', 'roll', 'fourier', 'linear', 'cubic'
+
+    """
+    if apply_method not in APPLY_METHODS:
+        raise ValueError(f"apply_method must be one of {APPLY_METHODS}, not {apply_method}")
+    if apply_method == 'fourier':
+        return 'fourier'
+    shift = np.asarray(shift, dtype=float)
+    if np.allclose(shift, np.round(shift), rtol=0, atol=INTEGER_TOLERANCE):
+        return 'identity' if not np.any(np.round(shift)) else 'roll'
+    return 'fourier' if apply_method == 'auto' else apply_method
+
+
+def _wrapped_slices(offset: int, size: int) -> List[Tuple[slice, slice]]:
+    """(target, source) slice pairs that copy source[(p + offset) % size] to target[p]"""
+    offset %= size
+    pairs = [(slice(0, size - offset), slice(offset, size))]
+    if offset:
+        pairs.append((slice(size - offset, size), slice(0, offset)))
+    return pairs
+
+
+def roll_shift(
+        image: np.ndarray, shift: Sequence[float], out: Optional[np.ndarray]=None
+) -> np.ndarray:
+    """
+    Translate the trailing (y, x) axes of image by a whole-pixel shift, wrapping around the edges
+    like shift_im. Equivalent to np.roll(image, -shift, axis=(-2, -1)), but writes the pixels
+    directly into out, which must not overlap image.
+    """
+    if out is None:
+        out = np.empty_like(image)
+    y_offset, x_offset = (int(np.round(s)) for s in shift)
+    for y_target, y_source in _wrapped_slices(y_offset, image.shape[-2]):
+        for x_target, x_source in _wrapped_slices(x_offset, image.shape[-1]):
+            out[..., y_target, x_target] = image[..., y_source, x_source]
+    return out
+
+
+def _cubic_weight(distance: float) -> float:
+    """the cubic convolution kernel of Keys (1981), with a = -0.5"""
+    distance = abs(distance)
+    if distance <= 1:
+        return 1.5 * distance ** 3 - 2.5 * distance ** 2 + 1
+    if distance < 2:
+        return -0.5 * distance ** 3 + 2.5 * distance ** 2 - 4 * distance + 2
+    return 0.
+
+
+def _weights(method: str, fraction: float) -> List[float]:
+    if method == 'linear':
+        return [1 - fraction, fraction]
+    return [_cubic_weight(fraction - tap) for tap in _TAPS['cubic']]
+
+
+def interpolate_shift(
+        image: np.ndarray, shift: Sequence[float], method: str, out: Optional[np.ndarray]=None
+) -> np.ndarray:
+    """
+    Translate the trailing (y, x) axes of image by shift, wrapping around the edges like shift_im,
+    by separable linear or cubic convolution interpolation.
+
+    Parameters
+    ----------
+    image : np.ndarray
+        image data, translated along its last two axes
+    shift : Sequence[float]
+        (y, x) shift, as returned by compute_shift
+    method : str ['linear', 'cubic']
+        interpolation method
+    out : Optional[np.ndarray]
+        If provided, the float32 result is written into this array, which may be image itself.
+
+    Returns
+    -------
+    np.ndarray :
+        the translated image. Cubic interpolation may overshoot the range of image.
+
+    """
+    result = np.asarray(image, dtype=np.float32)
+    for axis, axis_shift in zip((-2, -1), shift):
+        size = result.shape[axis]
+        offset = int(np.floor(axis_shift))
+        fraction = axis_shift - offset
+        interpolated = np.zeros(result.shape, dtype=np.float32)
+        for tap, weight in zip(_TAPS[method], _weights(method, fraction)):
+            if weight:
+                indices = (np.arange(size) + offset + tap) % size
+                interpolated += np.float32(weight) * np.take(result, indices, axis=axis)
+        result = interpolated
+    if out is None:
+        return result
+    out[...] = result
+    return out
+
+
+def apply_shift(
+        image: np.ndarray, shift: Sequence[float], method: str, out: Optional[np.ndarray]=None
+) -> np.ndarray:
+    """translate image by shift with a real-space method returned by select_shift_method"""
+    if method == 'identity':
+        if out is None:
+            return image.copy()
+        out[...] = image
+        return out
+    if method == 'roll':
+        return roll_shift(image, shift, out)
+    if method in _TAPS:
+        return interpolate_shift(image, shift, method, out)
+    raise ValueError(f"{method} is not a real-space shift method")
@@ -5,6 +5,7 @@ import click
 from skimage.io import imsave
 
 from starfish.imagestack.imagestack import ImageStack
+from starfish.label_image.label_image import RunLengthLabelImage
 from starfish.pipeline import PipelineComponent
 from starfish.pipeline.algorithmbase import AlgorithmBase
 
@@ -27,13 +28,19 @@ class Segmentation(PipelineComponent):
         label_image = instance.run(pri_stack, nuc_stack)
 
         print(f"Writing label image to {output}")
-        imsave(output, label_image)
+        if output.endswith(".npz"):
+            # run-length encoded, which is far smaller for mostly empty label images
+            RunLengthLabelImage.from_label_image(label_image).save(output)
+        else:
+            imsave(output, label_image)
 
     @staticmethod
     @click.group(COMPONENT_NAME)
     @click.option("--primary-images", required=True, type=click.Path(exists=True))
     @click.option("--nuclei", required=True, type=click.Path(exists=True))
-    @click.option("-o", "--output", required=True)
+    @click.option(
+        "-o", "--output", required=True,
+        help="label image file; a .npz extension saves a run-length encoded label image")
     @click.pass_context
     def _cli(ctx, primary_images, nuclei, output):
         """define polygons for cell boundaries and assign spots"""
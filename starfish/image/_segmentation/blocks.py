@@ -0,0 +1,216 @@
+"""Segment large images in overlapping blocks and stitch the block label images back together.
+
+The (y, x) plane is partitioned into cores of block_size pixels. Each block extends its core by
+overlap pixels on every side, so that objects near the edge of a core are seen whole by the block
+that owns them. Every block is segmented independently, and the labels of neighboring blocks are
+reconciled by voting in the band of pixels around their seam that both blocks see with at least
+half the overlap of context: two labels that are each other's best match there, and share most of
+the smaller one's pixels, are the same object. Each pixel of the output takes the label that the
+block owning its core gave it, so objects that cross a core border carry a single label.
+"""
+from itertools import product
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from starfish.util.label import label_areas, relabel
+
+
+class Block(NamedTuple):
+    """the pixels of a block, the pixels of its core, which no other block owns, and the (row,
+    column) position of the block in the grid of blocks"""
+    extended: Tuple[slice, ...]
+    core: Tuple[slice, ...]
+    position: Tuple[int, int]
+
+    @property
+    def core_in_extended(self) -> Tuple[slice, ...]:
+        """the core, relative to the start of the extended block"""
+        return _relative(self.core, self.extended)
+
+
+def _bounds(axis_slice: slice) -> Tuple[int, int]:
+    """the start and stop of a slice built by block_slices, which are never None"""
+    return axis_slice.start, axis_slice.stop  # type: ignore
+
+
+def _relative(inner: Tuple[slice, ...], outer: Tuple[slice, ...]) -> Tuple[slice, ...]:
+    """inner, relative to the start of outer"""
+    relative = []
+    for i, o in zip(inner, outer):
+        (start, stop), (origin, _) = _bounds(i), _bounds(o)
+        relative.append(slice(start - origin, stop - origin))
+    return tuple(relative)
+
+
+def block_slices(shape: Sequence[int], block_size: int, overlap: int) -> List[Block]:
+    """
+    Partition the last two axes of an array of shape into cores of block_size pixels, each
+    extended by overlap pixels on every side. Leading axes (e.g. z) are not split.
+
+    Parameters
+    ----------
+    shape : Sequence[int]
+        shape of the image
+    block_size : int
+        side of the cores along y and x
+    overlap : int
+        number of pixels by which each block extends its core
+
+    Returns
+    -------
+    List[Block] :
+        the blocks, in row-major order
+    """
+    if block_size < 1 or not 0 <= overlap <= block_size:
+        raise ValueError(
+            f"block_size must be positive and overlap between 0 and block_size, not "
+            f"{block_size} and {overlap}")
+    leading = tuple(slice(0, n) for n in shape[:-2])
+    axis_ranges = []
+    for n in shape[-2:]:
+        axis_ranges.append([
+            (index,
+             slice(start, min(start + block_size, n)),
+             slice(max(start - overlap, 0), min(start + block_size + overlap, n)))
+            for index, start in enumerate(range(0, n, block_size))
+        ])
+    return [
+        Block(leading + (y_extended, x_extended), leading + (y_core, x_core), (row, column))
+        for (row, y_core, y_extended), (column, x_core, x_extended) in product(*axis_ranges)
+    ]
+
+
+def _find(parents: np.ndarray, label: int) -> int:
+    root = label
+    while parents[root] != root:
+        root = parents[root]
+    # compress the path so later lookups are constant time
+    while parents[label] != root:
+        parents[label], label = root, parents[label]
+    return root
+
+
+def _intersection(a: Tuple[slice, ...], b: Tuple[slice, ...]) -> Optional[Tuple[slice, ...]]:
+    slices = []
+    for s, t in zip(a, b):
+        (s_start, s_stop), (t_start, t_stop) = _bounds(s), _bounds(t)
+        start, stop = max(s_start, t_start), min(s_stop, t_stop)
+        if start >= stop:
+            return None
+        slices.append(slice(start, stop))
+    return tuple(slices)
+
+
+def _shrink(slices: Tuple[slice, ...], margin: int, shape: Sequence[int]) -> Tuple[slice, ...]:
+    """slices without the margin pixels next to each edge that is not an edge of the image"""
+    shrunk = []
+    for s, n in zip(slices, shape):
+        start, stop = _bounds(s)
+        shrunk.append(slice(
+            start + margin if start > 0 else start, stop - margin if stop < n else stop))
+    return tuple(shrunk)
+
+
+def _vote(
+        labels: np.ndarray, other_labels: np.ndarray, merge_fraction: float
+) -> List[Tuple[int, int]]:
+    """pairs of labels of two segmentations of the same pixels that are each other's best match,
+    and share more than merge_fraction of the pixels of the smaller of the two"""
+    both = (labels > 0) & (other_labels > 0)
+    if not np.any(both):
+        return []
+    pairs, shared = np.unique(
+        np.stack([labels[both], other_labels[both]]), axis=1, return_counts=True)
+    label_ids, label_counts = np.unique(labels[labels > 0], return_counts=True)
+    other_ids, other_counts = np.unique(other_labels[other_labels > 0], return_counts=True)
+    sizes = dict(zip(label_ids, label_counts))
+    other_sizes = dict(zip(other_ids, other_counts))
+
+    # the label of the other segmentation that shares the most pixels with each label, and
+    # vice versa
+    best: dict = {}
+    other_best: dict = {}
+    for (a, b), n in zip(pairs.T, shared):
+        if n > best.get(a, (None, 0))[1]:
+            best[a] = (b, n)
+        if n > other_best.get(b, (None, 0))[1]:
+            other_best[b] = (a, n)
+    return [
+        (int(a), int(b)) for a, (b, n) in best.items()
+        if other_best[b][0] == a and n > merge_fraction * min(sizes[a], other_sizes[b])
+    ]
+
+
+def reconcile_blocks(
+        shape: Sequence[int], blocks: Sequence[Block], block_labels: Sequence[np.ndarray],
+        merge_fraction: float=0.5,
+) -> np.ndarray:
+    """
+    Stitch the label images of overlapping blocks into one label image.
+
+    Parameters
+    ----------
+    shape : Sequence[int]
+        shape of the full image
+    blocks : Sequence[Block]
+        the blocks returned by block_slices
+    block_labels : Sequence[np.ndarray]
+        the label image of each extended block, where 0 is background
+    merge_fraction : float
+        labels of neighboring blocks are merged if they share more than this fraction of the
+        smaller label's pixels in the region where the blocks overlap (default 0.5)
+
+    Returns
+    -------
+    np.ndarray[np.uint32] :
+        label image of shape, labeled with sequential integers from 1
+    """
+    # give every block's labels ids that are unique across blocks
+    offsets = np.cumsum([0] + [int(labels.max()) for labels in block_labels])
+    global_labels = [
+        np.where(labels > 0, labels + offset, 0)
+        for labels, offset in zip(block_labels, offsets)
+    ]
+
+    # half the overlap: the most that any block extends its core by
+    margin = max(
+        max(_bounds(c)[0] - _bounds(e)[0], _bounds(e)[1] - _bounds(c)[1])
+        for block in blocks for c, e in zip(block.core, block.extended)) // 2
+
+    # overlap is at most block_size, so a block only overlaps the 8 blocks around it
+    index = {block.position: i for i, block in enumerate(blocks)}
+    parents = np.arange(offsets[-1] + 1)
+    for i, block in enumerate(blocks):
+        row, column = block.position
+        neighbors = [
+            index[position] for position in
+            [(row, column + 1), (row + 1, column - 1), (row + 1, column), (row + 1, column + 1)]
+            if position in index
+        ]
+        for j in neighbors:
+            # labels near the outer edge of a block can be cut off or lack the context to be
+            # split correctly, so each block only votes where it has margin pixels of context
+            shared = _intersection(
+                _shrink(blocks[i].extended, margin, shape),
+                _shrink(blocks[j].extended, margin, shape))
+            if shared is None:
+                continue
+            votes = _vote(
+                global_labels[i][_relative(shared, blocks[i].extended)],
+                global_labels[j][_relative(shared, blocks[j].extended)],
+                merge_fraction,
+            )
+            for a, b in votes:
+                root_a, root_b = _find(parents, a), _find(parents, b)
+                if root_a != root_b:
+                    parents[max(root_a, root_b)] = min(root_a, root_b)
+
+    roots = np.array([_find(parents, label) for label in range(len(parents))], dtype=np.uint32)
+    stitched = np.zeros(shape, dtype=np.uint32)
+    for block, labels in zip(blocks, global_labels):
+        stitched[block.core] = roots[labels[block.core_in_extended]]
+
+    # relabel with sequential integers, keeping 0 as background
+    stitched, _ = relabel(stitched, label_areas(stitched, len(roots) - 1) > 0, out=stitched)
+    return stitched
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from starfish.image._segmentation.expand_nuclei import expand_labels, ExpandNuclei
+from .test_watershed import assert_same_partition, synthetic_cells
+
+
+def test_expand_labels_matches_nearest_seed():
+    seeds = np.zeros((40, 50), dtype=np.uint32)
+    seeds[10:13, 10:13] = 1
+    seeds[25:30, 30:33] = 2
+    seeds[5, 45] = 3
+
+    expanded = expand_labels(seeds, max_distance=8)
+
+    # brute force: every pixel within 8 pixels of a seed takes the label of its nearest seed pixel
+    seed_pixels = np.argwhere(seeds > 0)
+    pixels = np.argwhere(np.ones(seeds.shape, dtype=bool))
+    distances = np.linalg.norm(pixels[:, None] - seed_pixels[None], axis=2)
+    nearest = seeds[tuple(seed_pixels[distances.argmin(axis=1)].T)]
+    expected = np.where(distances.min(axis=1) <= 8, nearest, 0).reshape(seeds.shape)
+    # the seeds are at least 8 pixels apart, so ties only happen far from both
+    assert np.array_equal(expanded, expected)
+    assert expanded.dtype == np.uint32
+
+
+def test_expand_labels_with_per_label_distances_and_mask():
+    seeds = np.zeros((40, 50), dtype=np.uint32)
+    seeds[10, 10] = 1
+    seeds[30, 40] = 2
+    mask = np.ones(seeds.shape, dtype=bool)
+    mask[:, 25:] = False
+
+    expanded = expand_labels(seeds, np.array([0, 3, 6]), mask)
+
+    assert np.count_nonzero(expanded == 1) == np.count_nonzero(
+        np.hypot(*np.ogrid[-10:30, -10:40]) <= 3)
+    # seed 2 lies outside the mask, so only the seed itself remains
+    assert np.array_equal(np.argwhere(expanded == 2), [[30, 40]])
+    assert not np.any(expand_labels(np.zeros((5, 5), dtype=np.uint32), 3))
+
+
+@pytest.mark.parametrize("is_volume", [False, True])
+def test_expand_nuclei(is_volume):
+    primary, nuclei = synthetic_cells()
+    parameters = dict(
+        nuclei_threshold=0.5, max_distance=6, input_threshold=0.3, is_volume=is_volume)
+
+    labels = ExpandNuclei(**parameters).run(primary, nuclei)
+    tiled = ExpandNuclei(**parameters, block_size=64, overlap=32).run(
+        primary, nuclei, n_processes=2)
+
+    assert labels.shape == ((10, 140, 160) if is_volume else (140, 160))
+    assert len(np.unique(labels)) > 10
+    # every cell contains its nucleus, and reaches no further than the stain
+    nuclei_mask = nuclei.xarray.values[0, 0] > 0
+    stain_mask = primary.xarray.values.max(axis=(0, 1)) > 0
+    if not is_volume:
+        nuclei_mask, stain_mask = nuclei_mask.max(axis=0), stain_mask.max(axis=0)
+    assert np.all(labels[nuclei_mask] > 0)
+    assert not np.any(labels[~stain_mask])
+    assert_same_partition(tiled, labels)
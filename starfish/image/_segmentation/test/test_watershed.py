@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter
+from skimage.draw import circle
+
+from starfish.image._segmentation.blocks import block_slices, reconcile_blocks
+from starfish.image._segmentation.watershed import _WatershedSegmenter, Watershed
+from starfish.imagestack.imagestack import ImageStack
+
+
+def synthetic_cells(shape=(10, 140, 160), n_cells=16, seed=0):
+    """nuclei and primary stacks with round nuclei, surrounded by a dimmer stain"""
+    random = np.random.RandomState(seed)
+    nuclei = np.zeros(shape, dtype=np.float32)
+    stain = np.zeros(shape, dtype=np.float32)
+    for _ in range(n_cells):
+        y, x = random.randint(10, shape[1] - 10), random.randint(10, shape[2] - 10)
+        for z in range(shape[0]):
+            nuclei[(z,) + circle(y, x, 7, shape[1:])] = 1
+            stain[(z,) + circle(y, x, 11, shape[1:])] = 1
+    stain = gaussian_filter(stain, (0, 1, 1))
+    primary = ImageStack.from_numpy_array(np.stack([stain[None], stain[None]]))
+    nuclei = ImageStack.from_numpy_array(nuclei[None, None])
+    return primary, nuclei
+
+
+def assert_same_partition(labels, other, min_agreement=1.0):
+    """labels and other label the same objects, and differ only by the values they give to them
+    and, where the watershed of touching objects floods plateaus in a different order, by the
+    boundary between those objects"""
+    assert np.array_equal(labels > 0, other > 0)
+    assert len(np.unique(labels)) == len(np.unique(other))
+    # match each object to the object of other that it overlaps most
+    pairs, counts = np.unique(
+        np.stack([labels.ravel(), other.ravel()]), axis=1, return_counts=True)
+    best = {}
+    for (label, other_label), count in zip(pairs.T, counts):
+        if count > best.get(label, (None, 0))[1]:
+            best[label] = (other_label, count)
+    assert len({other_label for other_label, _ in best.values()}) == len(best)
+    agreement = sum(count for _, count in best.values()) / labels.size
+    assert agreement >= min_agreement
+
+
+def test_block_slices_partition_the_plane():
+    blocks = block_slices((3, 100, 70), block_size=32, overlap=8)
+    covered = np.zeros((3, 100, 70), dtype=int)
+    for block in blocks:
+        covered[block.core] += 1
+        assert covered[block.extended].shape[1] <= 32 + 2 * 8
+    assert np.all(covered == 1)
+    with pytest.raises(ValueError):
+        block_slices((100, 70), block_size=32, overlap=40)
+
+
+def test_reconcile_blocks_merges_objects_across_seams():
+    labels = np.zeros((40, 40), dtype=np.int32)
+    labels[5:35, 12:28] = 1
+    labels[2:6, 2:6] = 2
+    blocks = block_slices(labels.shape, block_size=20, overlap=10)
+    stitched = reconcile_blocks(
+        labels.shape, blocks, [labels[block.extended] for block in blocks])
+    assert_same_partition(stitched, labels)
+
+
+@pytest.mark.parametrize("is_volume", [False, True])
+def test_tiled_watershed_matches_watershed(is_volume):
+    primary, nuclei = synthetic_cells()
+    parameters = dict(
+        nuclei_threshold=0.5, input_threshold=0.3, min_distance=4, is_volume=is_volume)
+
+    labels = Watershed(**parameters).run(primary, nuclei)
+    tiled = Watershed(**parameters, block_size=64, overlap=32).run(
+        primary, nuclei, n_processes=2)
+
+    assert labels.shape == ((10, 140, 160) if is_volume else (140, 160))
+    assert tiled.shape == labels.shape
+    assert len(np.unique(labels)) > 10
+    assert_same_partition(tiled, labels, min_agreement=0.99)
+
+
+def test_label_nuclei_filters_objects_by_area():
+    nuclei = np.zeros((60, 60), dtype=bool)
+    nuclei[2:4, 2:4] = True  # area 4
+    nuclei[10:20, 10:15] = True  # area 50
+    nuclei[30:50, 30:50] = True  # area 400
+    nuclei[50:55, 2:12] = True  # area 50
+    segmenter = _WatershedSegmenter(nuclei.astype(np.float32), nuclei.astype(np.float32))
+
+    markers, num_objs = segmenter.label_nuclei(nuclei, min_allowed_size=5, max_allowed_size=12)
+
+    assert markers.dtype == np.uint32
+    assert num_objs == 2
+    assert np.array_equal(np.unique(markers), [0, 1, 2])
+    assert np.all(markers[10:20, 10:15] == 1)
+    assert np.all(markers[50:55, 2:12] == 2)
+    assert np.count_nonzero(markers) == 100
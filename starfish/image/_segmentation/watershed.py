@@ -1,3 +1,4 @@
+from multiprocessing import Pool
 from typing import Optional, Tuple
 
 import numpy as np
@@ -9,9 +10,42 @@ from skimage.morphology import watershed
 
 from starfish.image._filter.util import bin_open, bin_thresh
 from starfish.imagestack.imagestack import ImageStack
+from starfish.multiprocessing.shmem import SharedMemory
 from starfish.types import Axes, Number
 from starfish.util import click
+from starfish.util.label import label_areas, relabel
 from ._base import SegmentationAlgorithmBase
+from .blocks import Block, block_slices, reconcile_blocks
+
+# min and max allowable sizes of nuclei, as the sides of squares of the same area
+SIZE_LIMITS = (10, 10000)
+
+
+def project_images(
+        primary_images: ImageStack, nuclei: ImageStack, is_volume: bool
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Project the nuclei over rounds and channels, and the primary images into a 'stain' that is
+    the mean over rounds of their maximum over channels, normalized to a maximum of 1. Both are
+    also maximum projected over z, unless is_volume.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray] :
+        the (y, x) or (z, y, x) nuclei and stain images
+    """
+    # the axes that are projected out; volumes keep z
+    projected: Tuple[Axes, ...] = (Axes.CH, Axes.ZPLANE)
+    if is_volume:
+        projected = (Axes.CH,)
+
+    # create a 'stain' for segmentation
+    mp = primary_images.max_proj(*projected)
+    mp_numpy = mp._squeezed_numpy(*projected)
+    stain = np.mean(mp_numpy, axis=0)
+    stain = stain / stain.max()
+
+    nuclei_mp = nuclei.max_proj(Axes.ROUND, *projected)
+    return nuclei_mp._squeezed_numpy(Axes.ROUND, *projected), stain
 
 
 class Watershed(SegmentationAlgorithmBase):
@@ -21,6 +55,9 @@ class Watershed(SegmentationAlgorithmBase):
         nuclei_threshold: Number,
         input_threshold: Number,
         min_distance: int,
+        is_volume: bool=False,
+        block_size: Optional[int]=None,
+        overlap: Optional[int]=None,
     ) -> None:
         """Implements watershed segmentation of cells.
 
@@ -38,6 +75,19 @@ class Watershed(SegmentationAlgorithmBase):
         min_distance : int
             minimum distance before object centers in a provided nuclei image are considered single
             nuclei
+        is_volume : bool
+            If True, segment (z, y, x) volumes instead of maximum projecting the images over z.
+            Object sizes are then counted in voxels. (default False)
+        block_size : Optional[int]
+            If provided, the image is split along y and x into blocks of this size, which are
+            segmented in parallel and stitched into one label image. Objects that cross the
+            border between two blocks are merged if the two blocks agree on more than half of
+            their pixels where the blocks overlap. Only available through run; show() requires
+            the whole image to be segmented at once. (default None)
+        overlap : Optional[int]
+            number of pixels by which each block extends into its neighbors. It should exceed the
+            size of the largest object and min_distance. (default 2 * min_distance, at most
+            block_size)
 
         See Also
         --------
@@ -47,10 +97,18 @@ class Watershed(SegmentationAlgorithmBase):
         self.nuclei_threshold = nuclei_threshold
         self.input_threshold = input_threshold
         self.min_distance = min_distance
+        self.is_volume = is_volume
+        self.block_size = block_size
+        if block_size is not None and overlap is None:
+            overlap = min(2 * min_distance, block_size)
+        self.overlap = overlap
         self._segmentation_instance: Optional[_WatershedSegmenter] = None
 
-    def run(self, primary_images: ImageStack, nuclei: ImageStack, *args) -> np.ndarray:
-        """Segments nuclei in 2-d using a nuclei ImageStack
+    def run(
+            self, primary_images: ImageStack, nuclei: ImageStack,
+            n_processes: Optional[int]=None, *args
+    ) -> np.ndarray:
+        """Segments nuclei in 2-d, or in 3-d if is_volume, using a nuclei ImageStack
 
         Primary images are used to expand the nuclear mask, but only in cases where there are
         densely detected points surrounding the nuclei.
@@ -61,6 +119,9 @@ class Watershed(SegmentationAlgorithmBase):
             contains primary image data
         nuclei : ImageStack
             contains nuclei image data
+        n_processes : Optional[int]
+            The number of processes that segment blocks, if block_size is set. If None, uses the
+            output of os.cpu_count() (default = None).
 
         Returns
         -------
@@ -69,27 +130,43 @@ class Watershed(SegmentationAlgorithmBase):
             implies that a pixel is not part of a cell.
         """
 
-        # create a 'stain' for segmentation
-        mp = primary_images.max_proj(Axes.CH, Axes.ZPLANE)
-        mp_numpy = mp._squeezed_numpy(Axes.CH, Axes.ZPLANE)
-        stain = np.mean(mp_numpy, axis=0)
-        stain = stain / stain.max()
+        nuclei__mp_numpy, stain = project_images(primary_images, nuclei, self.is_volume)
 
         # TODO make these parameterizable or determine whether they are useful or not
-        size_lim = (10, 10000)
+        size_lim = SIZE_LIMITS
         disk_size_markers = None
         disk_size_mask = None
 
-        nuclei_mp = nuclei.max_proj(Axes.ROUND, Axes.CH, Axes.ZPLANE)
-        nuclei__mp_numpy = nuclei_mp._squeezed_numpy(Axes.ROUND, Axes.CH, Axes.ZPLANE)
-        self._segmentation_instance = _WatershedSegmenter(nuclei__mp_numpy, stain)
-        label_image = self._segmentation_instance.segment(
+        segment_args = (
             self.nuclei_threshold, self.input_threshold, size_lim, disk_size_markers,
             disk_size_mask, self.min_distance
         )
 
+        if self.block_size is not None:
+            self._segmentation_instance = None
+            return self._segment_blocks(nuclei__mp_numpy, stain, segment_args, n_processes)
+
+        self._segmentation_instance = _WatershedSegmenter(nuclei__mp_numpy, stain)
+        label_image = self._segmentation_instance.segment(*segment_args)
+
         return label_image
 
+    def _segment_blocks(
+            self, nuclei: np.ndarray, stain: np.ndarray, segment_args: tuple,
+            n_processes: Optional[int],
+    ) -> np.ndarray:
+        """segment overlapping blocks of the images in a worker pool, and stitch their labels"""
+        assert self.block_size is not None and self.overlap is not None
+        # the images are normalized as a whole, so that every block is thresholded alike
+        nuclei = nuclei / nuclei.max()
+        blocks = block_slices(nuclei.shape, self.block_size, self.overlap)
+        with Pool(
+                processes=n_processes,
+                initializer=SharedMemory.initializer,
+                initargs=((nuclei, stain, segment_args),)) as pool:
+            block_labels = pool.map(_segment_block, blocks)
+        return reconcile_blocks(nuclei.shape, blocks, block_labels)
+
     def show(self, figsize: Tuple[int, int]=(10, 10)) -> None:
         if isinstance(self._segmentation_instance, _WatershedSegmenter):
             self._segmentation_instance.show(figsize=figsize)
@@ -104,14 +181,43 @@ class Watershed(SegmentationAlgorithmBase):
         "--input-threshold", default=.22, type=float, help="Input threshold")
     @click.option(
         "--min-distance", default=57, type=int, help="Minimum distance between cells")
+    @click.option(
+        "--is-volume", is_flag=True, help="segment 3d volumes instead of z projections")
+    @click.option(
+        "--block-size", default=None, type=int,
+        help="segment blocks of this size in parallel and stitch them")
+    @click.option(
+        "--overlap", default=None, type=int,
+        help="overlap between blocks. Default: 2 * min-distance")
     @click.pass_context
-    def _cli(ctx, nuclei_threshold, input_threshold, min_distance):
+    def _cli(ctx, nuclei_threshold, input_threshold, min_distance, is_volume, block_size, overlap):
         ctx.obj["component"]._cli_run(
-            ctx, Watershed(nuclei_threshold, input_threshold, min_distance))
+            ctx,
+            Watershed(
+                nuclei_threshold, input_threshold, min_distance, is_volume, block_size, overlap
+            )
+        )
+
+
+def _segment_block(block: Block) -> np.ndarray:
+    """segment one extended block of the nuclei and stain images stored in the pool's shared
+    payload"""
+    nuclei, stain, segment_args = SharedMemory.get_payload()
+    segmenter = _WatershedSegmenter(
+        nuclei[block.extended], stain[block.extended], normalize=False)
+    return segmenter.segment(*segment_args)
+
+
+def _as_uint32(labels: np.ndarray) -> np.ndarray:
+    """view the non-negative int32 labels that skimage's watershed returns as uint32, without a
+    copy"""
+    return labels.view(np.uint32) if labels.dtype == np.int32 else labels.astype(np.uint32)
 
 
 class _WatershedSegmenter:
-    def __init__(self, nuclei_img: np.ndarray, stain_img: np.ndarray) -> None:
+    def __init__(
+            self, nuclei_img: np.ndarray, stain_img: np.ndarray, normalize: bool=True
+    ) -> None:
         """Implements watershed segmentation of cells seeded from a nuclei image
 
         Algorithm is seeded by a nuclei image. Binary segmentation mask is computed from a maximum
@@ -123,9 +229,15 @@ class _WatershedSegmenter:
             nuclei image
         stain_img : np.ndarray[np.float32]
             stain image
+        normalize : bool
+            If True, divide each image by its maximum. Blocks of a larger image are normalized
+            by the maximum of the whole image beforehand instead. (default True)
         """
-        self.nuclei = nuclei_img / nuclei_img.max()
-        self.stain = stain_img / stain_img.max()
+        if normalize:
+            nuclei_img = nuclei_img / nuclei_img.max()
+            stain_img = stain_img / stain_img.max()
+        self.nuclei = nuclei_img
+        self.stain = stain_img
 
         self.nuclei_thresholded: Optional[np.ndarray] = None  # dtype: bool
         self.markers = None
@@ -161,7 +273,7 @@ class _WatershedSegmenter:
 
         Returns
         -------
-        np.ndarray[int32] :
+        np.ndarray[np.uint32] :
             label image with same size and shape as self.nuclei_img
         """
         min_allowed_size, max_allowed_size = size_lim
@@ -215,14 +327,16 @@ class _WatershedSegmenter:
 
         Returns
         -------
-        np.ndarray :
+        np.ndarray[np.uint32] :
             labeled nuclei, excluding those whose size is outside the area boundaries
+        int :
+            number of labeled nuclei
 
         """
 
         # label thresholded nuclei image
         if min_dist is None:
-            markers, num_objs = spm.label(nuclei_thresholded)
+            markers, num_objs = spm.label(nuclei_thresholded, output=np.uint32)
         else:
             markers, num_objs = self._unclump(min_dist)
 
@@ -230,24 +344,11 @@ class _WatershedSegmenter:
         min_allowed_area = min_allowed_size ** 2
         max_allowed_area = max_allowed_size ** 2
 
-        # spm.sum sums the values of an array by label. This counts the pixels in each object
-        areas = spm.sum(
-            np.ones(nuclei_thresholded.shape),
-            markers,
-            np.array(range(0, num_objs + 1), dtype=np.int32)
-        )
-
-        # each label value is replaced by its area
-        area_image = areas[markers]
-
-        # areas are used to mask values that are outside the allowable sizes
-        markers[area_image <= min_allowed_area] = 0
-        markers[area_image >= max_allowed_area] = 0
-
-        # re-label the image with sequential integers, accounting for exclusion based on size
-        markers_reduced, num_objs = self.relabel_image(markers)
-
-        return markers_reduced, num_objs
+        # remove objects outside the allowable sizes and re-label the image with sequential
+        # integers, in place
+        areas = label_areas(markers, num_objs)
+        keep = (areas > min_allowed_area) & (areas < max_allowed_area)
+        return relabel(markers, keep, out=markers)
 
     def _unclump(self, min_dist: Number) -> Tuple[np.ndarray, int]:
         """
@@ -272,12 +373,12 @@ class _WatershedSegmenter:
         )
 
         # label the maxima for watershed
-        markers, num_objs = spm.label(local_maxi)
+        markers, num_objs = spm.label(local_maxi, output=np.uint32)
 
         # run watershed, using the distances in the thresholded image as basins.
         # Uses the original image as a mask, preventing any background pixels from being labeled
         labels_ws: np.ndarray = watershed(-distance, markers, mask=im)
-        return labels_ws, num_objs
+        return _as_uint32(labels_ws), num_objs
 
     def watershed_mask(self, stain_thresh: Number, markers: np.ndarray, disk_size: Optional[int]):
         """Create a watershed mask that is the union of the spot intensities above stain_thresh and
@@ -309,7 +410,7 @@ class _WatershedSegmenter:
 
         Parameters
         ----------
-        markers : np.ndarray[np.int64]
+        markers : np.ndarray[np.uint32]
             an array marking the basins with the values to be assigned in the label matrix.
             Zero means not a marker.
         watershed_mask : np.ndarray[bool]
@@ -317,21 +418,21 @@ class _WatershedSegmenter:
 
         Returns
         -------
-        np.ndarray[np.int32] :
+        np.ndarray[np.uint32] :
             labeled image, each segment has a unique integer value
         """
         img = 1 - self.stain
 
         res = watershed(image=img,
                         markers=markers,
-                        connectivity=np.ones((3, 3), bool),
+                        connectivity=np.ones((3,) * img.ndim, bool),
                         mask=watershed_mask
                         )
 
-        return res
+        return _as_uint32(res)
 
     @staticmethod
-    def relabel_image(image: np.ndarray) -> np.ndarray:
+    def relabel_image(image: np.ndarray) -> Tuple[np.ndarray, int]:
         """given a label image where some objects have been removed, relabel it with sequential integers
 
         Parameters
@@ -347,10 +448,7 @@ class _WatershedSegmenter:
         num_labels : int
             number of unique objects
         """
-        output = np.empty_like(image)
-        for i, v in enumerate(np.unique(image)):
-            output[np.where(image == v)] = i
-        return output, i
+        return relabel(image, label_areas(image) > 0)
 
     def show(self, figsize=(10, 10)):
         import matplotlib.pyplot as plt
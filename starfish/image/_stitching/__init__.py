@@ -0,0 +1,3 @@
+from starfish.pipeline import import_all_submodules
+from ._base import Stitching
+import_all_submodules(__file__, __package__)
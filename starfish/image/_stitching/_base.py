@@ -0,0 +1,54 @@
+from abc import abstractmethod
+from typing import Type
+
+import click
+import pandas as pd
+
+from starfish.experiment.experiment import Experiment
+from starfish.pipeline import PipelineComponent
+from starfish.pipeline.algorithmbase import AlgorithmBase
+
+
+COMPONENT_NAME = "stitching"
+
+
+class Stitching(PipelineComponent):
+
+    @classmethod
+    def pipeline_component_type_name(cls) -> str:
+        return COMPONENT_NAME
+
+    @classmethod
+    def _cli_run(cls, ctx, instance):
+        output = ctx.obj["output"]
+        experiment = ctx.obj["experiment"]
+        placements = instance.run(experiment)
+        print(f"Writing placements to {output}")
+        placements.to_csv(output)
+
+    @staticmethod
+    @click.group(COMPONENT_NAME)
+    @click.option("--experiment", required=True, type=click.Path(exists=True),
+                  help="The experiment.json whose fields of view are stitched.")
+    @click.option("-o", "--output", required=True,
+                  help="csv file of the stitched position of each field of view")
+    @click.pass_context
+    def _cli(ctx, experiment, output):
+        """place the fields of view of an experiment relative to each other"""
+        print("Stitching...")
+        ctx.obj = dict(
+            component=Stitching,
+            output=output,
+            experiment=Experiment.from_json(experiment),
+        )
+
+
+class StitchingAlgorithmBase(AlgorithmBase):
+    @classmethod
+    def get_pipeline_component_class(cls) -> Type[PipelineComponent]:
+        return Stitching
+
+    @abstractmethod
+    def run(self, experiment: Experiment, *args) -> pd.DataFrame:
+        """Computes the stitched position of each field of view of the experiment."""
+        raise NotImplementedError()
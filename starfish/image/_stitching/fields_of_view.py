@@ -0,0 +1,353 @@
+from multiprocessing import Pool
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.linalg import lsqr
+from scipy.spatial import cKDTree
+from skimage.feature import register_translation
+from slicedimage import TileSet
+
+from starfish.experiment.experiment import Experiment, FieldOfView
+from starfish.multiprocessing.shmem import SharedMemory
+from starfish.types import Axes, Coordinates
+from starfish.util import click
+from starfish.util.fft import fast_shape, irfftn, rfftn
+from ._base import StitchingAlgorithmBase
+
+
+class _Extent(NamedTuple):
+    """the physical coordinates of the first and last pixels of a field of view along y and x,
+    and its size in pixels"""
+    ymin: float
+    ymax: float
+    xmin: float
+    xmax: float
+    height: int
+    width: int
+
+    @property
+    def pixel_size(self) -> Tuple[float, float]:
+        return (
+            (self.ymax - self.ymin) / max(self.height - 1, 1),
+            (self.xmax - self.xmin) / max(self.width - 1, 1),
+        )
+
+
+class _Overlap(NamedTuple):
+    """the pixels of two fields of view that their nominal coordinates place on the same
+    rectangle. Strips start on whole pixels, so the nominal positions of their first pixels differ
+    by nominal_offset, a fraction of a pixel along each axis."""
+    first: int
+    second: int
+    first_slices: Tuple[slice, slice]
+    second_slices: Tuple[slice, slice]
+    nominal_offset: np.ndarray
+    area: int
+
+
+class StitchFieldsOfView(StitchingAlgorithmBase):
+    """
+    Places the fields of view of an Experiment relative to each other by cross-correlating the
+    regions where they overlap.
+
+    The nominal physical coordinates of each field of view are read from the xc and yc coordinates
+    of the tiles of its primary image. A k-d tree of the fields' centers finds the pairs of fields
+    that can overlap, so the number of pairs examined grows with the number of fields rather than
+    with its square. For each overlapping pair, only the strips of the two maximum projections
+    that cover the overlap are loaded and cross-correlated, in a worker pool. The measured
+    pairwise offsets are then reconciled by a global least-squares fit of the position of every
+    field, weighted by the area of each overlap and weakly tied to the nominal position of each
+    field so that fields without overlaps stay in place.
+    """
+
+    def __init__(
+            self, upsampling: int=1, min_overlap: int=16, prior_weight: float=1e-3,
+            **kwargs
+    ) -> None:
+        """
+        Parameters
+        ----------
+        upsampling : int
+            pairwise offsets are measured to within 1 / upsampling of a pixel (default 1)
+        min_overlap : int
+            pairs of fields of view that overlap by fewer pixels than this along y or x are not
+            correlated (default 16)
+        prior_weight : float
+            weight of the nominal position of each field of view in the least-squares fit,
+            relative to each pairwise offset (default 1e-3)
+
+        """
+        self.upsampling = upsampling
+        self.min_overlap = min_overlap
+        self.prior_weight = prior_weight
+
+    def run(
+            self, experiment: Experiment, n_processes: Optional[int]=None, *args
+    ) -> pd.DataFrame:
+        """Compute the stitched position of every field of view of an experiment.
+
+        Parameters
+        ----------
+        experiment : Experiment
+            The experiment whose fields of view are stitched
+        n_processes : Optional[int]
+            The number of processes that correlate overlaps. If None, uses the output of
+            os.cpu_count() (default = None).
+
+        Returns
+        -------
+        pd.DataFrame :
+            One row per field of view, indexed by name, with the y_offset and x_offset in pixels
+            that move it from its nominal position to its stitched position, and the stitched
+            physical coordinates ymin and xmin of its first pixel.
+
+        """
+        fovs = experiment.fovs()
+        extents = [_primary_extent(fov) for fov in fovs]
+        overlaps = _find_overlaps(extents, self.min_overlap)
+
+        shifts: List[Tuple[np.ndarray, float]] = []
+        if overlaps:
+            jobs = [
+                (fovs[o.first].name, o.first_slices, fovs[o.second].name, o.second_slices)
+                for o in overlaps
+            ]
+            with Pool(
+                    processes=n_processes,
+                    initializer=SharedMemory.initializer,
+                    initargs=((experiment, self.upsampling),)) as pool:
+                shifts = pool.map(_correlate_overlap, jobs)
+
+        # the content at pixel p of the first strip is found at pixel p + shift of the second, so
+        # the second field of view moves by -shift relative to the first
+        offsets = [o.nominal_offset - shift for o, (shift, _) in zip(overlaps, shifts)]
+        y_offsets, x_offsets = solve_placement(
+            len(fovs), overlaps, offsets, self.prior_weight, weights=[o.area for o in overlaps])
+
+        pixel_y, pixel_x = extents[0].pixel_size
+        return pd.DataFrame(
+            {
+                'y_offset': y_offsets,
+                'x_offset': x_offsets,
+                'ymin': [e.ymin + y * pixel_y for e, y in zip(extents, y_offsets)],
+                'xmin': [e.xmin + x * pixel_x for e, x in zip(extents, x_offsets)],
+            },
+            index=pd.Index([fov.name for fov in fovs], name='fov'),
+        )
+
+    @staticmethod
+    @click.command("StitchFieldsOfView")
+    @click.option("--upsampling", default=1, type=int, help="Amount of up-sampling")
+    @click.option("--min-overlap", default=16, type=int,
+                  help="Smallest overlap, in pixels, of the pairs that are correlated")
+    @click.option("--prior-weight", default=1e-3, type=float,
+                  help="Weight of the nominal positions in the least-squares fit")
+    @click.pass_context
+    def _cli(ctx, upsampling, min_overlap, prior_weight):
+        ctx.obj["component"]._cli_run(
+            ctx, StitchFieldsOfView(upsampling, min_overlap, prior_weight))
+
+
+def _coordinate_range(tileset: TileSet, coordinate: Coordinates) -> Tuple[float, float]:
+    values: List[float] = []
+    for tile in tileset.tiles():
+        value = tile.coordinates[coordinate]
+        if isinstance(value, tuple):
+            values.extend(value)
+        else:
+            values.append(value)
+    return min(values), max(values)
+
+
+def _primary_extent(fov: FieldOfView) -> _Extent:
+    tileset = fov.get_tileset(FieldOfView.PRIMARY_IMAGES)
+    ymin, ymax = _coordinate_range(tileset, Coordinates.Y)
+    xmin, xmax = _coordinate_range(tileset, Coordinates.X)
+    if ymin == ymax or xmin == xmax:
+        raise ValueError(
+            f"the primary image of {fov.name} has no physical extent along y or x, so its "
+            f"overlaps cannot be found")
+    tile_shape = tileset.default_tile_shape
+    if tile_shape is None:
+        tile_shape = next(iter(tileset.tiles())).tile_shape
+    return _Extent(ymin, ymax, xmin, xmax, int(tile_shape[Axes.Y]), int(tile_shape[Axes.X]))
+
+
+def _overlap_slices(
+        extent: _Extent, start: Sequence[float], size: Sequence[int]
+) -> Tuple[Tuple[slice, slice], np.ndarray]:
+    """the pixels of extent, size[axis] long, starting nearest the physical coordinate start, and
+    how many pixels the first of them lies after start"""
+    pixel_size = extent.pixel_size
+    origin = (extent.ymin, extent.xmin)
+    slices = []
+    rounding = np.zeros(2)
+    for axis in range(2):
+        exact = (start[axis] - origin[axis]) / pixel_size[axis]
+        first = int(np.clip(round(exact), 0, (extent.height, extent.width)[axis] - size[axis]))
+        slices.append(slice(first, first + size[axis]))
+        rounding[axis] = first - exact
+    return (slices[0], slices[1]), rounding
+
+
+def _find_overlaps(extents: Sequence[_Extent], min_overlap: int) -> List[_Overlap]:
+    """the pairs of fields of view whose nominal extents overlap by at least min_overlap pixels
+    along both axes"""
+    if len(extents) < 2:
+        return []
+    centers = np.array([((e.ymin + e.ymax) / 2, (e.xmin + e.xmax) / 2) for e in extents])
+    # fields whose centers are further apart than the longest diagonal cannot overlap
+    diameter = max(np.hypot(e.ymax - e.ymin, e.xmax - e.xmin) for e in extents)
+    candidates = cKDTree(centers).query_pairs(diameter)
+
+    overlaps = []
+    for first, second in sorted(candidates):
+        a, b = extents[first], extents[second]
+        start = (max(a.ymin, b.ymin), max(a.xmin, b.xmin))
+        stop = (min(a.ymax, b.ymax), min(a.xmax, b.xmax))
+        pixel_size = a.pixel_size
+        size = [
+            int(np.floor((hi - lo) / step + 1e-6)) + 1 if hi >= lo else 0
+            for lo, hi, step in zip(start, stop, pixel_size)
+        ]
+        size = [min(n, a_n, b_n) for n, a_n, b_n in zip(
+            size, (a.height, a.width), (b.height, b.width))]
+        if min(size) < min_overlap:
+            continue
+        first_slices, first_rounding = _overlap_slices(a, start, size)
+        second_slices, second_rounding = _overlap_slices(b, start, size)
+        overlaps.append(_Overlap(
+            first, second, first_slices, second_slices, first_rounding - second_rounding,
+            size[0] * size[1]))
+    return overlaps
+
+
+def _overlap_projection(experiment: Experiment, name: str, slices: Tuple[slice, slice]):
+    image = experiment[name].get_image(
+        FieldOfView.PRIMARY_IMAGES, y_slice=slices[0], x_slice=slices[1])
+    projection = image.max_proj(Axes.ROUND, Axes.CH, Axes.ZPLANE)
+    return projection._squeezed_numpy(Axes.ROUND, Axes.CH, Axes.ZPLANE)
+
+
+def _correlate_overlap(
+        job: Tuple[str, Tuple[slice, slice], str, Tuple[slice, slice]]
+) -> Tuple[np.ndarray, float]:
+    """cross-correlate the overlap strips of two fields of view, with the contract of
+    compute_shift"""
+    experiment, upsampling = SharedMemory.get_payload()
+    first_name, first_slices, second_name, second_slices = job
+    first = _overlap_projection(experiment, first_name, first_slices)
+    second = _overlap_projection(experiment, second_name, second_slices)
+    return overlap_shift(second, first, upsampling)
+
+
+def overlap_shift(
+        im: np.ndarray, ref: np.ndarray, upsample_factor: int=1
+) -> Tuple[np.ndarray, float]:
+    """calculate the subpixel translation between two overlap strips of the same shape
+
+    Strips are narrow, so the circular cross-correlation of compute_shift is biased towards small
+    shifts by the pixels that only one strip contains. The whole-pixel shift is instead the peak
+    of the zero-padded cross-correlation of the mean-subtracted strips, divided by the number of
+    pixels that overlap at each shift and restricted to shifts at which at least half of the
+    pixels overlap. The pixels that overlap at that shift are then registered with compute_shift
+    for the subpixel residual, after tapering them with a Hann window.
+
+    Parameters
+    ----------
+    im : np.ndarray
+        reference image
+    ref : np.ndarray
+        target image
+    upsample_factor : int
+        images are registered to within 1 / upsample_factor of a pixel
+
+    Returns
+    -------
+    np.ndarray :
+        shift vector required to register ref
+    float :
+        translation invariant normalized RMS error of the overlapping pixels
+    """
+    im = np.asarray(im, dtype=np.float32)
+    ref = np.asarray(ref, dtype=np.float32)
+    shape = fast_shape([2 * n for n in ref.shape])
+    correlation = irfftn(
+        rfftn(im - im.mean(), shape) * np.conj(rfftn(ref - ref.mean(), shape)), shape)
+    ones_spectrum = rfftn(np.ones(ref.shape, dtype=np.float32), shape)
+    counts = irfftn(ones_spectrum * np.conj(ones_spectrum), shape)
+    valid = counts > ref.size / 2
+    correlation[valid] /= counts[valid]
+    correlation[~valid] = -np.inf
+
+    peak = np.unravel_index(np.argmax(correlation), correlation.shape)
+    shift = np.array([p - n if p > n // 2 else p for p, n in zip(peak, shape)])
+
+    # ref[p] matches im[p + shift]
+    ref_slices = tuple(slice(max(0, -s), n - max(0, s)) for s, n in zip(shift, ref.shape))
+    im_slices = tuple(slice(max(0, s), n - max(0, -s)) for s, n in zip(shift, ref.shape))
+    ref_overlap, im_overlap = ref[ref_slices], im[im_slices]
+    window = np.outer(*(np.hanning(n + 2)[1:-1] for n in ref_overlap.shape))
+    residual, error, _ = register_translation(
+        (im_overlap - im_overlap.mean()) * window,
+        (ref_overlap - ref_overlap.mean()) * window,
+        upsample_factor,
+    )
+    return shift + residual, error
+
+
+def solve_placement(
+        n_fovs: int, overlaps: Sequence[_Overlap], offsets: Sequence[np.ndarray],
+        prior_weight: float=1e-3, weights: Optional[Sequence[float]]=None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the corrections to the nominal positions of n_fovs fields of view that best agree, in
+    the least-squares sense, with the measured offsets between overlapping pairs.
+
+    Parameters
+    ----------
+    n_fovs : int
+        number of fields of view
+    overlaps : Sequence[_Overlap]
+        the overlapping pairs of fields of view
+    offsets : Sequence[np.ndarray]
+        for each overlap, the (y, x) correction of the second field of view minus the correction
+        of the first that aligns their overlap strips
+    prior_weight : float
+        weight of the equations that keep each correction near zero, relative to the largest
+        weight of an offset
+    weights : Optional[Sequence[float]]
+        relative weight of each offset, such as the area of its overlap. If None, all offsets
+        weigh the same.
+
+    Returns
+    -------
+    Tuple[np.ndarray, np.ndarray] :
+        the y and x corrections, in pixels, of every field of view
+    """
+    if weights is None or not len(weights):
+        weights = [1.] * len(overlaps)
+    # weighted least squares: scale each equation by the square root of its weight
+    scales = np.sqrt(np.asarray(weights, dtype=float) / np.max(weights, initial=1e-300))
+
+    rows: List[int] = []
+    cols: List[int] = []
+    values: List[float] = []
+    for equation, (overlap, scale) in enumerate(zip(overlaps, scales)):
+        rows += [equation, equation]
+        cols += [overlap.second, overlap.first]
+        values += [scale, -scale]
+    for fov in range(n_fovs):
+        rows.append(len(overlaps) + fov)
+        cols.append(fov)
+        values.append(prior_weight)
+    design = coo_matrix((values, (rows, cols)), shape=(len(overlaps) + n_fovs, n_fovs)).tocsr()
+
+    measured = np.zeros((len(overlaps) + n_fovs, 2))
+    if len(offsets):
+        measured[:len(overlaps)] = np.asarray(offsets) * scales[:, None]
+    y_offsets = lsqr(design, measured[:, 0], atol=1e-10, btol=1e-10)[0]
+    x_offsets = lsqr(design, measured[:, 1], atol=1e-10, btol=1e-10)[0]
+    return y_offsets, x_offsets
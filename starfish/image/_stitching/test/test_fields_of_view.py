@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from scipy.ndimage import gaussian_filter
+from slicedimage import Tile, TileSet
+
+from starfish.experiment.experiment import Experiment, FieldOfView
+from starfish.image import Registration, Stitching
+from starfish.image._registration.fourier_shift import shift_im
+from starfish.image._stitching.fields_of_view import overlap_shift, StitchFieldsOfView
+from starfish.types import Axes, Coordinates
+from starfish.util.synthesize import SyntheticData
+
+FOV_SIZE = 96
+STEP = 70
+PIXEL_SIZE = 0.5
+
+
+def fov_tileset(image: np.ndarray, y: int, x: int, nominal_y: float, nominal_x: float) -> TileSet:
+    """a one-tile primary image cut from image at pixel (y, x), whose tile coordinates claim that
+    it starts at the physical coordinates (nominal_y, nominal_x)"""
+    tileset = TileSet(
+        [Axes.X, Axes.Y, Axes.CH, Axes.ZPLANE, Axes.ROUND],
+        {Axes.CH: 1, Axes.ROUND: 1, Axes.ZPLANE: 1},
+        {Axes.Y: FOV_SIZE, Axes.X: FOV_SIZE})
+    extent = (FOV_SIZE - 1) * PIXEL_SIZE
+    tile = Tile(
+        {
+            Coordinates.Y: (nominal_y, nominal_y + extent),
+            Coordinates.X: (nominal_x, nominal_x + extent),
+            Coordinates.Z: (0.0, 0.0),
+        },
+        {Axes.ROUND: 0, Axes.CH: 0, Axes.ZPLANE: 0},
+    )
+    tile.numpy_array = image[y:y + FOV_SIZE, x:x + FOV_SIZE].astype(np.float32)
+    tileset.add_tile(tile)
+    return tileset
+
+
+def stitched_experiment(errors):
+    """a grid of fields of view cut from one image, each with its nominal position off by the
+    corresponding error, in pixels"""
+    image = gaussian_filter(np.random.RandomState(0).random_sample((300, 300)), 2)
+    image = (image - image.min()) / (image.max() - image.min())
+    fovs = []
+    for index, (dy, dx) in enumerate(errors):
+        y, x = (index // 3) * STEP, (index % 3) * STEP
+        tileset = fov_tileset(
+            image, y, x, (y + dy) * PIXEL_SIZE + 100, (x + dx) * PIXEL_SIZE - 20)
+        fovs.append(FieldOfView(f"fov_{index:03d}", {FieldOfView.PRIMARY_IMAGES: tileset}))
+    return Experiment(fovs, SyntheticData().codebook(), {})
+
+
+def test_stitching_recovers_stage_errors():
+    errors = np.array([(0, 0), (3, -2), (-2, 1), (2, 3), (-1, -3), (3, 2)])
+    experiment = stitched_experiment(errors)
+
+    placements = StitchFieldsOfView(min_overlap=8).run(experiment, n_processes=2)
+
+    assert list(placements.index) == [f"fov_{i:03d}" for i in range(6)]
+    # positions are determined up to a common translation
+    corrections = placements[['y_offset', 'x_offset']].values
+    corrections -= corrections[0]
+    assert np.allclose(corrections, -(errors - errors[0]), atol=0.05)
+    # the stitched coordinates undo the errors
+    stitched_y = placements['ymin'].values - placements['ymin'].values[0]
+    assert np.allclose(stitched_y, [(i // 3) * STEP * PIXEL_SIZE for i in range(6)], atol=0.05)
+
+
+def test_stitching_without_overlaps_keeps_nominal_positions():
+    experiment = stitched_experiment([(0, 0)])
+    placements = StitchFieldsOfView().run(experiment)
+    assert np.allclose(placements[['y_offset', 'x_offset']].values, 0)
+    assert placements.loc['fov_000', 'ymin'] == pytest.approx(100)
+
+
+@pytest.mark.parametrize("shift", [(2.5, -3.), (-6., 4.3), (0., 0.)])
+def test_overlap_shift_of_narrow_strips(shift):
+    """narrow strips whose content is offset by a large fraction of their width"""
+    image = gaussian_filter(np.random.RandomState(1).random_sample((200, 200)), 2)
+    shifted = shift_im(image, np.array(shift))
+    ref = image[50:150, 80:110]
+    im = shifted[50:150, 80:110]
+
+    estimated, error = overlap_shift(im, ref, upsample_factor=10)
+    assert np.allclose(estimated, -np.array(shift), atol=0.15)
+    assert 0 <= error < 0.3
+
+
+def test_stitching_is_its_own_pipeline_component():
+    """stitching runs on experiments, so it is not offered with the registration algorithms,
+    which run on ImageStacks"""
+    assert Stitching.StitchFieldsOfView is StitchFieldsOfView
+    assert 'StitchFieldsOfView' not in Registration._algorithm_to_class_map()
@@ -695,7 +695,8 @@ class ImageStack:
 
         # scale based on values of whole image
         if clip_method == Clip.SCALE_BY_IMAGE:
-            self._data = preserve_float_range(self._data, rescale=True)
+            data = self.xarray.values
+            preserve_float_range(data, rescale=True, out=data)
 
         return self
 
@@ -705,10 +706,11 @@ class ImageStack:
         clip_method: Union[str, Clip], **kwargs
     ) -> None:
         result = apply_func(data, **kwargs)
+        # clip or scale the result directly into the shared buffer without intermediate copies
         if clip_method == Clip.CLIP:
-            data[:] = preserve_float_range(result, rescale=False)
+            preserve_float_range(result, rescale=False, out=np.asarray(data))
         elif clip_method == Clip.SCALE_BY_CHUNK:
-            data[:] = preserve_float_range(result, rescale=True)
+            preserve_float_range(result, rescale=True, out=np.asarray(data))
         else:
             data[:] = result
 
@@ -876,8 +878,10 @@ class ImageStack:
         ----------
         class_instance: The instance of a class being applied to the imagestack
         """
+        # the attributes are copied, so that later runs of the same instance that reassign them
+        # (e.g. to record per-run results) do not rewrite this entry
         entry = {"method": class_instance.__class__.__name__,
-                 "arguments": class_instance.__dict__,
+                 "arguments": dict(class_instance.__dict__),
                  "os": logging.get_os_info(),
                  "dependencies": logging.get_core_dependency_info(),
                  "release tag": logging.get_release_tag(),
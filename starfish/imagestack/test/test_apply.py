@@ -98,3 +98,19 @@ def test_apply_clipping_methods():
         res.sel({Axes.ROUND: 1, Axes.CH: 1}).xarray,
         imagestack.sel({Axes.ROUND: 1, Axes.CH: 1}).xarray
     )
+
+
+def test_apply_scale_by_image_in_place():
+    """test that scaling by image rescales the stack in place, so it can be processed further"""
+    data = np.full((2, 2, 2, 5, 5), fill_value=0.5, dtype=np.float32)
+    data[1, 1, 1, 1, 1] = 1
+    imagestack = ImageStack.from_numpy_array(data)
+
+    res = imagestack.apply(
+        lambda x: x * 2, clip_method=Clip.SCALE_BY_IMAGE, in_place=False, n_processes=1
+    )
+    assert res.xarray.dtype == np.float32
+    assert np.allclose(res.xarray.values, data)
+
+    res.apply(divide, value=2, in_place=True, n_processes=1)
+    assert np.allclose(res.xarray.values, data / 2)
@@ -0,0 +1,256 @@
+from typing import Iterator, Sequence
+
+import numpy as np
+
+# the number of rows encoded at a time
+_ROW_CHUNK_SIZE = 1024
+
+
+class RunLengthLabelImage:
+
+    """Run-length encoded label image
+
+    A label image marks the pixels of each segmented object with the object's positive integer
+    label, and the background with 0. Most pixels of a whole-slide label image are background,
+    and the objects are horizontal runs of equal labels, so a RunLengthLabelImage stores only the
+    runs of nonzero labels along each row of the (z, y, x) or (y, x) image: the flat index of the
+    first pixel of each run, its length and its label, in the order of the flat indices.
+
+    Methods
+    -------
+    from_label_image(label_image)
+        encode a dense label image
+    to_label_image()
+        decode into a dense label image
+    values_at(indices)
+        look up the labels of points
+    areas()
+        number of pixels of each label
+    centroids()
+        mean position of the pixels of each label
+    save(filename)
+        save to a compressed .npz file
+    load(filename)
+        load from a .npz file written by save
+    """
+
+    def __init__(
+            self, shape: Sequence[int], starts: np.ndarray, lengths: np.ndarray,
+            labels: np.ndarray
+    ) -> None:
+        """
+        Parameters
+        ----------
+        shape : Sequence[int]
+            shape of the (y, x) or (z, y, x) label image
+        starts : np.ndarray[np.int64]
+            increasing flat indices of the first pixel of each run
+        lengths : np.ndarray[np.uint32]
+            number of pixels in each run. Runs do not extend past the end of their row.
+        labels : np.ndarray[np.uint32]
+            positive label of each run
+        """
+        if len(shape) not in (2, 3):
+            raise ValueError(f"label images must be 2 or 3 dimensional, not {len(shape)}D.")
+        if not len(starts) == len(lengths) == len(labels):
+            raise ValueError("starts, lengths and labels must have the same length")
+        self.shape = tuple(int(n) for n in shape)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.lengths = np.asarray(lengths, dtype=np.uint32)
+        self.labels = np.asarray(labels, dtype=np.uint32)
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    @property
+    def n_labels(self) -> int:
+        """the largest label"""
+        return int(self.labels.max()) if len(self.labels) else 0
+
+    def __repr__(self) -> str:
+        return (
+            f"<RunLengthLabelImage shape={self.shape} runs={len(self.labels)} "
+            f"n_labels={self.n_labels}>"
+        )
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, RunLengthLabelImage)
+            and self.shape == other.shape
+            and np.array_equal(self.starts, other.starts)
+            and np.array_equal(self.lengths, other.lengths)
+            and np.array_equal(self.labels, other.labels)
+        )
+
+    @staticmethod
+    def _row_chunks(n_rows: int) -> Iterator[slice]:
+        for start in range(0, n_rows, _ROW_CHUNK_SIZE):
+            yield slice(start, min(start + _ROW_CHUNK_SIZE, n_rows))
+
+    @classmethod
+    def from_label_image(cls, label_image: np.ndarray) -> "RunLengthLabelImage":
+        """Encode a dense (y, x) or (z, y, x) label image
+
+        Parameters
+        ----------
+        label_image : np.ndarray
+            label image whose objects are labeled by positive integers, and whose background is 0
+
+        Returns
+        -------
+        RunLengthLabelImage :
+            run-length encoding of label_image
+        """
+        if label_image.ndim not in (2, 3):
+            raise ValueError(
+                f"label images must be 2 or 3 dimensional, not {label_image.ndim}D.")
+        width = label_image.shape[-1]
+        rows = label_image.reshape(-1, width)
+        starts, lengths, labels = [], [], []
+        for chunk in cls._row_chunks(rows.shape[0]):
+            block = rows[chunk]
+            # a run starts at the beginning of every row, and wherever the label changes
+            changes = np.ones(block.shape, dtype=bool)
+            np.not_equal(block[:, 1:], block[:, :-1], out=changes[:, 1:])
+            flat_changes = np.flatnonzero(changes)
+            run_labels = block.reshape(-1)[flat_changes]
+            run_lengths = np.diff(np.append(flat_changes, block.size))
+            foreground = run_labels != 0
+            starts.append(flat_changes[foreground] + chunk.start * width)
+            lengths.append(run_lengths[foreground])
+            labels.append(run_labels[foreground])
+        return cls(
+            label_image.shape,
+            np.concatenate(starts) if starts else np.zeros(0, dtype=np.int64),
+            np.concatenate(lengths) if lengths else np.zeros(0, dtype=np.uint32),
+            np.concatenate(labels) if labels else np.zeros(0, dtype=np.uint32),
+        )
+
+    def to_label_image(self) -> np.ndarray:
+        """Decode into a dense label image
+
+        Returns
+        -------
+        np.ndarray[np.uint32] :
+            label image of shape self.shape
+        """
+        label_image = np.zeros(self.shape, dtype=np.uint32)
+        flat = label_image.reshape(-1)
+        # the flat index of every pixel of every run: the run's start, plus the pixel's position
+        # in the run
+        lengths = self.lengths.astype(np.int64)
+        run_offsets = np.cumsum(lengths) - lengths
+        indices = np.repeat(self.starts - run_offsets, lengths) + np.arange(lengths.sum())
+        flat[indices] = np.repeat(self.labels, lengths)
+        return label_image
+
+    def values_at(self, indices: Sequence[np.ndarray]) -> np.ndarray:
+        """Look up the labels of points, like label_image[tuple(indices)] for the decoded label
+        image
+
+        Parameters
+        ----------
+        indices : Sequence[np.ndarray]
+            integer (y, x) or (z, y, x) coordinates of the points, one array per axis
+
+        Returns
+        -------
+        np.ndarray[np.uint32] :
+            label at each point, or 0 for points in the background
+        """
+        if len(indices) != self.ndim:
+            raise ValueError(
+                f"expected {self.ndim} arrays of coordinates, not {len(indices)}")
+        flat_indices = np.ravel_multi_index(
+            tuple(np.asarray(axis_indices) for axis_indices in indices), self.shape)
+        values = np.zeros(flat_indices.shape, dtype=np.uint32)
+        if len(self.starts) == 0:
+            return values
+        # the last run that starts at or before each point contains it, if it is long enough
+        runs = np.searchsorted(self.starts, flat_indices, side='right') - 1
+        found = runs >= 0
+        runs = np.maximum(runs, 0)
+        found &= flat_indices < self.starts[runs] + self.lengths[runs]
+        values[found] = self.labels[runs[found]]
+        return values
+
+    def areas(self) -> np.ndarray:
+        """Count the pixels of each label
+
+        Returns
+        -------
+        np.ndarray[np.int64] :
+            array of length n_labels + 1 whose i-th entry is the area of label i. The 0th entry is
+            the area of the background, as for starfish.util.label.label_areas.
+        """
+        areas = np.bincount(
+            self.labels, weights=self.lengths, minlength=self.n_labels + 1).astype(np.int64)
+        areas[0] = int(np.prod(self.shape)) - areas[1:].sum()
+        return areas
+
+    def centroids(self) -> np.ndarray:
+        """Compute the mean (y, x) or (z, y, x) position of the pixels of each label
+
+        Returns
+        -------
+        np.ndarray[np.float64] :
+            array of shape (n_labels + 1, ndim) whose i-th row is the centroid of label i. Rows of
+            labels that are not present, including the background, are NaN.
+        """
+        n_labels = self.n_labels
+        lengths = self.lengths.astype(np.float64)
+        row_coordinates = np.unravel_index(self.starts, self.shape)
+        centroids = np.full((n_labels + 1, self.ndim), np.nan)
+        areas = np.bincount(self.labels, weights=lengths, minlength=n_labels + 1)
+        present = areas > 0
+        # every pixel of a run shares the run's z and y; x runs from start to start + length - 1
+        for axis, axis_coordinates in enumerate(row_coordinates):
+            if axis == self.ndim - 1:
+                sums = lengths * (axis_coordinates + (lengths - 1) / 2)
+            else:
+                sums = lengths * axis_coordinates
+            centroids[present, axis] = (
+                np.bincount(self.labels, weights=sums, minlength=n_labels + 1)[present]
+                / areas[present])
+        centroids[0] = np.nan
+        return centroids
+
+    def save(self, filename: str) -> None:
+        """Save the runs to a compressed .npz file
+
+        Parameters
+        ----------
+        filename : str
+            name of the file. numpy appends .npz if it has no extension.
+        """
+        np.savez_compressed(
+            filename,
+            shape=np.array(self.shape, dtype=np.int64),
+            # the gaps between runs are small, so they compress better than the starts
+            start_steps=np.diff(np.concatenate([[0], self.starts])),
+            lengths=self.lengths,
+            labels=self.labels,
+        )
+
+    @classmethod
+    def load(cls, filename: str) -> "RunLengthLabelImage":
+        """Load a RunLengthLabelImage from a .npz file written by save
+
+        Parameters
+        ----------
+        filename : str
+            name of the file
+
+        Returns
+        -------
+        RunLengthLabelImage :
+            the saved label image
+        """
+        with np.load(filename) as data:
+            return cls(
+                tuple(data['shape']),
+                np.cumsum(data['start_steps']).astype(np.int64),
+                data['lengths'],
+                data['labels'],
+            )
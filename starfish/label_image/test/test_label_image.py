@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from scipy.ndimage import center_of_mass, label
+
+from starfish.label_image import label_image as label_image_module
+from starfish.label_image.label_image import RunLengthLabelImage
+from starfish.util.label import label_areas
+
+
+def _label_image(shape):
+    random = np.random.RandomState(0)
+    return label(random.rand(*shape) > 0.7, output=np.uint32)[0]
+
+
+@pytest.mark.parametrize("shape", [(30, 40), (3, 20, 25), (1, 1)])
+def test_round_trip(shape, monkeypatch):
+    # encode a few rows at a time, so that the image spans several chunks
+    monkeypatch.setattr(label_image_module, "_ROW_CHUNK_SIZE", 7)
+    label_image = _label_image(shape)
+    encoded = RunLengthLabelImage.from_label_image(label_image)
+    assert encoded.shape == shape
+    assert np.array_equal(encoded.to_label_image(), label_image)
+
+
+def test_values_at():
+    label_image = _label_image((3, 20, 25))
+    encoded = RunLengthLabelImage.from_label_image(label_image)
+    indices = np.nonzero(np.ones(label_image.shape, dtype=bool))
+    assert np.array_equal(encoded.values_at(indices), label_image[indices])
+
+    empty = RunLengthLabelImage.from_label_image(np.zeros((5, 5), dtype=np.uint32))
+    assert np.array_equal(empty.values_at(([0, 4], [1, 2])), [0, 0])
+    with pytest.raises(ValueError):
+        encoded.values_at(([0], [1]))
+
+
+def test_areas_and_centroids():
+    label_image = _label_image((3, 20, 25))
+    # remove a label, so that one is missing
+    label_image[label_image == 2] = 0
+    encoded = RunLengthLabelImage.from_label_image(label_image)
+
+    assert np.array_equal(encoded.areas(), label_areas(label_image))
+
+    centroids = encoded.centroids()
+    assert centroids.shape == (label_image.max() + 1, 3)
+    assert np.all(np.isnan(centroids[[0, 2]]))
+    present = [i for i in range(1, label_image.max() + 1) if i != 2]
+    expected = center_of_mass(label_image > 0, label_image, present)
+    assert np.allclose(centroids[present], expected)
+
+
+def test_save_and_load(tmpdir):
+    label_image = np.zeros((200, 300), dtype=np.uint32)
+    label_image[20:60, 30:90] = 1
+    label_image[100:150, 200:280] = 2
+    encoded = RunLengthLabelImage.from_label_image(label_image)
+    filename = str(tmpdir.join("labels.npz"))
+    encoded.save(filename)
+
+    assert RunLengthLabelImage.load(filename) == encoded
+    assert tmpdir.join("labels.npz").size() < label_image.nbytes / 100
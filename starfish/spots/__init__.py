@@ -1,4 +1,5 @@
 from ._decoder import Decoder
 from ._detector import SpotFinder
+from ._detector.sweep import sweep_spot_finder
 from ._pixel_decoder import PixelSpotDecoder
 from ._target_assignment import TargetAssignment
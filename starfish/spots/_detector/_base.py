@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Any, Callable, Sequence, Tuple, Type, Union
+from typing import Any, Callable, Hashable, MutableMapping, Optional, Sequence, Tuple, Type, Union
 
 import click
 import numpy as np
@@ -14,6 +14,25 @@ from starfish.types import Axes, Number, SpotAttributes
 COMPONENT_NAME = "detect_spots"
 
 
+def cached_stage(
+        cache: Optional[MutableMapping[Hashable, Any]], key: Hashable, compute: Callable[[], Any]
+) -> Any:
+    """Return cache[key], calling compute() to fill it if it is missing. If cache is None, the
+    result of compute() is returned without being stored.
+
+    Spot finders use this to share intermediate products (e.g. smoothed images, maxima, labels)
+    between parameter settings evaluated on the same image. Keys must contain every parameter the
+    intermediate product depends on.
+    """
+    if cache is None:
+        return compute()
+    try:
+        return cache[key]
+    except KeyError:
+        result = cache[key] = compute()
+        return result
+
+
 class SpotFinder(PipelineComponent):
     @classmethod
     def pipeline_component_type_name(cls) -> str:
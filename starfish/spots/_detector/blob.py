@@ -1,4 +1,4 @@
-from typing import Optional, Union
+from typing import Any, Hashable, MutableMapping, Optional, Union
 
 import numpy as np
 import pandas as pd
@@ -9,8 +9,10 @@ from starfish.imagestack.imagestack import ImageStack
 from starfish.intensity_table.intensity_table import IntensityTable
 from starfish.types import Axes, Features, Number, SpotAttributes
 from starfish.util import click
-from ._base import SpotFinderAlgorithmBase
-from .detect import detect_spots, measure_spot_intensity
+from ._base import cached_stage, SpotFinderAlgorithmBase
+from .detect import detect_spots
+from .footprint import SpotFootprints
+from .scale_space import SCALE_SPACE_METHODS, ScaleSpace
 
 blob_detectors = {
     'blob_dog': blob_dog,
@@ -18,6 +20,8 @@ blob_detectors = {
     'blob_log': blob_log
 }
 
+engines = {'skimage', 'scale_space'}
+
 
 class BlobDetector(SpotFinderAlgorithmBase):
 
@@ -30,7 +34,10 @@ class BlobDetector(SpotFinderAlgorithmBase):
             overlap: float = 0.5,
             measurement_type='max',
             is_volume: bool = True,
-            detector_method: str = 'blob_log'
+            detector_method: str = 'blob_log',
+            engine: str = 'skimage',
+            pyramid_min_sigma: Optional[Number] = None,
+            n_threads: int = 1,
     ) -> None:
         """Multi-dimensional gaussian spot detector
 
@@ -58,6 +65,21 @@ class BlobDetector(SpotFinderAlgorithmBase):
             name of the function used to calculate the intensity for each identified spot area
         detector_method: str ['blob_dog', 'blob_doh', 'blob_log']
             name of the type of detection method used from skimage.feature, default: blob_log
+        engine : str ['skimage', 'scale_space']
+            'skimage' calls detector_method directly. 'scale_space' computes the blob_log or
+            blob_dog scale-space with cached separable kernels, optionally evaluating sigma levels
+            in parallel threads. Passing a cache to image_to_spots reuses the scale-space when the
+            same image is searched again with a different threshold or overlap (e.g. during a
+            parameter sweep). Results are identical to 'skimage' unless pyramid_min_sigma is set.
+            (default 'skimage')
+        pyramid_min_sigma : Optional[Number]
+            'scale_space' engine only. If provided, sigma levels at or above this value are
+            computed on a downsampled image, which is faster for large sigmas but localizes large
+            blobs only to the downsampled grid. (default None)
+        n_threads : int
+            'scale_space' engine only. Number of threads used to compute the sigma levels of each
+            (round, ch) volume. Volumes are already processed in parallel worker processes, so
+            this should be at most os.cpu_count() // n_processes. (default 1)
 
         Notes
         -----
@@ -82,8 +104,58 @@ class BlobDetector(SpotFinderAlgorithmBase):
             self.detector_method = blob_detectors[detector_method]
         except ValueError:
             raise ValueError("Detector method must be one of {blob_log, blob_dog, blob_doh}")
+        if engine not in engines:
+            raise ValueError(f"engine must be one of {engines}, not {engine}")
+        if engine == 'scale_space' and detector_method not in SCALE_SPACE_METHODS:
+            raise ValueError(
+                f"the scale_space engine supports detector methods {SCALE_SPACE_METHODS}")
+        self.engine = engine
+        self.pyramid_min_sigma = pyramid_min_sigma
+        self.n_threads = n_threads
+
+    def _find_blobs(
+            self,
+            data_image: Union[np.ndarray, xr.DataArray],
+            cache: Optional[MutableMapping[Hashable, Any]]=None,
+    ) -> np.ndarray:
+        """find blobs with the configured engine, returning skimage's (z, y, x, sigma) array"""
+        method = self.detector_method.__name__
+        if method in SCALE_SPACE_METHODS and (cache is not None or self.engine == 'scale_space'):
+            scale_space = cached_stage(
+                cache,
+                ('scale_space', self.min_sigma, self.max_sigma, self.num_sigma, method,
+                 self.pyramid_min_sigma),
+                lambda: ScaleSpace(
+                    data_image,
+                    self.min_sigma,
+                    self.max_sigma,
+                    num_sigma=self.num_sigma,
+                    method=method,
+                    n_threads=self.n_threads,
+                    pyramid_min_sigma=self.pyramid_min_sigma,
+                ),
+            )
+            return scale_space.find_blobs(self.threshold, self.overlap)
+
+        if self.detector_method is blob_dog:
+            # blob_dog takes a sigma ratio instead of a number of sigma levels
+            return blob_dog(
+                data_image, self.min_sigma, self.max_sigma, threshold=self.threshold,
+                overlap=self.overlap)
+        return self.detector_method(
+            data_image,
+            self.min_sigma,
+            self.max_sigma,
+            self.num_sigma,
+            self.threshold,
+            self.overlap
+        )
 
-    def image_to_spots(self, data_image: Union[np.ndarray, xr.DataArray]) -> SpotAttributes:
+    def image_to_spots(
+            self,
+            data_image: Union[np.ndarray, xr.DataArray],
+            cache: Optional[MutableMapping[Hashable, Any]]=None,
+    ) -> SpotAttributes:
         """
         Find spots using a gaussian blob finding algorithm
 
@@ -91,6 +163,11 @@ class BlobDetector(SpotFinderAlgorithmBase):
         ----------
         data_image : Union[np.ndarray, xr.DataArray]
             ImageStack containing blobs to be detected
+        cache : Optional[MutableMapping[Hashable, Any]]
+            If provided, the blob_log or blob_dog scale-space is computed with the scale_space
+            engine, stored in this mapping keyed by its sigma parameters, and reused by later calls
+            that pass the same mapping. A cache must only be shared between calls on the same
+            data_image.
 
         Returns
         -------
@@ -99,14 +176,7 @@ class BlobDetector(SpotFinderAlgorithmBase):
 
         """
 
-        fitted_blobs_array: np.ndarray = self.detector_method(
-            data_image,
-            self.min_sigma,
-            self.max_sigma,
-            self.num_sigma,
-            self.threshold,
-            self.overlap
-        )
+        fitted_blobs_array: np.ndarray = self._find_blobs(data_image, cache)
 
         if fitted_blobs_array.shape[0] == 0:
             return SpotAttributes.empty(extra_fields=['intensity', 'spot_id'])
@@ -122,8 +192,11 @@ class BlobDetector(SpotFinderAlgorithmBase):
         # convert the array to int so it can be used to index
         rounded_blobs = SpotAttributes(fitted_blobs.astype(int))
 
-        rounded_blobs.data['intensity'] = measure_spot_intensity(
-            data_image, rounded_blobs, self.measurement_function)
+        footprints = SpotFootprints.from_spot_attributes(rounded_blobs, data_image.shape)
+        rounded_blobs.data['intensity'] = footprints.measure(data_image, self.measurement_function)
+        # record the measured bounding boxes alongside the spots
+        for column, values in footprints.to_dataframe().items():
+            rounded_blobs.data[column] = values.values
         rounded_blobs.data['spot_id'] = np.arange(rounded_blobs.data.shape[0])
 
         return rounded_blobs
@@ -183,9 +256,23 @@ class BlobDetector(SpotFinderAlgorithmBase):
         help="str ['blob_dog', 'blob_doh', 'blob_log'] name of the type of "
              "detection method used from skimage.feature. Default: blob_log"
     )
+    @click.option(
+        "--engine", default='skimage',
+        help="str ['skimage', 'scale_space'] 'scale_space' computes the scale-space with cached "
+             "kernels and parallel sigma levels. Default: skimage"
+    )
+    @click.option(
+        "--pyramid-min-sigma", default=None, type=float,
+        help="scale_space engine only: compute sigma levels at or above this value on a "
+             "downsampled image"
+    )
     @click.pass_context
-    def _cli(ctx, min_sigma, max_sigma, num_sigma, threshold, overlap, show, detector_method):
+    def _cli(
+            ctx, min_sigma, max_sigma, num_sigma, threshold, overlap, show, detector_method, engine,
+            pyramid_min_sigma
+    ):
         instance = BlobDetector(min_sigma, max_sigma, num_sigma, threshold, overlap,
-                                detector_method=detector_method)
+                                detector_method=detector_method, engine=engine,
+                                pyramid_min_sigma=pyramid_min_sigma)
         #  FIXME: measurement_type, is_volume missing as options; show missing as ctor args
         ctx.obj["component"]._cli_run(ctx, instance)
@@ -1,6 +1,5 @@
 from functools import partial
-from itertools import product
-from typing import Callable, Dict, Optional, Sequence, Tuple, Union
+from typing import Callable, Dict, Optional, Sequence, Set, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -11,6 +10,7 @@ from starfish.intensity_table.intensity_table import IntensityTable
 from starfish.intensity_table.intensity_table_coordinates import \
     transfer_physical_coords_from_imagestack_to_intensity_table
 from starfish.types import Axes, Features, Number, SpotAttributes
+from .footprint import SpotFootprints
 
 
 def measure_spot_intensity(
@@ -41,27 +41,8 @@ def measure_spot_intensity(
         Intensities for each spot in SpotAttributes
 
     """
-
-    def fn(row: pd.Series) -> Number:
-        data = image[
-            row['z_min']:row['z_max'],
-            row['y_min']:row['y_max'],
-            row['x_min']:row['x_max']
-        ]
-        return measurement_function(data)
-
-    if radius_is_gyration:
-        radius = np.ceil(spots.data[Features.SPOT_RADIUS]).astype(int) + 1  # round up
-    else:
-        radius = spots.data[Features.SPOT_RADIUS].astype(int)  # truncate down to nearest integer
-    for v, max_size in zip(['z', 'y', 'x'], image.shape):
-        # numpy does exclusive max indexing, so need to subtract 1 from min to get centered box
-        spots.data[f'{v}_min'] = np.clip(spots.data[v] - (radius - 1), 0, None)
-        spots.data[f'{v}_max'] = np.clip(spots.data[v] + radius, None, max_size)
-    return spots.data[['z_min', 'z_max', 'y_min', 'y_max', 'x_min', 'x_max']].astype(int).apply(
-        fn,
-        axis=1
-    )
+    footprints = SpotFootprints.from_spot_attributes(spots, image.shape, radius_is_gyration)
+    return pd.Series(footprints.measure(image, measurement_function), index=spots.data.index)
 
 
 def measure_spot_intensities(
@@ -69,6 +50,7 @@ def measure_spot_intensities(
         spot_attributes: SpotAttributes,
         measurement_function: Callable[[Sequence], Number],
         radius_is_gyration: bool=False,
+        n_processes: Optional[int]=None,
 ) -> IntensityTable:
     """given spots found from a reference image, find those spots across a data_image
 
@@ -85,6 +67,9 @@ def measure_spot_intensities(
         spot intensity, but typically is a smaller unit than the sigma generated by blob_log.
         In this case, the spot's bounding box is rounded up instead of down when measuring
         intensity. (default False)
+    n_processes : Optional[int]
+        The number of processes used to measure the (round, ch) volumes of data_image. If None,
+        uses the output of os.cpu_count() (default = None).
 
     Returns
     -------
@@ -108,17 +93,65 @@ def measure_spot_intensities(
     if intensity_table.sizes[Features.AXIS] == 0:
         return intensity_table
 
+    # every (round, ch) volume has the same shape, so the spot footprints are computed once. Only
+    # their boxes are pickled into each task, and each worker builds the pixel index once.
+    volume_shape = (
+        data_image.shape[Axes.ZPLANE], data_image.shape[Axes.Y], data_image.shape[Axes.X])
+    footprints = SpotFootprints.from_spot_attributes(
+        spot_attributes, volume_shape, radius_is_gyration)
+
     # fill the intensity table
-    indices = product(range(n_ch), range(n_round))
-    for c, r in indices:
-        image, _ = data_image.get_slice({Axes.CH: c, Axes.ROUND: r})
-        blob_intensities: pd.Series = measure_spot_intensity(
-            image,
-            spot_attributes,
-            measurement_function,
-            radius_is_gyration=radius_is_gyration
-        )
-        intensity_table[:, c, r] = blob_intensities
+    results = data_image.transform(
+        footprints.measure,
+        group_by={Axes.ROUND, Axes.CH},
+        n_processes=n_processes,
+        measurement_function=measurement_function,
+    )
+    for blob_intensities, indices in results:
+        intensity_table[:, indices[Axes.CH], indices[Axes.ROUND]] = blob_intensities
+
+    return intensity_table
+
+
+def spot_attributes_to_intensities(
+        spot_attributes: SpotAttributes, n_ch: int, n_round: int
+) -> IntensityTable:
+    """
+    Convert a SpotAttributes table of spots found independently in each (round, ch) into an
+    IntensityTable, without merging across channels and imaging rounds
+
+    Parameters
+    ----------
+    spot_attributes : SpotAttributes
+        spots with an 'intensity' column and integer Axes.ROUND and Axes.CH columns that give the
+        (round, ch) each spot was found in
+    n_ch : int
+        number of channels of the IntensityTable
+    n_round : int
+        number of imaging rounds of the IntensityTable
+
+    Returns
+    -------
+    IntensityTable :
+        IntensityTable containing one feature per spot, with the spot's intensity stored at its
+        (ch, round) and zeros elsewhere
+
+    """
+    spot_data = spot_attributes.data
+    channels = spot_data[Axes.CH.value].values.astype(int)
+    rounds = spot_data[Axes.ROUND.value].values.astype(int)
+
+    # this drop call ensures only x, y, z, radius, and quality, are passed to the IntensityTable
+    features_coordinates = spot_data.drop(
+        [column for column in ('spot_id', 'intensity', Axes.CH.value, Axes.ROUND.value)
+         if column in spot_data],
+        axis=1)
+
+    intensity_table = IntensityTable.empty_intensity_table(
+        SpotAttributes(features_coordinates), n_ch, n_round,
+    )
+    intensity_table.values[np.arange(len(spot_data)), channels, rounds] = \
+        spot_data['intensity'].values
 
     return intensity_table
 
@@ -145,19 +178,69 @@ def concatenate_spot_attributes_to_intensities(
     n_ch: int = max(inds[Axes.CH] for _, inds in spot_attributes) + 1
     n_round: int = max(inds[Axes.ROUND] for _, inds in spot_attributes) + 1
 
-    all_spots = pd.concat([sa.data for sa, inds in spot_attributes], sort=True)
-    # this drop call ensures only x, y, z, radius, and quality, are passed to the IntensityTable
-    features_coordinates = all_spots.drop(['spot_id', 'intensity'], axis=1)
+    all_spots = pd.concat(
+        [sa.data.assign(**{Axes.CH.value: inds[Axes.CH], Axes.ROUND.value: inds[Axes.ROUND]})
+         for sa, inds in spot_attributes],
+        sort=True,
+        ignore_index=True,
+    )
 
-    intensity_table = IntensityTable.empty_intensity_table(
-        SpotAttributes(features_coordinates), n_ch, n_round,
+    return spot_attributes_to_intensities(SpotAttributes(all_spots), n_ch, n_round)
+
+
+def detect_spots_in_batches(
+        data_stack: ImageStack,
+        batch_spot_finding_method: Callable[[xr.DataArray], SpotAttributes],
+        group_by: Set[Axes]=None,
+        n_processes: Optional[int]=None,
+) -> IntensityTable:
+    """Apply a batched spot finding method to groups of (round, ch) volumes of an ImageStack
+
+    Unlike detect_spots, which dispatches each (round, ch) volume to a worker separately, each
+    worker receives every volume that shares the values of group_by, so per-call setup (e.g.
+    preprocessing) can be amortized across the batch.
+
+    Parameters
+    ----------
+    data_stack : ImageStack
+        The ImageStack containing spots
+    batch_spot_finding_method : Callable[[xr.DataArray], SpotAttributes]
+        Method that receives an xarray of the axes of data_stack that are not in group_by, and
+        returns the spots found in all of its volumes, with a column for each of Axes.ROUND and
+        Axes.CH that is not in group_by.
+    group_by : Set[Axes]
+        Axes that are split across worker tasks (default {Axes.ROUND})
+    n_processes : Optional[int]
+        The number of processes to use in stack.transform. If None, uses the output of
+        os.cpu_count() (default = None).
+
+    Returns
+    -------
+    IntensityTable :
+        IntensityTable containing the intensity of each spot, its radius, and location in pixel
+        coordinates
+
+    """
+    if group_by is None:
+        group_by = {Axes.ROUND}
+
+    results = data_stack.transform(
+        func=batch_spot_finding_method,
+        group_by=group_by,
+        n_processes=n_processes,
     )
 
-    i = 0
-    for attrs, inds in spot_attributes:
-        for _, row in attrs.data.iterrows():
-            intensity_table[i, inds[Axes.CH], inds[Axes.ROUND]] = row['intensity']
-            i += 1
+    spot_data = []
+    for spot_attributes, indices in results:
+        spot_data.append(spot_attributes.data.assign(
+            **{axis.value: index for axis, index in indices.items()}))
+    all_spots = SpotAttributes(pd.concat(spot_data, sort=True, ignore_index=True))
+
+    intensity_table = spot_attributes_to_intensities(
+        all_spots, data_stack.shape[Axes.CH], data_stack.shape[Axes.ROUND])
+
+    transfer_physical_coords_from_imagestack_to_intensity_table(image_stack=data_stack,
+                                                                intensity_table=intensity_table)
 
     return intensity_table
 
@@ -198,8 +281,9 @@ def detect_spots(data_stack: ImageStack,
         If True, pass 3d volumes (x, y, z) to func, else pass 2d tiles (x, y) to func. (default
         True)
     n_processes : Optional[int]
-        The number of processes to use in stack.transform if reference image is None.
-        If None, uses the output of os.cpu_count() (default = None).
+        The number of processes to use in stack.transform, either to find spots in each
+        (round, ch) volume or, if a reference image is used, to measure the reference spots in
+        each (round, ch) volume. If None, uses the output of os.cpu_count() (default = None).
 
     Notes
     -----
@@ -237,6 +321,7 @@ def detect_spots(data_stack: ImageStack,
             spot_attributes=reference_spot_locations,
             measurement_function=measurement_function,
             radius_is_gyration=radius_is_gyration,
+            n_processes=n_processes,
         )
     else:  # don't use a reference image, measure each
         spot_finding_method = partial(spot_finding_method, **spot_finding_kwargs)
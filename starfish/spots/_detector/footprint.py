@@ -0,0 +1,239 @@
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, Union
+from uuid import uuid4
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from starfish.types import Axes, Features, Number, SpotAttributes
+
+BOX_COLUMNS = ['z_min', 'z_max', 'y_min', 'y_max', 'x_min', 'x_max']
+
+# measurement functions that can be evaluated for every spot at once as a segmented reduction
+# over the gathered footprint pixels
+_segment_reductions: Dict[Callable, np.ufunc] = {
+    np.max: np.maximum,
+    np.min: np.minimum,
+    np.sum: np.add,
+    np.mean: np.add,
+}
+
+# the CSR index and gather buffers of the SpotFootprints most recently unpickled in this process,
+# keyed by the footprints' token. Worker processes receive the footprints with every task, and
+# reuse these instead of rebuilding the index for each task.
+_unpickled_index: Dict[str, Tuple[np.ndarray, np.ndarray, Dict[np.dtype, np.ndarray]]] = {}
+
+
+class SpotFootprints:
+
+    def __init__(self, boxes: np.ndarray, image_shape: Sequence[int]) -> None:
+        """Precomputed pixel footprints of a set of spots in a (z, y, x) volume
+
+        The footprints are stored twice: as an (n_spots, 6) integer array of
+        (z_min, z_max, y_min, y_max, x_min, x_max) bounding boxes, and as a compressed sparse row
+        (CSR) index in which the flat (raveled) offsets of the pixels of spot i are
+        indices[indptr[i]:indptr[i + 1]]. Both are built once and can then be reused to measure
+        any number of volumes of image_shape, e.g. each (round, ch) of an ImageStack, without
+        recomputing the boxes or modifying the SpotAttributes they were derived from.
+
+        The CSR index is built on first use. Only the boxes are pickled, so that sending the
+        footprints to worker processes does not copy the index; each process rebuilds it once.
+
+        Parameters
+        ----------
+        boxes : np.ndarray
+            (n_spots, 6) integer array of bounding boxes, with exclusive maxima
+        image_shape : Sequence[int]
+            (z, y, x) shape of the volumes the footprints index into
+
+        """
+        self.boxes = np.asarray(boxes, dtype=np.intp).reshape(-1, 6)
+        self.image_shape = tuple(int(s) for s in image_shape)
+        self._token = uuid4().hex
+        self._index: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._buffers: Dict[np.dtype, np.ndarray] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {'boxes': self.boxes, 'image_shape': self.image_shape, 'token': self._token}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.boxes = state['boxes']
+        self.image_shape = state['image_shape']
+        self._token = state['token']
+        cached = _unpickled_index.get(self._token)
+        if cached is None:
+            # only the most recent footprints are kept, as a process rarely measures two sets
+            _unpickled_index.clear()
+            indptr, indices = self._build_index(self.boxes, self.image_shape)
+            cached = _unpickled_index[self._token] = (indptr, indices, {})
+        self._index = cached[0], cached[1]
+        self._buffers = cached[2]
+
+    @classmethod
+    def from_spot_attributes(
+            cls,
+            spots: SpotAttributes,
+            image_shape: Sequence[int],
+            radius_is_gyration: bool=False,
+    ) -> "SpotFootprints":
+        """build the footprints of each spot in spots, clipped to image_shape
+
+        Parameters
+        ----------
+        spots : SpotAttributes
+            SpotAttributes table containing coordinates and radii of spots
+        image_shape : Sequence[int]
+            (z, y, x) shape of the volumes the footprints will index into
+        radius_is_gyration : bool
+            if True, the spot's bounding box is rounded up instead of down (see
+            measure_spot_intensity)
+
+        Returns
+        -------
+        SpotFootprints :
+            footprints of the spots, in the order of spots.data
+
+        """
+        radius = spots.data[Features.SPOT_RADIUS].values.astype(np.float64)
+        if radius_is_gyration:
+            radius = np.ceil(radius).astype(np.intp) + 1  # round up
+        else:
+            radius = radius.astype(np.intp)  # truncate down to nearest integer
+
+        boxes = np.empty((len(spots.data), 6), dtype=np.intp)
+        for i, (axis, max_size) in enumerate(
+                zip([Axes.ZPLANE.value, Axes.Y.value, Axes.X.value], image_shape)):
+            center = spots.data[axis].values.astype(np.intp)
+            # numpy does exclusive max indexing, so need to subtract 1 from min to get centered box
+            boxes[:, 2 * i] = np.clip(center - (radius - 1), 0, None)
+            boxes[:, 2 * i + 1] = np.clip(center + radius, None, max_size)
+        return cls(boxes, image_shape)
+
+    @staticmethod
+    def _build_index(
+            boxes: np.ndarray, image_shape: Tuple[int, ...]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """return the CSR (indptr, indices) representation of the pixels inside each box"""
+        sizes = np.clip(boxes[:, 1::2] - boxes[:, 0::2], 0, None)
+        counts = sizes.prod(axis=1)
+        indptr = np.zeros(len(boxes) + 1, dtype=np.intp)
+        np.cumsum(counts, out=indptr[1:])
+
+        # position of each pixel within its own box, decomposed into (dz, dy, dx)
+        local = np.arange(indptr[-1], dtype=np.intp) - np.repeat(indptr[:-1], counts)
+        size_y = np.repeat(sizes[:, 1], counts)
+        size_x = np.repeat(sizes[:, 2], counts)
+        dz, remainder = np.divmod(local, size_y * size_x)
+        dy, dx = np.divmod(remainder, size_x)
+
+        _, n_y, n_x = image_shape
+        indices = (np.repeat(boxes[:, 0], counts) + dz) * n_y
+        indices += np.repeat(boxes[:, 2], counts) + dy
+        indices *= n_x
+        indices += np.repeat(boxes[:, 4], counts) + dx
+        return indptr, indices
+
+    def __len__(self) -> int:
+        return self.boxes.shape[0]
+
+    @property
+    def indptr(self) -> np.ndarray:
+        """offsets of the pixels of each spot in indices"""
+        return self._get_index()[0]
+
+    @property
+    def indices(self) -> np.ndarray:
+        """flat offsets of the footprint pixels of every spot, in spot order"""
+        return self._get_index()[1]
+
+    def _get_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._index is None:
+            self._index = self._build_index(self.boxes, self.image_shape)
+        return self._index
+
+    @property
+    def pixel_counts(self) -> np.ndarray:
+        """number of pixels in the footprint of each spot"""
+        return np.diff(self.indptr)
+
+    def to_dataframe(self, index: pd.Index=None) -> pd.DataFrame:
+        """return the bounding boxes as integer columns z_min, z_max, y_min, y_max, x_min, x_max"""
+        return pd.DataFrame(self.boxes, columns=BOX_COLUMNS, index=index)
+
+    def _flat_values(self, image: Union[np.ndarray, xr.DataArray]) -> np.ndarray:
+        if isinstance(image, xr.DataArray):
+            image = image.values
+        if image.shape != self.image_shape:
+            raise ValueError(
+                f'footprints were built for volumes of shape {self.image_shape}, not {image.shape}')
+        return np.ascontiguousarray(image).reshape(-1)
+
+    def gather(self, image: Union[np.ndarray, xr.DataArray]) -> np.ndarray:
+        """return the concatenated footprint pixels of every spot in image, in CSR order
+
+        The returned array is a buffer owned by this object that is reused by subsequent calls
+        with images of the same dtype; copy it if it must outlive the next call.
+        """
+        values = self._flat_values(image)
+        buffer = self._buffers.get(values.dtype)
+        if buffer is None:
+            buffer = self._buffers[values.dtype] = np.empty(self.indices.shape, values.dtype)
+        # indices are in bounds by construction; mode='clip' lets take write into out unbuffered
+        return np.take(values, self.indices, out=buffer, mode='clip')
+
+    def measure(
+            self,
+            image: Union[np.ndarray, xr.DataArray],
+            measurement_function: Callable[[Sequence], Number],
+    ) -> np.ndarray:
+        """apply measurement_function over the footprint of each spot in image
+
+        np.max, np.min, np.sum and np.mean are evaluated for all spots at once as segmented
+        reductions over the gathered pixels; other functions are applied to each spot's box.
+
+        Parameters
+        ----------
+        image : Union[np.ndarray, xr.DataArray]
+            (z, y, x) volume of self.image_shape
+        measurement_function : Callable[[Sequence], Number]
+            Function to apply over the spot volumes to identify the intensity (e.g. max, mean, ...)
+
+        Returns
+        -------
+        np.ndarray :
+            float64 intensity of each spot
+
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=np.float64)
+
+        counts = self.pixel_counts
+        reduction = _segment_reductions.get(measurement_function)
+        # reduceat returns a pixel of the next spot for empty segments, so spots whose footprint
+        # lies outside the image take the per-box path, which raises or warns as numpy does
+        if reduction is None or not counts.all():
+            values = self._flat_values(image).reshape(self.image_shape)
+            intensities = np.empty(len(self), dtype=np.float64)
+            for i, (z_min, z_max, y_min, y_max, x_min, x_max) in enumerate(self.boxes):
+                intensities[i] = measurement_function(
+                    values[z_min:z_max, y_min:y_max, x_min:x_max])
+            return intensities
+
+        pixels = self.gather(image)
+        if reduction is np.add:
+            intensities = reduction.reduceat(pixels, self.indptr[:-1], dtype=np.float64)
+            if measurement_function is np.mean:
+                intensities /= counts
+            return intensities
+        return reduction.reduceat(pixels, self.indptr[:-1]).astype(np.float64)
+
+    def label_image(self, dtype=np.int32) -> np.ndarray:
+        """paint the footprint of spot i with label i + 1 in an image of self.image_shape
+
+        Where footprints overlap, the later spot's label is kept. Useful to display spot
+        footprints as a label layer or to count pixels claimed by spots for QC.
+        """
+        labels = np.zeros(self.image_shape, dtype=dtype)
+        spot_labels = np.repeat(np.arange(1, len(self) + 1, dtype=dtype), self.pixel_counts)
+        labels.reshape(-1)[self.indices] = spot_labels
+        return labels
@@ -1,4 +1,4 @@
-from typing import List, Optional, Tuple, Union
+from typing import Any, Hashable, List, MutableMapping, Optional, Tuple, Union
 
 import numpy as np
 import pandas as pd
@@ -14,7 +14,8 @@ from starfish.imagestack.imagestack import ImageStack
 from starfish.intensity_table.intensity_table import IntensityTable
 from starfish.types import Axes, Features, Number, SpotAttributes
 from starfish.util import click
-from ._base import SpotFinderAlgorithmBase
+from starfish.util.label import label_areas, relabel
+from ._base import cached_stage, SpotFinderAlgorithmBase
 from .detect import detect_spots
 
 
@@ -187,7 +188,11 @@ class LocalMaxPeakFinder(SpotFinderAlgorithmBase):
 
         return selected_thr
 
-    def _compute_threshold(self, img: Union[np.ndarray, xr.DataArray]) -> float:
+    def _compute_threshold(
+            self,
+            img: Union[np.ndarray, xr.DataArray],
+            cache: Optional[MutableMapping[Hashable, Any]]=None,
+    ) -> float:
         """Finds spots on a number of thresholds then selects and returns the optimal threshold
 
         Parameters
@@ -195,6 +200,9 @@ class LocalMaxPeakFinder(SpotFinderAlgorithmBase):
         img: Union[np.ndarray, xr.DataArray]
             data array in which spots should be detected and over which to compute different
             intensity thresholds
+        cache : Optional[MutableMapping[Hashable, Any]]
+            If provided, spot counts and the selected threshold are stored in and reused from
+            this mapping (see image_to_spots)
 
         Returns
         -------
@@ -202,17 +210,59 @@ class LocalMaxPeakFinder(SpotFinderAlgorithmBase):
             The intensity threshold
         """
         img = np.asarray(img)
-        thresholds, spot_counts = self._compute_num_spots_per_threshold(img)
-        threshold = self._select_optimal_threshold(thresholds, spot_counts)
+        thresholds, spot_counts = cached_stage(
+            cache,
+            ('spot_counts', self.min_distance, self.min_num_spots_detected),
+            lambda: self._compute_num_spots_per_threshold(img),
+        )
+        self._thresholds, self._spot_counts = thresholds, spot_counts
+        threshold = cached_stage(
+            cache,
+            ('threshold', self.min_distance, self.min_num_spots_detected, self.stringency),
+            lambda: self._select_optimal_threshold(thresholds, spot_counts),
+        )
         return threshold
 
-    def image_to_spots(self, data_image: Union[np.ndarray, xr.DataArray]) -> SpotAttributes:
+    def _area_filtered_labels(
+            self,
+            data_image: np.ndarray,
+            cache: Optional[MutableMapping[Hashable, Any]]=None,
+    ) -> np.ndarray:
+        """label the image binarized at self.threshold, removing objects whose areas are smaller
+        than min_obj_area or larger than max_obj_area"""
+
+        def label_regions():
+            # identify each spot by binarizing the image
+            return label(data_image[:, :] > self.threshold, output=np.uint32)
+
+        def filter_by_area():
+            labels, n_labels = cached_stage(cache, ('regions', self.threshold), label_regions)
+
+            # remove spots whose areas are too small or too large. Removing whole objects leaves
+            # the others intact, so this is the labeling of the area-masked image
+            areas = label_areas(labels, n_labels)
+            keep = (areas >= self.min_obj_area) & (areas <= self.max_obj_area)
+            return relabel(labels, keep)[0]
+
+        return cached_stage(
+            cache, ('labels', self.threshold, self.min_obj_area, self.max_obj_area), filter_by_area)
+
+    def image_to_spots(
+            self,
+            data_image: Union[np.ndarray, xr.DataArray],
+            cache: Optional[MutableMapping[Hashable, Any]]=None,
+    ) -> SpotAttributes:
         """measure attributes of spots detected by binarizing the image using the selected threshold
 
         Parameters
         ----------
         data_image: Union[np.ndarray, xr.DataArray]
             image from which spots should be extracted
+        cache : Optional[MutableMapping[Hashable, Any]]
+            If provided, intermediate products (spot counts per threshold, labels, maxima) are
+            stored in this mapping, keyed by the parameters they depend on, and reused by later
+            calls that pass the same mapping. A cache must only be shared between calls on the
+            same data_image.
 
         Returns
         -------
@@ -221,36 +271,30 @@ class LocalMaxPeakFinder(SpotFinderAlgorithmBase):
         """
 
         if self.threshold is None:
-            self.threshold = self._compute_threshold(data_image)
+            self.threshold = self._compute_threshold(data_image, cache)
 
         data_image = np.asarray(data_image)
 
-        # identify each spot's size by binarizing and calculating regionprops
-        masked_image = data_image[:, :] > self.threshold
-        labels = label(masked_image)[0]
-        spot_props = regionprops(np.squeeze(labels))
-
-        # mask spots whose areas are too small or too large
-        for spot_prop in spot_props:
-            if spot_prop.area < self.min_obj_area or spot_prop.area > self.max_obj_area:
-                masked_image[0, spot_prop.coords[:, 0], spot_prop.coords[:, 1]] = 0
-
         # store re-calculated regionprops and labels based on the area-masked image
-        self._labels = label(masked_image)[0]
+        self._labels = self._area_filtered_labels(data_image, cache)
         self._spot_props = regionprops(np.squeeze(self._labels))
 
         if self.verbose:
             print('computing final spots ...')
 
-        self._spot_coords = peak_local_max(
-            data_image,
-            min_distance=self.min_distance,
-            threshold_abs=self.threshold,
-            exclude_border=False,
-            indices=True,
-            num_peaks=np.inf,
-            footprint=None,
-            labels=self._labels
+        self._spot_coords = cached_stage(
+            cache,
+            ('peaks', self.min_distance, self.threshold, self.min_obj_area, self.max_obj_area),
+            lambda: peak_local_max(
+                data_image,
+                min_distance=self.min_distance,
+                threshold_abs=self.threshold,
+                exclude_border=False,
+                indices=True,
+                num_peaks=np.inf,
+                footprint=None,
+                labels=self._labels
+            )
         )
 
         # TODO how to get the radius? unlikely that this can be pulled out of
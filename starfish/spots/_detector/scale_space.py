@@ -0,0 +1,261 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Sequence, Union
+
+import numpy as np
+import xarray as xr
+from scipy.ndimage import correlate1d
+from skimage import img_as_float
+from skimage.feature import peak_local_max
+
+from starfish.compat import prune_blobs
+from starfish.types import Number
+
+SCALE_SPACE_METHODS = {'blob_log', 'blob_dog'}
+
+
+@lru_cache(maxsize=128)
+def gaussian_kernel1d(sigma: float, order: int, truncate: float=4.0) -> np.ndarray:
+    """
+    Returns the 1-d gaussian (order 0) or gaussian second derivative (order 2) kernel used by
+    scipy.ndimage.gaussian_filter1d. Kernels are cached, so repeated evaluation of the same sigma
+    levels (e.g. across the (round, ch) volumes of an ImageStack) builds each kernel once.
+
+    Parameters
+    ----------
+    sigma : float
+        Standard deviation of the gaussian.
+    order : int {0, 2}
+        Order of the derivative of the gaussian.
+    truncate : float
+        Truncate the kernel at this many standard deviations. (default 4.0)
+
+    Returns
+    -------
+    np.ndarray :
+        read-only correlation kernel of length 2 * int(truncate * sigma + 0.5) + 1
+
+    """
+    if order not in (0, 2):
+        raise ValueError(f'order must be 0 or 2, not {order}')
+    radius = int(truncate * float(sigma) + 0.5)
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 / (sigma * sigma) * x ** 2)
+    kernel /= kernel.sum()
+    if order == 2:
+        kernel *= (x ** 2 - sigma ** 2) / sigma ** 4
+    kernel.flags.writeable = False
+    return kernel
+
+
+def _gaussian(image: np.ndarray, sigma: Sequence[float]) -> np.ndarray:
+    """separable gaussian blur of image with cached kernels, equivalent to
+    scipy.ndimage.gaussian_filter"""
+    output = image
+    for axis, axis_sigma in enumerate(sigma):
+        output = correlate1d(output, gaussian_kernel1d(axis_sigma, 0), axis, mode='reflect')
+    return output
+
+
+def _laplace(image: np.ndarray, sigma: Sequence[float], scale: Sequence[float]) -> np.ndarray:
+    """
+    Separable laplacian of gaussian of image, equivalent to scipy.ndimage.gaussian_laplace when
+    scale is all ones.
+
+    Each second-derivative term blurs the axes that precede its derivative axis with the
+    same order-0 kernels, so those partial blurs are computed once and shared between terms. The
+    per-axis order of operations matches scipy, so results are identical.
+
+    scale gives the size of one pixel of image along each axis in full-resolution pixels, and is
+    used to evaluate levels on a downsampled image.
+    """
+    n_dim = image.ndim
+    prefix = image
+    output: Optional[np.ndarray] = None
+    for derivative_axis in range(n_dim):
+        term = correlate1d(
+            prefix, gaussian_kernel1d(sigma[derivative_axis], 2), derivative_axis, mode='reflect')
+        for axis in range(derivative_axis + 1, n_dim):
+            term = correlate1d(term, gaussian_kernel1d(sigma[axis], 0), axis, mode='reflect')
+        if scale[derivative_axis] != 1:
+            term /= scale[derivative_axis] ** 2
+        output = term if output is None else output + term
+        if derivative_axis + 1 < n_dim:
+            prefix = correlate1d(
+                prefix, gaussian_kernel1d(sigma[derivative_axis], 0), derivative_axis,
+                mode='reflect')
+
+    assert output is not None
+    return output
+
+
+def _upsample_linear(image: np.ndarray, axis: int, factor: int, size: int) -> np.ndarray:
+    """linearly interpolate a block-averaged axis of image back onto its full resolution grid of
+    length size. Block centers sit at (factor - 1) / 2 in full resolution coordinates."""
+    position = (np.arange(size) - (factor - 1) / 2) / factor
+    lower = np.clip(np.floor(position).astype(int), 0, image.shape[axis] - 1)
+    upper = np.clip(lower + 1, 0, image.shape[axis] - 1)
+    weight = np.clip(position - lower, 0, 1).astype(image.dtype)
+    weight_shape = [1] * image.ndim
+    weight_shape[axis] = size
+    weight = weight.reshape(weight_shape)
+    return (
+        np.take(image, lower, axis=axis) * (1 - weight)
+        + np.take(image, upper, axis=axis) * weight
+    )
+
+
+class ScaleSpace:
+
+    def __init__(
+            self,
+            image: Union[np.ndarray, xr.DataArray],
+            min_sigma: Number,
+            max_sigma: Number,
+            num_sigma: int=10,
+            sigma_ratio: float=1.6,
+            method: str='blob_log',
+            n_threads: int=1,
+            pyramid_min_sigma: Optional[Number]=None,
+    ) -> None:
+        """Gaussian scale-space of an image, the expensive part of blob_log and blob_dog
+
+        The scale-space is computed once on construction, after which find_blobs can be called
+        with any number of thresholds and overlaps without recomputing the filtered images.
+
+        Parameters
+        ----------
+        image : Union[np.ndarray, xr.DataArray]
+            2-d or 3-d image in which blobs will be found
+        min_sigma : Number
+            The minimum standard deviation for Gaussian Kernel.
+        max_sigma : Number
+            The maximum standard deviation for Gaussian Kernel.
+        num_sigma : int
+            blob_log only: the number of standard deviations to consider between min_sigma and
+            max_sigma. (default 10)
+        sigma_ratio : float
+            blob_dog only: the ratio between the standard deviations of successive gaussian
+            kernels. (default 1.6)
+        method : str ['blob_log', 'blob_dog']
+            which of the skimage.feature scale-spaces to compute (default 'blob_log')
+        n_threads : int
+            The number of threads used to evaluate sigma levels concurrently. Spot finders
+            already run inside ImageStack worker processes, so this should be at most
+            os.cpu_count() // n_processes to avoid oversubscribing the cpus. (default 1)
+        pyramid_min_sigma : Optional[Number]
+            If provided, sigma levels at or above this value are evaluated on an image
+            downsampled in (y, x) by a power of two, such that the downsampled sigma is at least
+            pyramid_min_sigma / 2, and interpolated back to full resolution. This trades
+            localization of large blobs (to the downsampled grid) for speed. If None, every level
+            is computed at full resolution and results match skimage. (default None)
+
+        """
+        if method not in SCALE_SPACE_METHODS:
+            raise ValueError(f'method must be one of {SCALE_SPACE_METHODS}, not {method}')
+        if pyramid_min_sigma is not None and pyramid_min_sigma <= 0:
+            raise ValueError('pyramid_min_sigma must be positive')
+
+        self.method = method
+        self.pyramid_min_sigma = pyramid_min_sigma
+        self._image = img_as_float(np.asarray(image))
+
+        if method == 'blob_log':
+            self.sigma_list = np.linspace(min_sigma, max_sigma, num_sigma)
+        else:
+            # k such that min_sigma * (sigma_ratio ** k) > max_sigma
+            k = int(np.log(max_sigma / min_sigma) / np.log(sigma_ratio) + 1)
+            self.sigma_list = np.array([min_sigma * (sigma_ratio ** i) for i in range(k + 1)])
+
+        with ThreadPoolExecutor(max_workers=n_threads) as executor:
+            if method == 'blob_log':
+                levels: List[np.ndarray] = list(executor.map(self._log_level, self.sigma_list))
+            else:
+                blurred = list(executor.map(self._gaussian_level, self.sigma_list))
+                # multiplying with the standard deviation provides scale invariance
+                levels = [
+                    (blurred[i] - blurred[i + 1]) * self.sigma_list[i]
+                    for i in range(len(self.sigma_list) - 1)
+                ]
+                # blob_dog reports the smaller sigma of each pair
+                self.sigma_list = self.sigma_list[:-1]
+
+        self.cube: np.ndarray = np.stack(levels, axis=-1)
+        del self._image
+
+    def _downsample_factor(self, sigma: float) -> int:
+        if self.pyramid_min_sigma is None or sigma < self.pyramid_min_sigma:
+            return 1
+        return 2 ** (1 + int(np.log2(sigma / self.pyramid_min_sigma)))
+
+    def _evaluate(self, sigma: float, level_function) -> np.ndarray:
+        """evaluate level_function(image, per_axis_sigma, per_axis_scale) for one sigma level,
+        on a downsampled image if the pyramid is enabled for this sigma"""
+        factor = self._downsample_factor(sigma)
+        image = self._image
+        if factor == 1:
+            return level_function(image, (sigma,) * image.ndim, (1,) * image.ndim)
+
+        # (y, x) are block-averaged; z is typically too shallow to be downsampled
+        yx_shape = image.shape[-2:]
+        padded_shape = tuple(int(np.ceil(s / factor)) * factor for s in yx_shape)
+        padding = [(0, 0)] * (image.ndim - 2) + [(0, p - s) for p, s in zip(padded_shape, yx_shape)]
+        padded = np.pad(image, padding, mode='edge')
+        coarse_shape = image.shape[:-2] + tuple(
+            s for p in padded_shape for s in (p // factor, factor))
+        coarse = padded.reshape(coarse_shape).mean(axis=(-3, -1)).astype(image.dtype)
+
+        # block averaging already applies a blur of variance (factor ** 2 - 1) / 12
+        coarse_sigma = np.sqrt(max(sigma ** 2 - (factor ** 2 - 1) / 12, 0.25)) / factor
+        per_axis_sigma = (sigma,) * (image.ndim - 2) + (coarse_sigma,) * 2
+        per_axis_scale = (1,) * (image.ndim - 2) + (factor,) * 2
+        level = level_function(coarse, per_axis_sigma, per_axis_scale)
+
+        for axis in (-2, -1):
+            level = _upsample_linear(level, image.ndim + axis, factor, image.shape[axis])
+        return level
+
+    def _log_level(self, sigma: float) -> np.ndarray:
+        # multiplying with sigma ** 2 provides scale invariance
+        return -self._evaluate(sigma, _laplace) * sigma ** 2
+
+    def _gaussian_level(self, sigma: float) -> np.ndarray:
+        def blur(image, per_axis_sigma, _):
+            return _gaussian(image, per_axis_sigma)
+        return self._evaluate(sigma, blur)
+
+    def find_blobs(
+            self, threshold: Number, overlap: float=0.5, exclude_border: Union[bool, int]=False
+    ) -> np.ndarray:
+        """
+        Find blobs as local maxima of the scale-space, as skimage.feature.blob_log and
+        skimage.feature.blob_dog do.
+
+        Parameters
+        ----------
+        threshold : Number
+            The absolute lower bound for scale space maxima.
+        overlap : float [0, 1]
+            If two blobs overlap by more than this fraction, the smaller blob is eliminated.
+        exclude_border : Union[bool, int]
+            If nonzero, exclude blobs within this many pixels of the border of the image.
+
+        Returns
+        -------
+        np.ndarray :
+            (n_blobs, image.ndim + 1) array of blob coordinates followed by the sigma that
+            detected each blob.
+
+        """
+        local_maxima = peak_local_max(
+            self.cube, threshold_abs=threshold, footprint=np.ones((3,) * self.cube.ndim),
+            threshold_rel=0.0, exclude_border=exclude_border)
+
+        if local_maxima.size == 0:
+            return np.empty((0, self.cube.ndim))
+
+        # replace the index of the sigma level by the sigma that detected the blob
+        blobs = local_maxima.astype(np.float64)
+        blobs[:, -1] = self.sigma_list[local_maxima[:, -1]]
+
+        return prune_blobs(blobs, overlap)
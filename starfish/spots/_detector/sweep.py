@@ -0,0 +1,163 @@
+import inspect
+import json
+import time
+from collections import OrderedDict
+from itertools import product
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Type
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from starfish.imagestack.imagestack import ImageStack
+from starfish.types import Axes
+from starfish.util import click
+from ._base import SpotFinder, SpotFinderAlgorithmBase
+
+SPOT_COUNT = 'spot_count'
+SECONDS = 'seconds'
+
+
+def _expand_parameter_grid(
+        parameter_grid: Mapping[str, Sequence[Any]],
+        fixed_parameters: Mapping[str, Any],
+) -> List[Dict[str, Any]]:
+    """return the keyword arguments of every combination of the values in parameter_grid"""
+    overlap = set(parameter_grid).intersection(fixed_parameters)
+    if overlap:
+        raise ValueError(f'parameters {sorted(overlap)} are both swept and fixed')
+    names = list(parameter_grid)
+    candidates = []
+    for values in product(*(parameter_grid[name] for name in names)):
+        parameters = dict(fixed_parameters)
+        parameters.update(zip(names, values))
+        candidates.append(parameters)
+    return candidates
+
+
+def _sweep_volume(
+        volume: xr.DataArray,
+        algorithm: Type[SpotFinderAlgorithmBase],
+        candidates: Sequence[Dict[str, Any]],
+) -> List[Tuple[int, float]]:
+    """find spots in a single volume with each candidate parameter set, sharing one cache of
+    intermediate products between the candidates"""
+    volume = np.asarray(volume)
+    accepts_cache = 'cache' in inspect.signature(algorithm.image_to_spots).parameters
+    cache: Dict = dict()
+
+    results = []
+    for parameters in candidates:
+        # spot finders may store state (e.g. a computed threshold) on the instance, so each
+        # candidate is constructed fresh for each volume
+        spot_finder: Any = algorithm(**parameters)  # type: ignore
+        start = time.time()
+        if accepts_cache:
+            spot_attributes = spot_finder.image_to_spots(volume, cache=cache)
+        else:
+            spot_attributes = spot_finder.image_to_spots(volume)
+        results.append((spot_attributes.data.shape[0], time.time() - start))
+    return results
+
+
+def sweep_spot_finder(
+        stack: ImageStack,
+        algorithm: Type[SpotFinderAlgorithmBase],
+        parameter_grid: Mapping[str, Sequence[Any]],
+        fixed_parameters: Optional[Mapping[str, Any]]=None,
+        n_processes: Optional[int]=None,
+) -> pd.DataFrame:
+    """Find spots in each (round, ch) volume of an ImageStack with every combination of a grid
+    of spot finder parameters
+
+    Each worker receives one (round, ch) volume of the shared ImageStack buffer and evaluates every
+    candidate on it. Spot finders whose image_to_spots accepts a cache (e.g. LocalMaxPeakFinder,
+    BlobDetector) share intermediate products, such as scale-spaces, thresholds, labels and maxima,
+    between candidates that agree on the parameters those products depend on.
+
+    Parameters
+    ----------
+    stack : ImageStack
+        stack containing spots to find
+    algorithm : Type[SpotFinderAlgorithmBase]
+        the spot finder to tune, e.g. SpotFinder.LocalMaxPeakFinder
+    parameter_grid : Mapping[str, Sequence[Any]]
+        maps constructor arguments of algorithm to the values to try for each
+    fixed_parameters : Optional[Mapping[str, Any]]
+        constructor arguments of algorithm that are the same for every candidate
+    n_processes : Optional[int]
+        The number of processes to use. If None, uses the output of os.cpu_count()
+        (default = None).
+
+    Returns
+    -------
+    pd.DataFrame :
+        one row per (candidate, round, ch), with a column for each swept parameter, the round and
+        channel, the number of spots found and the seconds spent finding them. Time spent
+        computing an intermediate product is attributed to the first candidate that needs it.
+
+    """
+    if fixed_parameters is None:
+        fixed_parameters = {}
+    candidates = _expand_parameter_grid(parameter_grid, fixed_parameters)
+
+    results = stack.transform(
+        _sweep_volume,
+        group_by={Axes.ROUND, Axes.CH},
+        n_processes=n_processes,
+        algorithm=algorithm,
+        candidates=candidates,
+    )
+
+    rows = []
+    for volume_results, indices in results:
+        for parameters, (spot_count, seconds) in zip(candidates, volume_results):
+            row: Dict[str, Any] = OrderedDict((name, parameters[name]) for name in parameter_grid)
+            row[Axes.ROUND.value] = indices[Axes.ROUND]
+            row[Axes.CH.value] = indices[Axes.CH]
+            row[SPOT_COUNT] = spot_count
+            row[SECONDS] = seconds
+            rows.append(row)
+
+    columns = list(parameter_grid) + [Axes.ROUND.value, Axes.CH.value, SPOT_COUNT, SECONDS]
+    return pd.DataFrame(rows, columns=columns)
+
+
+class JsonObject(click.ParamType):
+
+    name = "json-object"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, dict):
+            return value
+        try:
+            parsed = json.loads(value)
+        except json.decoder.JSONDecodeError:
+            self.fail(f"Could not parse {value} as json.")
+        if not isinstance(parsed, dict):
+            self.fail(f"{value} is not a json object.")
+        return parsed
+
+
+@click.command("sweep_spots")
+@click.option("-i", "--input", required=True, type=click.Path(exists=True))
+@click.option("-o", "--output", required=True, help="path of the csv file to write")
+@click.option(
+    "--algorithm", required=True, help="name of the spot finder, e.g. LocalMaxPeakFinder")
+@click.option(
+    "--grid", required=True, type=JsonObject(),
+    help='json object mapping parameter names to lists of values, e.g. '
+         '\'{"threshold": [0.01, 0.05], "min_sigma": [1, 2]}\'')
+@click.option(
+    "--fixed", default="{}", type=JsonObject(),
+    help="json object of parameters shared by every candidate")
+@click.option("--n-processes", default=None, type=int, help="number of worker processes")
+@click.pass_context
+def sweep_cli(ctx, input, output, algorithm, grid, fixed, n_processes):
+    """count spots for every combination of a grid of spot finder parameters"""
+    algorithms = SpotFinder._algorithm_to_class_map()
+    if algorithm not in algorithms:
+        ctx.fail(f"--algorithm must be one of {sorted(algorithms)}")
+    stack = ImageStack.from_path_or_url(input)
+    table = sweep_spot_finder(stack, algorithms[algorithm], grid, fixed, n_processes)
+    table.to_csv(output, index=False)
@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from starfish.spots._detector.detect import measure_spot_intensity
+from starfish.spots._detector.footprint import SpotFootprints
+from starfish.types import SpotAttributes
+
+
+def random_spots(n_spots: int, shape, max_radius: int=4, seed: int=0) -> SpotAttributes:
+    np.random.seed(seed)
+    data = pd.DataFrame({
+        'z': np.random.randint(0, shape[0], n_spots),
+        'y': np.random.randint(0, shape[1], n_spots),
+        'x': np.random.randint(0, shape[2], n_spots),
+        'radius': np.random.randint(1, max_radius, n_spots),
+    })
+    return SpotAttributes(data)
+
+
+def measure_boxes(image, spots, measurement_function):
+    """reference implementation: slice a box around each spot"""
+    intensities = []
+    for _, spot in spots.data.iterrows():
+        r = int(spot.radius)
+        box = image[
+            max(spot.z - (r - 1), 0):spot.z + r,
+            max(spot.y - (r - 1), 0):spot.y + r,
+            max(spot.x - (r - 1), 0):spot.x + r,
+        ]
+        intensities.append(measurement_function(box))
+    return np.array(intensities)
+
+
+@pytest.mark.parametrize('measurement_function', [np.max, np.min, np.mean, np.sum, np.median])
+def test_measure_matches_box_slicing(measurement_function):
+    shape = (5, 40, 50)
+    image = np.random.RandomState(1).rand(*shape).astype(np.float32)
+    spots = random_spots(100, shape)
+
+    footprints = SpotFootprints.from_spot_attributes(spots, shape)
+    expected = measure_boxes(image, spots, measurement_function)
+    assert np.allclose(footprints.measure(image, measurement_function), expected, rtol=1e-6)
+    # the index is reusable across volumes
+    assert np.allclose(
+        footprints.measure(image * 2, measurement_function), expected * 2, rtol=1e-6)
+
+
+def test_measure_spot_intensity_does_not_modify_spots():
+    shape = (3, 20, 20)
+    image = np.random.RandomState(2).rand(*shape)
+    spots = random_spots(10, shape)
+    columns = list(spots.data.columns)
+
+    intensities = measure_spot_intensity(image, spots, np.max)
+    assert list(spots.data.columns) == columns
+    assert intensities.index.equals(spots.data.index)
+
+
+def test_label_image_paints_footprints():
+    shape = (1, 10, 10)
+    spots = SpotAttributes(pd.DataFrame({'z': [0, 0], 'y': [2, 7], 'x': [2, 7], 'radius': [2, 1]}))
+    footprints = SpotFootprints.from_spot_attributes(spots, shape)
+
+    labels = footprints.label_image()
+    assert np.array_equal(footprints.pixel_counts, [9, 1])
+    assert np.sum(labels == 1) == 9
+    assert labels[0, 1:4, 1:4].min() == 1
+    assert labels[0, 7, 7] == 2
+    assert np.array_equal(
+        footprints.to_dataframe().values, [[0, 1, 1, 4, 1, 4], [0, 1, 7, 8, 7, 8]])
+
+
+def test_pickle_sends_only_the_boxes():
+    shape = (5, 40, 50)
+    image = np.random.RandomState(3).rand(*shape)
+    footprints = SpotFootprints.from_spot_attributes(random_spots(100, shape), shape)
+    expected = footprints.measure(image, np.max)
+
+    state = footprints.__getstate__()
+    assert 'indices' not in state and '_buffers' not in state
+
+    payload = pickle.dumps(footprints)
+    assert len(payload) < footprints.indices.nbytes
+    first, second = pickle.loads(payload), pickle.loads(payload)
+    assert np.array_equal(first.measure(image, np.max), expected)
+    # the index is rebuilt once per process, not once per unpickled copy
+    assert second.indices is first.indices
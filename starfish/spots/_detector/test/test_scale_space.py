@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from skimage.feature import blob_dog, blob_log
+from skimage.feature.blob import _prune_blobs
+from skimage.filters import gaussian
+
+from starfish.compat import prune_blobs
+from starfish.spots._detector.scale_space import ScaleSpace
+
+
+@pytest.mark.parametrize('threshold', [0.01, 0.1, 0.3])
+def test_scale_space_matches_skimage_blob_log(threshold):
+    image = np.random.RandomState(0).rand(3, 40, 40).astype(np.float32)
+    expected = blob_log(image, 1, 4, 5, threshold, 0.5)
+    observed = ScaleSpace(image, 1, 4, num_sigma=5).find_blobs(threshold, 0.5)
+    assert np.array_equal(expected, observed)
+
+
+def test_scale_space_matches_skimage_blob_dog():
+    image = np.random.RandomState(0).rand(3, 40, 40).astype(np.float32)
+    expected = blob_dog(image, 1, 6, threshold=0.1, overlap=0.5)
+    observed = ScaleSpace(image, 1, 6, method='blob_dog').find_blobs(0.1, 0.5)
+    assert np.array_equal(expected, observed)
+
+
+def test_scale_space_threads_match_serial():
+    image = np.random.RandomState(0).rand(3, 40, 40).astype(np.float32)
+    serial = ScaleSpace(image, 1, 4, num_sigma=5)
+    threaded = ScaleSpace(image, 1, 4, num_sigma=5, n_threads=3)
+    assert np.array_equal(serial.cube, threaded.cube)
+
+
+def test_prune_blobs_matches_skimage():
+    rng = np.random.RandomState(0)
+    blobs = np.column_stack([rng.randint(0, 30, (200, 3)), rng.choice([1, 2, 3], 200)])
+    blobs = blobs.astype(np.float64)
+    assert np.array_equal(prune_blobs(blobs.copy(), 0.5), _prune_blobs(blobs.copy(), 0.5))
+
+
+def test_pyramid_localizes_large_blobs_to_the_downsampled_grid():
+    image = np.zeros((1, 128, 128), dtype=np.float32)
+    image[0, 40, 80] = 1
+    image = gaussian(image, sigma=(0, 6, 6)).astype(np.float32)
+    image /= image.max()
+
+    blobs = ScaleSpace(image, 6, 6, num_sigma=1, pyramid_min_sigma=3).find_blobs(0.1)
+    assert blobs.shape[0] == 1
+    assert np.all(np.abs(blobs[0, 1:3] - [40, 80]) <= 2)
@@ -4,7 +4,7 @@ import pytest
 from starfish.imagestack.imagestack import ImageStack
 from starfish.spots._detector._base import SpotFinderAlgorithmBase
 from starfish.spots._detector.blob import BlobDetector
-from starfish.spots._detector.detect import detect_spots
+from starfish.spots._detector.detect import detect_spots, measure_spot_intensities
 from starfish.spots._detector.local_max_peak_finder import LocalMaxPeakFinder
 from starfish.spots._detector.trackpy_local_max_peak_finder import TrackpyLocalMaxPeakFinder
 from starfish.test.test_utils import (
@@ -28,6 +28,12 @@ def simple_gaussian_spot_detector() -> BlobDetector:
     return BlobDetector(min_sigma=1, max_sigma=4, num_sigma=5, threshold=0, measurement_type='max')
 
 
+def scale_space_gaussian_spot_detector() -> BlobDetector:
+    """create a basic gaussian spot detector that uses the cached scale-space engine"""
+    return BlobDetector(min_sigma=1, max_sigma=4, num_sigma=5, threshold=0, measurement_type='max',
+                        engine='scale_space')
+
+
 def simple_trackpy_local_max_spot_detector() -> TrackpyLocalMaxPeakFinder:
     """create a basic local max peak finder"""
     return TrackpyLocalMaxPeakFinder(
@@ -50,6 +56,7 @@ def simple_local_max_spot_detector() -> LocalMaxPeakFinder:
 
 # initialize spot detectors
 gaussian_spot_detector = simple_gaussian_spot_detector()
+scale_space_spot_detector = scale_space_gaussian_spot_detector()
 trackpy_local_max_spot_detector = simple_trackpy_local_max_spot_detector()
 local_max_spot_detector = simple_local_max_spot_detector()
 
@@ -58,12 +65,15 @@ test_parameters = (
     'data_stack, spot_detector, radius_is_gyration, max_intensity',
     [
         (ONE_HOT_IMAGESTACK, gaussian_spot_detector, False, ONE_HOT_MAX_INTENSITY),
+        (ONE_HOT_IMAGESTACK, scale_space_spot_detector, False, ONE_HOT_MAX_INTENSITY),
         (ONE_HOT_IMAGESTACK, trackpy_local_max_spot_detector, True, ONE_HOT_MAX_INTENSITY),
         (ONE_HOT_IMAGESTACK, local_max_spot_detector, False, ONE_HOT_MAX_INTENSITY),
         (SPARSE_IMAGESTACK, gaussian_spot_detector, False, SPARSE_MAX_INTENSITY),
+        (SPARSE_IMAGESTACK, scale_space_spot_detector, False, SPARSE_MAX_INTENSITY),
         (SPARSE_IMAGESTACK, trackpy_local_max_spot_detector, True, SPARSE_MAX_INTENSITY),
         (SPARSE_IMAGESTACK, local_max_spot_detector, False, SPARSE_MAX_INTENSITY),
         (BLANK_IMAGESTACK, gaussian_spot_detector, False, BLANK_MAX_INTENSITY),
+        (BLANK_IMAGESTACK, scale_space_spot_detector, False, BLANK_MAX_INTENSITY),
         (BLANK_IMAGESTACK, trackpy_local_max_spot_detector, True, BLANK_MAX_INTENSITY),
         (BLANK_IMAGESTACK, local_max_spot_detector, False, BLANK_MAX_INTENSITY),
     ]
@@ -169,3 +179,34 @@ def test_spot_finding_no_reference_image(
 
     empty_intensity_table = call_detect_spots(EMPTY_IMAGESTACK)
     assert empty_intensity_table.sizes[Features.AXIS] == 0
+
+
+def test_reference_image_measurement_is_parallelized_across_round_and_ch():
+    """measuring reference spots in a worker pool must match the serial measurement"""
+    reference_image = ONE_HOT_IMAGESTACK.max_proj(Axes.CH, Axes.ROUND)._squeezed_numpy(
+        Axes.CH, Axes.ROUND)
+    spot_attributes = local_max_spot_detector.image_to_spots(reference_image)
+
+    serial = measure_spot_intensities(
+        ONE_HOT_IMAGESTACK, spot_attributes, np.max, n_processes=1)
+    parallel = measure_spot_intensities(
+        ONE_HOT_IMAGESTACK, spot_attributes, np.max, n_processes=2)
+    assert np.array_equal(serial.values, parallel.values)
+    assert np.allclose(serial.sum((Axes.ROUND, Axes.CH)).values, [ONE_HOT_MAX_INTENSITY * 2] * 2)
+
+
+@pytest.mark.parametrize('data_stack', [ONE_HOT_IMAGESTACK, SPARSE_IMAGESTACK, EMPTY_IMAGESTACK])
+def test_batched_trackpy_spot_finding_matches_per_volume_spot_finding(data_stack):
+    """locating spots in all channels of a round in one worker must not change the results"""
+    batch_spot_detector = simple_trackpy_local_max_spot_detector()
+    batch_spot_detector.batch = True
+
+    expected = trackpy_local_max_spot_detector.run(data_stack)
+    observed = batch_spot_detector.run(data_stack)
+
+    assert observed.sizes[Features.AXIS] == expected.sizes[Features.AXIS]
+    assert np.array_equal(
+        np.sort(observed.sum(Features.AXIS).values), np.sort(expected.sum(Features.AXIS).values))
+    for coordinate in (Axes.ZPLANE.value, Axes.Y.value, Axes.X.value):
+        assert np.array_equal(
+            np.sort(observed[coordinate].values), np.sort(expected[coordinate].values))
@@ -0,0 +1,57 @@
+import numpy as np
+from scipy.ndimage import gaussian_filter
+
+from starfish.spots._detector.blob import BlobDetector
+from starfish.spots._detector.local_max_peak_finder import LocalMaxPeakFinder
+from starfish.spots._detector.sweep import sweep_spot_finder
+from starfish.test.test_utils import two_spot_one_hot_coded_data_factory
+from starfish.types import Axes
+
+ONE_HOT_IMAGESTACK = two_spot_one_hot_coded_data_factory()[1]
+
+
+def _expected_counts(algorithm, parameters):
+    """count spots in each (round, ch) volume without the sweep harness"""
+    counts = {}
+    for r in range(ONE_HOT_IMAGESTACK.num_rounds):
+        for c in range(ONE_HOT_IMAGESTACK.num_chs):
+            volume = ONE_HOT_IMAGESTACK.get_slice({Axes.ROUND: r, Axes.CH: c})[0]
+            counts[r, c] = algorithm(**parameters).image_to_spots(volume).data.shape[0]
+    return counts
+
+
+def test_sweep_matches_individual_runs():
+    grid = {'threshold': [0, 0.1, 1.5], 'num_sigma': [2, 5]}
+    fixed = {'min_sigma': 1, 'max_sigma': 4}
+    table = sweep_spot_finder(ONE_HOT_IMAGESTACK, BlobDetector, grid, fixed, n_processes=2)
+
+    n_volumes = ONE_HOT_IMAGESTACK.num_rounds * ONE_HOT_IMAGESTACK.num_chs
+    assert table.shape[0] == 6 * n_volumes
+    assert list(table.columns) == ['threshold', 'num_sigma', 'r', 'c', 'spot_count', 'seconds']
+
+    for (threshold, num_sigma), group in table.groupby(['threshold', 'num_sigma']):
+        expected = _expected_counts(
+            BlobDetector, dict(fixed, threshold=threshold, num_sigma=num_sigma))
+        observed = {(row.r, row.c): row.spot_count for row in group.itertuples()}
+        assert observed == expected
+
+
+def test_local_max_peak_finder_cache_reuses_thresholds():
+    # auto-thresholding needs enough spots to find a knee in the spot count curve
+    np.random.seed(2)
+    volume = np.zeros((1, 100, 100), dtype=np.float32)
+    ys, xs = np.random.randint(5, 95, size=(2, 60))
+    volume[0, ys, xs] = np.random.uniform(0.2, 1, size=60)
+    volume = gaussian_filter(volume, sigma=(0, 1, 1))
+    cache = {}
+    for min_obj_area in (0, 2):
+        cached = LocalMaxPeakFinder(
+            min_distance=2, stringency=0, min_obj_area=min_obj_area, max_obj_area=np.inf)
+        spots = cached.image_to_spots(volume, cache=cache)
+        uncached = LocalMaxPeakFinder(
+            min_distance=2, stringency=0, min_obj_area=min_obj_area, max_obj_area=np.inf)
+        assert spots.data.equals(uncached.image_to_spots(volume).data)
+
+    # the spot counts per threshold are computed once and shared by both settings
+    assert sum(key[0] == 'spot_counts' for key in cache) == 1
+    assert sum(key[0] == 'labels' for key in cache) == 2
@@ -2,15 +2,18 @@ import warnings
 from typing import Optional, Tuple, Union
 
 import numpy as np
+import pandas as pd
 import xarray as xr
 from trackpy import locate
+from trackpy.preprocessing import bandpass
+from trackpy.utils import validate_tuple
 
 from starfish.imagestack.imagestack import ImageStack
 from starfish.intensity_table.intensity_table import IntensityTable
-from starfish.types import SpotAttributes
+from starfish.types import Axes, SpotAttributes
 from starfish.util import click
 from ._base import SpotFinderAlgorithmBase
-from .detect import detect_spots
+from .detect import detect_spots, detect_spots_in_batches
 
 
 class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
@@ -19,7 +22,7 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
             self, spot_diameter, min_mass, max_size, separation, percentile=0,
             noise_size: Tuple[int, int, int]=(1, 1, 1), smoothing_size=None, threshold=None,
             preprocess: bool=False, measurement_type: str='max', is_volume: bool=False,
-            verbose=False) -> None:
+            verbose=False, batch: bool=False) -> None:
         """Find spots using a local max peak finding algorithm
 
         This is a wrapper for `trackpy.locate`
@@ -64,6 +67,11 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
             if True, run the algorithm on 3d volumes of the provided stack
         verbose : bool
             If True, report the percentage completed (default = False) during processing
+        batch : bool
+            If True, and no reference image is used, each worker receives all channels of an
+            imaging round and locates spots in all of them, bandpass-filtering the whole batch in
+            one vectorized call when preprocess is True. In that case raw_mass and ep are measured
+            on the bandpassed image rather than the raw image. (default = False)
 
 
         See Also
@@ -84,22 +92,10 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
         self.preprocess = preprocess
         self.is_volume = is_volume
         self.verbose = verbose
+        self.batch = batch
 
-    def image_to_spots(self, image: Union[np.ndarray, xr.DataArray]) -> SpotAttributes:
-        """
-
-        Parameters
-        ----------
-        image : np.ndarray
-            three-dimensional numpy array containing spots to detect
-
-        Returns
-        -------
-        SpotAttributes :
-            spot attributes table for all detected spots
-
-        """
-        image = np.asarray(image)
+    def _locate(self, image: np.ndarray, preprocess: bool) -> pd.DataFrame:
+        """run trackpy.locate on a single image, returning its features with starfish names"""
         with warnings.catch_warnings():
             warnings.simplefilter('ignore', FutureWarning)  # trackpy numpy indexing warning
             warnings.simplefilter('ignore', UserWarning)  # yielded if black images
@@ -113,7 +109,7 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
                 smoothing_size=self.smoothing_size,
                 threshold=self.threshold,
                 percentile=self.percentile,
-                preprocess=self.preprocess
+                preprocess=preprocess
             )
 
         # when zero spots are detected, 'ep' is missing from the trackpy locate results.
@@ -130,7 +126,10 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
             attributes.columns = ['z'] + new_colnames
         else:
             attributes.columns = new_colnames
+        return attributes
 
+    @staticmethod
+    def _to_spot_attributes(attributes: pd.DataFrame) -> SpotAttributes:
         attributes['spot_id'] = np.arange(attributes.shape[0])
         # convert these to int so it can be used to index
         attributes.x = attributes.x.astype(int)
@@ -138,6 +137,64 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
         attributes.z = attributes.z.astype(int)
         return SpotAttributes(attributes)
 
+    def image_to_spots(self, image: Union[np.ndarray, xr.DataArray]) -> SpotAttributes:
+        """
+
+        Parameters
+        ----------
+        image : np.ndarray
+            three-dimensional numpy array containing spots to detect
+
+        Returns
+        -------
+        SpotAttributes :
+            spot attributes table for all detected spots
+
+        """
+        image = np.asarray(image)
+        return self._to_spot_attributes(self._locate(image, self.preprocess))
+
+    def batch_image_to_spots(self, images: xr.DataArray) -> SpotAttributes:
+        """Find spots in every (z, y, x) volume of a batch of volumes
+
+        Parameters
+        ----------
+        images : xr.DataArray
+            volumes to search, with (z, y, x) as the trailing dimensions. Any leading dimensions
+            (e.g. Axes.CH) are reported as columns of the result.
+
+        Returns
+        -------
+        SpotAttributes :
+            spot attributes table for all detected spots, with one column per leading dimension
+            of images giving the (positional) index of the volume each spot was found in
+
+        """
+        leading_dims = images.dims[:-3]
+        volumes = np.asarray(images)
+        volumes = volumes.reshape((-1,) + volumes.shape[-3:])
+
+        if self.preprocess:
+            # filter every volume in one call; a noise size of 0 and a smoothing size of 1 along
+            # the batch axis keeps the volumes independent
+            diameter = validate_tuple(self.diameter, 3)
+            noise_size = validate_tuple(self.noise_size, 3)
+            smoothing_size = (
+                diameter if self.smoothing_size is None
+                else validate_tuple(self.smoothing_size, 3))
+            volumes = bandpass(
+                volumes, (0,) + tuple(noise_size), (1,) + tuple(smoothing_size), self.threshold)
+
+        all_attributes = []
+        for volume, index in zip(volumes, np.ndindex(*images.shape[:-3])):
+            attributes = self._locate(volume, preprocess=False)
+            for dim, value in zip(leading_dims, index):
+                attributes[dim] = value
+            all_attributes.append(attributes)
+
+        return self._to_spot_attributes(
+            pd.concat(all_attributes, sort=True, ignore_index=True))
+
     def run(
             self,
             data_stack: ImageStack,
@@ -161,6 +218,13 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
             z-planes
 
         """
+        if self.batch and blobs_image is None and not reference_image_from_max_projection:
+            return detect_spots_in_batches(
+                data_stack=data_stack,
+                batch_spot_finding_method=self.batch_image_to_spots,
+                group_by={Axes.ROUND},
+            )
+
         intensity_table = detect_spots(
             data_stack=data_stack,
             spot_finding_method=self.image_to_spots,
@@ -200,11 +264,15 @@ class TrackpyLocalMaxPeakFinder(SpotFinderAlgorithmBase):
     @click.option(
         "--is-volume", is_flag=True,
         help="indicates that the image stack should be filtered in 3d")
+    @click.option(
+        "--batch", is_flag=True,
+        help="locate spots in all channels of a round within a single worker")
     @click.pass_context
     def _cli(ctx, spot_diameter, min_max, max_size, separation, noise_size, smoothing_size,
-             preprocess, show, percentile, is_volume):
+             preprocess, show, percentile, is_volume, batch):
 
         instance = TrackpyLocalMaxPeakFinder(spot_diameter, min_max, max_size,
                                              separation, noise_size, smoothing_size,
-                                             preprocess, show, percentile, is_volume)
+                                             preprocess, show, percentile, is_volume,
+                                             batch=batch)
         ctx.obj["component"]._cli_run(ctx, instance)
@@ -1,12 +1,13 @@
 import os
 from abc import abstractmethod
-from typing import Type
+from typing import Type, Union
 
 import click
 import numpy as np
 from skimage.io import imread
 
 from starfish.intensity_table.intensity_table import IntensityTable
+from starfish.label_image.label_image import RunLengthLabelImage
 from starfish.pipeline.algorithmbase import AlgorithmBase
 from starfish.pipeline.pipelinecomponent import PipelineComponent
 
@@ -14,6 +15,14 @@ from starfish.pipeline.pipelinecomponent import PipelineComponent
 COMPONENT_NAME = "target_assignment"
 
 
+def load_label_image(path: str) -> Union[np.ndarray, RunLengthLabelImage]:
+    """load a run-length encoded label image from a .npz file, or a dense label image from an
+    image file"""
+    if path.endswith(".npz"):
+        return RunLengthLabelImage.load(path)
+    return imread(path)
+
+
 class TargetAssignment(PipelineComponent):
 
     @classmethod
@@ -24,14 +33,19 @@ class TargetAssignment(PipelineComponent):
     def _cli_run(cls, ctx, instance):
         output = ctx.obj["output"]
         intensity_table = ctx.obj["intensity_table"]
-        label_image = ctx.obj["label_image"]
-        assigned = instance.run(label_image, intensity_table)
+        # algorithms that assign targets to polygons read them in their own command
+        polygons = ctx.obj["polygons"]
+        regions = polygons if polygons is not None else ctx.obj["label_image"]
+        assigned = instance.run(regions, intensity_table)
         print(f"Writing intensities, including cell ids to {output}")
         assigned.save(os.path.join(output))
 
     @staticmethod
     @click.group(COMPONENT_NAME)
-    @click.option("--label-image", required=True, type=click.Path(exists=True))
+    @click.option(
+        "--label-image", type=click.Path(exists=True),
+        help="label image file, or run-length encoded label image (.npz). Required by "
+             "algorithms that assign targets with a label image")
     @click.option("--intensities", required=True, type=click.Path(exists=True))
     @click.option("-o", "--output", required=True)
     @click.pass_context
@@ -43,7 +57,8 @@ class TargetAssignment(PipelineComponent):
             component=TargetAssignment,
             output=output,
             intensity_table=IntensityTable.load(intensities),
-            label_image=imread(label_image)
+            label_image=load_label_image(label_image) if label_image is not None else None,
+            polygons=None,
         )
 
 
@@ -55,7 +70,7 @@ class TargetAssignmentAlgorithm(AlgorithmBase):
     @abstractmethod
     def run(
             self,
-            label_image: np.ndarray,
+            label_image: Union[np.ndarray, RunLengthLabelImage],
             intensity_table: IntensityTable,
             verbose: bool=False,
             in_place: bool=False,
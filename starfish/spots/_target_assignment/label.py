@@ -1,17 +1,29 @@
+from typing import Optional, Tuple, Union
+
 import numpy as np
+from scipy.ndimage import binary_erosion
+from scipy.spatial import cKDTree
 
 from starfish.intensity_table.intensity_table import IntensityTable
-from starfish.types import Axes, Features
+from starfish.label_image.label_image import RunLengthLabelImage
+from starfish.types import Axes, Features, Number
 from starfish.util import click
 from ._base import TargetAssignmentAlgorithm
 
 
 class Label(TargetAssignmentAlgorithm):
 
-    def __init__(self, **kwargs) -> None:
+    def __init__(self, max_distance: Optional[Number]=None, **kwargs) -> None:
         """
-        Label accepts no parameters, but all pipeline components must accept arbitrary kwargs
+        Assign features to the cells of a segmentation label image
+
+        Parameters
+        ----------
+        max_distance : Optional[Number]
+            If provided, features outside every cell are assigned to the nearest cell within this
+            distance, in pixels. Otherwise they are assigned zero. (default None)
         """
+        self.max_distance = max_distance
 
     @classmethod
     def _add_arguments(cls, parser) -> None:
@@ -19,27 +31,42 @@ class Label(TargetAssignmentAlgorithm):
 
     @staticmethod
     def _assign(
-        label_image: np.ndarray,
+        label_image: Union[np.ndarray, RunLengthLabelImage],
         intensities: IntensityTable,
         in_place: bool,
+        max_distance: Optional[Number]=None,
     ) -> IntensityTable:
 
+        indices: Tuple[np.ndarray, ...]
         if len(label_image.shape) == 3:
-            cell_ids = label_image[
+            indices = (
                 intensities[Axes.ZPLANE.value].values,
                 intensities[Axes.Y.value].values,
                 intensities[Axes.X.value].values
-            ]
+            )
         elif len(label_image.shape) == 2:
-            cell_ids = label_image[
+            indices = (
                 intensities[Axes.Y.value].values,
                 intensities[Axes.X.value].values
-            ]
+            )
         else:
             raise ValueError(
                 f"`label_image` must be 2 or 3 dimensional, not {len(label_image.shape)}D."
             )
 
+        if isinstance(label_image, RunLengthLabelImage):
+            cell_ids = label_image.values_at(indices)
+        else:
+            cell_ids = label_image[indices]
+
+        if max_distance is not None:
+            unassigned = cell_ids == 0
+            cell_ids[unassigned] = Label._nearest_cells(
+                label_image,
+                tuple(axis_indices[unassigned] for axis_indices in indices),
+                max_distance,
+            )
+
         if not in_place:
             intensities = intensities.copy()
 
@@ -47,9 +74,36 @@ class Label(TargetAssignmentAlgorithm):
 
         return intensities
 
+    @staticmethod
+    def _nearest_cells(
+            label_image: Union[np.ndarray, RunLengthLabelImage],
+            indices: Tuple[np.ndarray, ...],
+            max_distance: Number,
+    ) -> np.ndarray:
+        """the label of the nearest cell within max_distance of each point, or zero, for points
+        outside every cell
+
+        The pixel of a cell nearest to a point outside it always touches the background, so a
+        KD-tree is built over those boundary pixels only, and queried for all points at once.
+        """
+        if isinstance(label_image, RunLengthLabelImage):
+            label_image = label_image.to_label_image()
+        cell_ids = np.zeros(len(indices[0]), dtype=label_image.dtype)
+        foreground = label_image > 0
+        boundary = np.argwhere(foreground & ~binary_erosion(foreground, border_value=1))
+        if len(boundary) == 0 or len(cell_ids) == 0:
+            return cell_ids
+
+        # cKDTree excludes neighbors at exactly distance_upper_bound
+        distances, nearest = cKDTree(boundary).query(
+            np.stack(indices, axis=1), distance_upper_bound=np.nextafter(max_distance, np.inf))
+        found = np.isfinite(distances)
+        cell_ids[found] = label_image[tuple(boundary[nearest[found]].T)]
+        return cell_ids
+
     def run(
             self,
-            label_image: np.ndarray,
+            label_image: Union[np.ndarray, RunLengthLabelImage],
             intensity_table: IntensityTable,
             verbose: bool=False,
             in_place: bool=False,
@@ -58,9 +112,10 @@ class Label(TargetAssignmentAlgorithm):
 
         Parameters
         ----------
-        label_image : np.ndarray[np.uint32]
+        label_image : Union[np.ndarray[np.uint32], RunLengthLabelImage]
             integer array produced from segmentation where each pixel in a cell is labeled by the
-            same integer, and each cell is labeled by a different integer
+            same integer, and each cell is labeled by a different integer, or its run-length
+            encoding
         intensity_table : IntensityTable
             spot information
         in_place : bool
@@ -72,13 +127,19 @@ class Label(TargetAssignmentAlgorithm):
         -------
         IntensityTable :
             IntensityTable with added features variable containing cell ids. Points outside of
-            cells will be assigned zero.
+            cells, and further than max_distance from any cell, will be assigned zero.
 
         """
-        return self._assign(label_image, intensity_table, in_place=in_place)
+        return self._assign(
+            label_image, intensity_table, in_place=in_place, max_distance=self.max_distance)
 
     @staticmethod
     @click.command("Label")
+    @click.option(
+        "--max-distance", default=None, type=float,
+        help="assign features outside cells to the nearest cell within this many pixels")
     @click.pass_context
-    def _cli(ctx):
-        ctx.obj["component"]._cli_run(ctx, Label())
+    def _cli(ctx, max_distance):
+        if ctx.obj["label_image"] is None:
+            ctx.fail("--label-image is required")
+        ctx.obj["component"]._cli_run(ctx, Label(max_distance))
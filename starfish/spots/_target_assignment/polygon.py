@@ -0,0 +1,236 @@
+import json
+from typing import Iterator, Sequence, Tuple, Union
+
+import numpy as np
+import regional
+
+from starfish.intensity_table.intensity_table import IntensityTable
+from starfish.types import Axes, Coordinates, Features
+from starfish.util import click
+from ._base import TargetAssignmentAlgorithm
+
+# the number of points tested at a time, which bounds the memory used by the edge crossing tests
+_POINT_CHUNK_SIZE = 1 << 14
+
+
+def _chunks(size: int) -> Iterator[slice]:
+    for start in range(0, size, _POINT_CHUNK_SIZE):
+        yield slice(start, min(start + _POINT_CHUNK_SIZE, size))
+
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """for each i, the integers starts[i], ..., starts[i] + counts[i] - 1, concatenated, and the
+    index i that each of them belongs to"""
+    owners = np.repeat(np.arange(len(counts)), counts)
+    block_starts = np.cumsum(counts) - counts
+    return starts[owners] + np.arange(counts.sum()) - block_starts[owners], owners
+
+
+class PolygonIndex:
+
+    def __init__(self, polygons: Sequence[np.ndarray]) -> None:
+        """Spatial index that finds the polygons containing each of many points
+
+        The bounding boxes of the polygons are binned into a uniform grid whose cells are about
+        the size of a typical polygon, so that each point is only tested against the few polygons
+        whose bounding boxes overlap its grid cell. The tests are vectorized ray casting: a point
+        is inside a polygon if a ray from it crosses an odd number of the polygon's edges.
+
+        Parameters
+        ----------
+        polygons : Sequence[np.ndarray]
+            (n_vertices, 2) arrays of the (y, x) vertices of each polygon, in order around the
+            polygon. The last vertex is connected to the first.
+        """
+        if len(polygons) == 0:
+            raise ValueError("at least one polygon is required")
+        vertices = [np.asarray(polygon, dtype=np.float64) for polygon in polygons]
+        for polygon in vertices:
+            if polygon.ndim != 2 or polygon.shape[0] < 3 or polygon.shape[1] != 2:
+                raise ValueError("polygons must be (n_vertices, 2) arrays with 3 or more vertices")
+        self.n_polygons = len(vertices)
+
+        # edges as (y0, x0, y1, x1), stored contiguously for each polygon
+        self.edges = np.concatenate([
+            np.hstack([polygon, np.roll(polygon, -1, axis=0)]) for polygon in vertices])
+        self.edge_counts = np.array([len(polygon) for polygon in vertices])
+        self.edge_starts = np.cumsum(self.edge_counts) - self.edge_counts
+
+        self.mins = np.array([polygon.min(axis=0) for polygon in vertices])
+        self.maxs = np.array([polygon.max(axis=0) for polygon in vertices])
+
+        # grid cells about the size of the median polygon
+        extents = self.maxs - self.mins
+        self.cell_size = max(float(np.median(extents.max(axis=1))), 1e-6)
+        self.origin = self.mins.min(axis=0)
+        self.grid_shape = (
+            np.floor((self.maxs.max(axis=0) - self.origin) / self.cell_size).astype(int) + 1)
+
+        # the grid cells that each polygon's bounding box covers, sorted by cell and then polygon
+        first_cells = self._cell_coordinates(self.mins)
+        cell_counts = self._cell_coordinates(self.maxs) - first_cells + 1
+        positions, owners = _ranges(
+            np.zeros(self.n_polygons, dtype=int), cell_counts.prod(axis=1))
+        cells = (
+            (first_cells[owners, 0] + positions // cell_counts[owners, 1]) * self.grid_shape[1]
+            + first_cells[owners, 1] + positions % cell_counts[owners, 1])
+        order = np.lexsort((owners, cells))
+        self.cell_polygons = owners[order]
+        self.cell_starts = np.searchsorted(cells[order], np.arange(self.grid_shape.prod() + 1))
+
+    def _cell_coordinates(self, points: np.ndarray) -> np.ndarray:
+        return np.floor((points - self.origin) / self.cell_size).astype(int)
+
+    def _candidates(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """pairs of (point, polygon) indices for the polygons whose bounding boxes contain each
+        point, sorted by point and then polygon"""
+        cell_coordinates = self._cell_coordinates(points)
+        in_grid = np.all((cell_coordinates >= 0) & (cell_coordinates < self.grid_shape), axis=1)
+        cells = cell_coordinates[:, 0] * self.grid_shape[1] + cell_coordinates[:, 1]
+        cells[~in_grid] = 0
+        counts = np.where(
+            in_grid, self.cell_starts[cells + 1] - self.cell_starts[cells], 0)
+        positions, point_indices = _ranges(self.cell_starts[cells], counts)
+        polygon_indices = self.cell_polygons[positions]
+
+        in_box = np.all(
+            (points[point_indices] >= self.mins[polygon_indices])
+            & (points[point_indices] <= self.maxs[polygon_indices]),
+            axis=1)
+        return point_indices[in_box], polygon_indices[in_box]
+
+    def _contains(
+            self, points: np.ndarray, point_indices: np.ndarray, polygon_indices: np.ndarray
+    ) -> np.ndarray:
+        """whether each point of the pairs lies inside the polygon it is paired with"""
+        edge_indices, pairs = _ranges(
+            self.edge_starts[polygon_indices], self.edge_counts[polygon_indices])
+        y0, x0, y1, x1 = self.edges[edge_indices].T
+        y, x = points[point_indices[pairs]].T
+
+        # edges that straddle the horizontal line through the point, and cross it to the point's
+        # right
+        straddles = (y0 > y) != (y1 > y)
+        dy = np.where(straddles, y1 - y0, 1)
+        crosses = straddles & (x < x0 + (y - y0) * (x1 - x0) / dy)
+        n_crossings = np.bincount(pairs, weights=crosses, minlength=len(point_indices))
+        return n_crossings % 2 == 1
+
+    def assign(self, points: np.ndarray) -> np.ndarray:
+        """Find the polygon that contains each point
+
+        Parameters
+        ----------
+        points : np.ndarray
+            (n_points, 2) array of (y, x) point coordinates
+
+        Returns
+        -------
+        np.ndarray[np.int64] :
+            1 + the index of the polygon that contains each point, or 0 for points outside every
+            polygon. Points inside several polygons are assigned to the first.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        polygon_ids = np.zeros(len(points), dtype=np.int64)
+        for chunk in _chunks(len(points)):
+            chunk_points = points[chunk]
+            point_indices, polygon_indices = self._candidates(chunk_points)
+            inside = self._contains(chunk_points, point_indices, polygon_indices)
+            # the pairs are sorted by polygon for each point, so the first one found is the first
+            # polygon
+            assigned, first = np.unique(point_indices[inside], return_index=True)
+            polygon_ids[chunk][assigned] = polygon_indices[inside][first] + 1
+        return polygon_ids
+
+
+class PolygonLabel(TargetAssignmentAlgorithm):
+
+    def __init__(self, coordinates: str='pixel', **kwargs) -> None:
+        """
+        Assign features to cells outlined by polygons, without rasterizing a label image
+
+        Parameters
+        ----------
+        coordinates : str ['pixel', 'physical']
+            'pixel' matches the polygons with the y and x pixel coordinates of the features, and
+            'physical' with their yc and xc physical coordinates, which can span several fields of
+            view. (default 'pixel')
+        """
+        if coordinates not in self._coordinates:
+            raise ValueError(f"coordinates must be one of {self._coordinates}, not {coordinates}")
+        self.coordinates = coordinates
+
+    _coordinates = ('pixel', 'physical')
+
+    @classmethod
+    def _add_arguments(cls, parser) -> None:
+        pass
+
+    @staticmethod
+    def _polygons(polygons: Union[Sequence[np.ndarray], regional.many]) -> Sequence[np.ndarray]:
+        """polygon vertices, using the convex hull of each region of a regional.many"""
+        if isinstance(polygons, regional.many):
+            return [region.hull for region in polygons]
+        return polygons
+
+    def _points(self, intensities: IntensityTable) -> np.ndarray:
+        if self.coordinates == 'pixel':
+            y, x = Axes.Y.value, Axes.X.value
+        else:
+            y, x = Coordinates.Y.value, Coordinates.X.value
+            if y not in intensities.coords or x not in intensities.coords:
+                raise ValueError(
+                    "physical coordinates requested, but the IntensityTable has no "
+                    f"{y} and {x} coordinates")
+        return np.stack([intensities[y].values, intensities[x].values], axis=1)
+
+    def run(  # type: ignore
+            self,
+            polygons: Union[Sequence[np.ndarray], regional.many],
+            intensity_table: IntensityTable,
+            verbose: bool=False,
+            in_place: bool=False,
+    ) -> IntensityTable:
+        """Extract cell ids for features in IntensityTable from the polygons that outline cells
+
+        Parameters
+        ----------
+        polygons : Union[Sequence[np.ndarray], regional.many]
+            (n_vertices, 2) arrays of the (y, x) vertices of each cell's outline, in order around
+            the cell, or regions whose convex hulls outline the cells. The i-th polygon is cell
+            i + 1.
+        intensity_table : IntensityTable
+            spot information
+        in_place : bool
+            if True, process ImageStack in-place, otherwise return a new stack
+        verbose : bool
+            if True, report on the percentage completed during processing (default = False)
+
+        Returns
+        -------
+        IntensityTable :
+            IntensityTable with added features variable containing cell ids. Points outside of
+            cells will be assigned zero.
+
+        """
+        index = PolygonIndex(self._polygons(polygons))
+        cell_ids = index.assign(self._points(intensity_table))
+
+        if not in_place:
+            intensity_table = intensity_table.copy()
+        intensity_table[Features.CELL_ID] = (Features.AXIS, cell_ids)
+        return intensity_table
+
+    @staticmethod
+    @click.command("PolygonLabel")
+    @click.option(
+        "--polygons", required=True, type=click.Path(exists=True),
+        help="json file holding a list of polygons, each a list of [y, x] vertices")
+    @click.option(
+        "--coordinates", default='pixel',
+        help="str ['pixel', 'physical'] the coordinates of the polygons. Default: pixel")
+    @click.pass_context
+    def _cli(ctx, polygons, coordinates):
+        with open(polygons) as fh:
+            ctx.obj["polygons"] = [np.array(polygon) for polygon in json.load(fh)]
+        ctx.obj["component"]._cli_run(ctx, PolygonLabel(coordinates))
@@ -0,0 +1,79 @@
+import os
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from starfish import Codebook, IntensityTable
+from starfish.label_image.label_image import RunLengthLabelImage
+from starfish.spots._target_assignment._base import TargetAssignment
+from starfish.spots._target_assignment.label import Label
+from starfish.types import Axes, Features
+
+
+@pytest.mark.parametrize("is_volume", [False, True])
+def test_label_assigns_run_length_encoded_label_images_like_dense_ones(is_volume):
+    codebook = Codebook.synthetic_one_hot_codebook(n_round=2, n_channel=2, n_codes=3)
+    intensities = IntensityTable.synthetic_intensities(
+        codebook, num_z=3, height=50, width=40, n_spots=30)
+    label_image = np.zeros((3, 50, 40), dtype=np.uint32)
+    label_image[:, 5:25, 5:20] = 1
+    label_image[1:, 30:45, 10:35] = 2
+    if not is_volume:
+        label_image = label_image[1]
+
+    dense = Label().run(label_image, intensities)
+    encoded = Label().run(RunLengthLabelImage.from_label_image(label_image), intensities)
+
+    if is_volume:
+        indices = tuple(intensities[axis.value].values for axis in (Axes.ZPLANE, Axes.Y, Axes.X))
+    else:
+        indices = tuple(intensities[axis.value].values for axis in (Axes.Y, Axes.X))
+    assert np.array_equal(dense[Features.CELL_ID].values, label_image[indices])
+    assert np.array_equal(encoded[Features.CELL_ID].values, dense[Features.CELL_ID].values)
+
+
+@pytest.mark.parametrize("is_volume", [False, True])
+def test_label_assigns_features_outside_cells_to_the_nearest_cell(is_volume):
+    codebook = Codebook.synthetic_one_hot_codebook(n_round=2, n_channel=2, n_codes=3)
+    intensities = IntensityTable.synthetic_intensities(
+        codebook, num_z=3, height=50, width=40, n_spots=200)
+    label_image = np.zeros((3, 50, 40), dtype=np.uint32)
+    label_image[:, 5:25, 5:20] = 1
+    # the cells are at least 11 pixels apart, so no feature is within 4 pixels of two cells
+    label_image[1:, 35:48, 10:35] = 2
+    label_image[:, 10:20, 30:32] = 3
+    if is_volume:
+        indices = tuple(intensities[axis.value].values for axis in (Axes.ZPLANE, Axes.Y, Axes.X))
+    else:
+        label_image = label_image[1]
+        indices = tuple(intensities[axis.value].values for axis in (Axes.Y, Axes.X))
+    points = np.stack(indices, axis=1)
+
+    # brute force: the label of the nearest cell pixel, if it is at most 4 pixels away
+    cell_pixels = np.argwhere(label_image > 0)
+    distances = np.linalg.norm(points[:, None] - cell_pixels[None], axis=2)
+    nearest = label_image[tuple(cell_pixels[distances.argmin(axis=1)].T)]
+    expected = np.where(distances.min(axis=1) <= 4, nearest, 0)
+
+    for image in (label_image, RunLengthLabelImage.from_label_image(label_image)):
+        assigned = Label(max_distance=4).run(image, intensities)
+        cell_ids = assigned[Features.CELL_ID].values
+        assert np.sum((cell_ids > 0) & (label_image[indices] == 0)) > 0
+        assert np.array_equal(cell_ids, expected)
+
+
+def test_label_cli_requires_a_label_image(tmpdir):
+    codebook = Codebook.synthetic_one_hot_codebook(n_round=2, n_channel=2, n_codes=3)
+    intensities = IntensityTable.synthetic_intensities(codebook, num_z=1, n_spots=5)
+    # netcdf cannot store the object dtype of the synthetic targets
+    intensities[Features.TARGET] = (Features.AXIS, intensities[Features.TARGET].values.astype(str))
+    intensities_path = os.path.join(str(tmpdir), "intensities.nc")
+    intensities.save(intensities_path)
+
+    result = CliRunner().invoke(TargetAssignment._cli, [
+        "--intensities", intensities_path, "-o", os.path.join(str(tmpdir), "assigned.nc"),
+        "Label",
+    ])
+    assert result.exit_code == 2
+    assert "--label-image is required" in result.output
@@ -0,0 +1,122 @@
+import json
+import os
+
+import numpy as np
+import pytest
+import regional
+from click.testing import CliRunner
+from matplotlib.path import Path
+from scipy.ndimage import grey_dilation, grey_erosion
+
+from starfish import Codebook, IntensityTable
+from starfish.spots._target_assignment import polygon as polygon_module
+from starfish.spots._target_assignment._base import TargetAssignment
+from starfish.spots._target_assignment.polygon import PolygonIndex, PolygonLabel
+from starfish.types import Axes, Coordinates, Features
+
+
+def _star_polygons(n_rows=6, n_columns=8, spacing=20, seed=0):
+    """irregular, star-shaped polygons centered on a grid, some of which overlap"""
+    random = np.random.RandomState(seed)
+    polygons = []
+    for y in range(n_rows):
+        for x in range(n_columns):
+            n_vertices = random.randint(3, 12)
+            angles = np.sort(random.rand(n_vertices)) * 2 * np.pi
+            radii = random.uniform(3, 13, n_vertices)
+            polygons.append(np.stack([
+                (y + 0.5) * spacing + radii * np.sin(angles),
+                (x + 0.5) * spacing + radii * np.cos(angles)], axis=1))
+    return polygons
+
+
+def test_polygon_index_matches_point_in_polygon_tests(monkeypatch):
+    # test a few points at a time, so that the points span several chunks
+    monkeypatch.setattr(polygon_module, "_POINT_CHUNK_SIZE", 100)
+    polygons = _star_polygons()
+    points = np.random.RandomState(1).rand(2000, 2) * [130, 170] - 5
+
+    expected = np.zeros(len(points), dtype=int)
+    for i, polygon in reversed(list(enumerate(polygons))):
+        expected[Path(polygon).contains_points(points)] = i + 1
+
+    assigned = PolygonIndex(polygons).assign(points)
+    assert np.any(assigned == 0) and len(np.unique(assigned)) > 20
+    assert np.array_equal(assigned, expected)
+
+
+def test_polygon_index_rejects_degenerate_polygons():
+    with pytest.raises(ValueError):
+        PolygonIndex([np.array([[0, 0], [1, 1]])])
+    with pytest.raises(ValueError):
+        PolygonIndex([])
+
+
+def test_polygon_label_assigns_pixel_and_physical_coordinates():
+    codebook = Codebook.synthetic_one_hot_codebook(n_round=2, n_channel=2, n_codes=3)
+    intensities = IntensityTable.synthetic_intensities(
+        codebook, num_z=1, height=50, width=40, n_spots=40)
+    squares = [
+        np.array([[5, 5], [5, 20], [25, 20], [25, 5]]) - 0.5,
+        np.array([[30, 10], [30, 35], [45, 35], [45, 10]]) - 0.5,
+    ]
+    label_image = np.zeros((50, 40), dtype=np.uint32)
+    label_image[5:25, 5:20] = 1
+    label_image[30:45, 10:35] = 2
+    y, x = intensities[Axes.Y.value].values, intensities[Axes.X.value].values
+
+    assigned = PolygonLabel().run(squares, intensities)
+    assert np.array_equal(assigned[Features.CELL_ID].values, label_image[y, x])
+
+    # physical coordinates one unit per 2 pixels, offset by 100
+    intensities[Coordinates.Y.value] = (Features.AXIS, 100 + y / 2)
+    intensities[Coordinates.X.value] = (Features.AXIS, 100 + x / 2)
+    physical_squares = [100 + square / 2 for square in squares]
+    assigned = PolygonLabel(coordinates='physical').run(physical_squares, intensities)
+    assert np.array_equal(assigned[Features.CELL_ID].values, label_image[y, x])
+
+    with pytest.raises(ValueError):
+        PolygonLabel(coordinates='stage')
+
+
+def test_polygon_label_accepts_regions():
+    codebook = Codebook.synthetic_one_hot_codebook(n_round=2, n_channel=2, n_codes=3)
+    intensities = IntensityTable.synthetic_intensities(
+        codebook, num_z=1, height=50, width=40, n_spots=40)
+    label_image = np.zeros((50, 40), dtype=np.uint32)
+    label_image[5:25, 5:20] = 1
+    label_image[30:45, 10:35] = 2
+    regions = regional.many([
+        regional.one(np.argwhere(label_image == i)) for i in (1, 2)])
+
+    assigned = PolygonLabel().run(regions, intensities)
+    # the hulls pass through the centers of the edge pixels, so only test interior points
+    y, x = intensities[Axes.Y.value].values, intensities[Axes.X.value].values
+    uniform = grey_dilation(label_image, size=3) == grey_erosion(label_image, size=3)
+    interior = uniform[y, x]
+    assert np.array_equal(
+        assigned[Features.CELL_ID].values[interior], label_image[y[interior], x[interior]])
+
+
+def test_polygon_label_cli_reads_polygons_without_a_label_image(tmpdir):
+    codebook = Codebook.synthetic_one_hot_codebook(n_round=2, n_channel=2, n_codes=3)
+    intensities = IntensityTable.synthetic_intensities(
+        codebook, num_z=1, height=50, width=40, n_spots=40)
+    # netcdf cannot store the object dtype of the synthetic targets
+    intensities[Features.TARGET] = (Features.AXIS, intensities[Features.TARGET].values.astype(str))
+    intensities_path = os.path.join(str(tmpdir), "intensities.nc")
+    intensities.save(intensities_path)
+    polygons_path = os.path.join(str(tmpdir), "polygons.json")
+    with open(polygons_path, "w") as fh:
+        json.dump([[[4.5, 4.5], [4.5, 19.5], [24.5, 19.5], [24.5, 4.5]]], fh)
+    output = os.path.join(str(tmpdir), "assigned.nc")
+
+    result = CliRunner().invoke(TargetAssignment._cli, [
+        "--intensities", intensities_path, "-o", output,
+        "PolygonLabel", "--polygons", polygons_path,
+    ])
+    assert result.exit_code == 0, result.output
+
+    y, x = intensities[Axes.Y.value].values, intensities[Axes.X.value].values
+    expected = ((y >= 5) & (y < 25) & (x >= 5) & (x < 20)).astype(int)
+    assert np.array_equal(IntensityTable.load(output)[Features.CELL_ID].values, expected)
@@ -11,6 +11,7 @@ from starfish.image import (
     Filter,
     Registration,
     Segmentation,
+    Stitching,
 )
 from starfish.spacetx_format.cli import validate as validate_cli
 from starfish.spots import (
@@ -19,6 +20,7 @@ from starfish.spots import (
     SpotFinder,
     TargetAssignment,
 )
+from starfish.spots._detector.sweep import sweep_cli
 from starfish.util import click
 
 
@@ -97,9 +99,11 @@ starfish.add_command(Filter._cli)  # type: ignore
 starfish.add_command(PixelSpotDecoder._cli)
 starfish.add_command(SpotFinder._cli)  # type: ignore
 starfish.add_command(Segmentation._cli)  # type: ignore
+starfish.add_command(Stitching._cli)  # type: ignore
 starfish.add_command(TargetAssignment._cli)  # type: ignore
 starfish.add_command(Decoder._cli)  # type: ignore
 
 # Other
 starfish.add_command(build_cli)  # type: ignore
 starfish.add_command(validate_cli)  # type: ignore
+starfish.add_command(sweep_cli)  # type: ignore
@@ -1,11 +1,13 @@
-from typing import Union
+from typing import Optional, Union
 
 import numpy as np
 import xarray as xr
 
 def preserve_float_range(
         array: Union[xr.DataArray, np.ndarray],
-        rescale: bool=False) -> Union[xr.DataArray, np.ndarray]:
+        rescale: bool=False,
+        out: Optional[np.ndarray]=None,
+) -> Union[xr.DataArray, np.ndarray]:
     """
     Clips values below zero to zero. If values above one are detected, clips them
     to 1 unless `rescale` is True, in which case the input is scaled by
@@ -17,6 +19,9 @@ def preserve_float_range(
         Array whose values should be in the interval [0, 1] but may not be.
     rescale: bool
         If true, scale values by the max.
+    out : Optional[np.ndarray]
+        If provided, the result is written into this array, which must have the shape of array and
+        may be array itself, and no copies are made. Otherwise a new float32 array is returned.
 
     Returns
     -------
@@ -24,6 +29,18 @@ def preserve_float_range(
         Array whose values are in the interval [0, 1].
 
     """
+    if out is not None:
+        if isinstance(array, xr.DataArray):
+            array = array.values
+        if rescale:
+            np.maximum(array, 0, out=out)
+            array_max = out.max()
+            if array_max > 1:
+                out /= array_max
+        else:
+            np.clip(array, 0, 1, out=out)
+        return out
+
     array = array.copy()
 
     if isinstance(array, xr.DataArray):
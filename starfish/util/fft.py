@@ -0,0 +1,70 @@
+"""Real-input FFT helpers shared by the frequency-domain filters and registration.
+
+scipy.fft (scipy >= 1.4) transforms float32 input in single precision. Older scipy versions fall
+back to numpy.fft, which computes in double precision; results are the same up to rounding.
+"""
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.fftpack import next_fast_len
+
+try:
+    from scipy.fft import irfftn as _irfftn, rfftn as _rfftn
+    SINGLE_PRECISION = True
+except ImportError:
+    from numpy.fft import irfftn as _irfftn, rfftn as _rfftn
+    SINGLE_PRECISION = False
+
+COMPLEX_DTYPE = np.complex64 if SINGLE_PRECISION else np.complex128
+
+
+def rfftn(
+        array: np.ndarray, shape: Sequence[int], axes: Optional[Sequence[int]]=None
+) -> np.ndarray:
+    """n-dimensional real FFT of array over axes (default: the trailing len(shape) axes),
+    zero-padded to shape. Any other leading axes are transformed as a batch."""
+    if axes is None:
+        axes = range(array.ndim - len(shape), array.ndim)
+    return _rfftn(array, s=tuple(shape), axes=tuple(axes))
+
+
+def irfftn(
+        spectrum: np.ndarray, shape: Sequence[int], axes: Optional[Sequence[int]]=None
+) -> np.ndarray:
+    """inverse of rfftn for a real array of the given shape"""
+    if axes is None:
+        axes = range(spectrum.ndim - len(shape), spectrum.ndim)
+    return _irfftn(spectrum, s=tuple(shape), axes=tuple(axes))
+
+
+def fast_shape(shape: Sequence[int]) -> Tuple[int, ...]:
+    """the smallest shape at least as large as shape whose sides factor into small primes"""
+    return tuple(next_fast_len(int(s)) for s in shape)
+
+
+@lru_cache(maxsize=32)
+def _kernel_spectrum(
+        kernel_bytes: bytes, kernel_shape: Tuple[int, ...], fft_shape: Tuple[int, ...]
+) -> np.ndarray:
+    kernel = np.frombuffer(kernel_bytes, dtype=np.float32).reshape(kernel_shape)
+    spectrum = rfftn(kernel, fft_shape).astype(COMPLEX_DTYPE, copy=False)
+    spectrum.flags.writeable = False
+    return spectrum
+
+
+def kernel_spectrum(kernel: np.ndarray, fft_shape: Sequence[int]) -> np.ndarray:
+    """return the read-only rfftn of kernel zero-padded to fft_shape
+
+    Spectra are cached by kernel contents and fft_shape, so filtering many tiles of the same shape
+    transforms the kernel once per process.
+    """
+    kernel = np.ascontiguousarray(kernel, dtype=np.float32)
+    return _kernel_spectrum(kernel.tobytes(), kernel.shape, tuple(int(s) for s in fft_shape))
+
+
+def same_crop(image_shape: Sequence[int], kernel_shape: Sequence[int]) -> Tuple[slice, ...]:
+    """slices that extract the 'same'-mode region of a full linear convolution, matching
+    scipy.signal.fftconvolve(..., mode='same')"""
+    return tuple(
+        slice((k - 1) // 2, (k - 1) // 2 + n) for n, k in zip(image_shape, kernel_shape))
@@ -0,0 +1,85 @@
+"""Statistics and relabeling of label images, where each object's pixels share a positive integer
+value and 0 is background.
+
+Both functions work through the flattened image in chunks, so that the intermediate index arrays
+that np.bincount and np.take create stay small, and neither allocates more than one image.
+"""
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+# the number of pixels processed at a time
+_CHUNK_SIZE = 1 << 20
+
+
+def _chunks(size: int) -> Iterator[slice]:
+    for start in range(0, size, _CHUNK_SIZE):
+        yield slice(start, min(start + _CHUNK_SIZE, size))
+
+
+def label_areas(labels: np.ndarray, n_labels: Optional[int]=None) -> np.ndarray:
+    """
+    Count the pixels of each label.
+
+    Parameters
+    ----------
+    labels : np.ndarray[np.uint32]
+        label image
+    n_labels : Optional[int]
+        the largest label of labels, if known. If None, it is computed from labels.
+
+    Returns
+    -------
+    np.ndarray[np.int64] :
+        array of length n_labels + 1 whose i-th entry is the area of label i. The 0th entry is the
+        area of the background.
+    """
+    flat = labels.reshape(-1)
+    if n_labels is None:
+        n_labels = int(flat.max()) if flat.size else 0
+    areas = np.zeros(n_labels + 1, dtype=np.int64)
+    for chunk in _chunks(flat.size):
+        areas += np.bincount(flat[chunk], minlength=n_labels + 1)
+    return areas
+
+
+def relabel(
+        labels: np.ndarray, keep: np.ndarray, out: Optional[np.ndarray]=None
+) -> Tuple[np.ndarray, int]:
+    """
+    Remove the labels for which keep is False and number the remaining labels with sequential
+    integers from 1, preserving their order, in a single pass through a lookup table.
+
+    Parameters
+    ----------
+    labels : np.ndarray
+        label image
+    keep : np.ndarray[bool]
+        array with an entry for every label from 0 to the largest label of labels; labels whose
+        entry is False are set to background. The entry for the background is ignored.
+    out : Optional[np.ndarray[np.uint32]]
+        If provided, the result is written into this contiguous array, which must have the shape
+        of labels and may be labels itself. Otherwise a new array is returned.
+
+    Returns
+    -------
+    np.ndarray[np.uint32] :
+        relabeled image
+    int :
+        number of labels that were kept
+    """
+    keep = np.array(keep, dtype=bool)
+    keep[0] = False
+    n_kept = int(np.count_nonzero(keep))
+    lookup = np.zeros(len(keep), dtype=np.uint32)
+    lookup[keep] = np.arange(1, n_kept + 1, dtype=np.uint32)
+
+    if out is None:
+        out = np.empty(labels.shape, dtype=np.uint32)
+    flat_labels, flat_out = labels.reshape(-1), out.reshape(-1)
+    if not np.may_share_memory(flat_out, out):
+        raise ValueError("out must be a contiguous array")
+    for chunk in _chunks(flat_labels.size):
+        # entries are mapped independently, so labels and out may be the same array
+        np.take(lookup, flat_labels[chunk], out=flat_out[chunk], mode='clip')
+    return out, n_kept
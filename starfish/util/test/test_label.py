@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+from scipy.ndimage import label
+
+from starfish.util import label as label_module
+from starfish.util.label import label_areas, relabel
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """process a few pixels at a time, so that labels span several chunks"""
+    monkeypatch.setattr(label_module, "_CHUNK_SIZE", 7)
+
+
+def _labels():
+    random = np.random.RandomState(0)
+    labels, n_labels = label(random.rand(30, 40) > 0.6, output=np.uint32)
+    return labels, n_labels
+
+
+def test_label_areas(small_chunks):
+    labels, n_labels = _labels()
+    areas = label_areas(labels)
+    assert len(areas) == n_labels + 1
+    for i in range(n_labels + 1):
+        assert areas[i] == np.count_nonzero(labels == i)
+    assert np.array_equal(label_areas(labels, n_labels + 2)[:-2], areas)
+
+
+def test_relabel_removes_labels_and_numbers_the_rest_sequentially(small_chunks):
+    labels, n_labels = _labels()
+    keep = label_areas(labels, n_labels) > 2
+    relabeled, n_kept = relabel(labels, keep)
+
+    assert relabeled.dtype == np.uint32
+    assert n_kept == np.count_nonzero(keep[1:])
+    assert np.array_equal(np.unique(relabeled), np.arange(n_kept + 1))
+    assert np.array_equal(relabeled > 0, keep[labels] & (labels > 0))
+    # the remaining objects keep their order and pixels
+    expected, n_expected = label(relabeled > 0, output=np.uint32)
+    assert n_expected == n_kept
+    assert np.array_equal(relabeled, expected)
+
+
+def test_relabel_in_place():
+    labels, n_labels = _labels()
+    expected, _ = relabel(labels, np.ones(n_labels + 1, dtype=bool))
+    out, _ = relabel(labels, np.ones(n_labels + 1, dtype=bool), out=labels)
+    assert out is labels
+    assert np.array_equal(labels, expected)
+    with pytest.raises(ValueError):
+        relabel(labels, np.ones(n_labels + 1, dtype=bool), out=np.empty((40, 30), np.uint32).T)